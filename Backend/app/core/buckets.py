@@ -0,0 +1,87 @@
+import math
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import func
+
+# Trend groupings are bucket widths: the named ones the dashboard has always
+# offered, or ``<n><unit>`` with m(inutes), h(ours), d(ays) or w(eeks), e.g.
+# ``15m`` or ``6h``. "auto" asks the server to pick one for ``max_points``.
+NAMED_GROUPINGS = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}
+UNITS = {"m": timedelta(minutes=1), "h": timedelta(hours=1), "d": timedelta(days=1), "w": timedelta(weeks=1)}
+GROUPING_PATTERN = r"^(hour|day|week|auto|[1-9][0-9]{0,4}[mhdw])$"
+AUTO = "auto"
+DEFAULT_MAX_POINTS = 500
+
+# Buckets are aligned to a Monday midnight, so 1d and 1w buckets start where
+# date_trunc('day') and date_trunc('week') would.
+BUCKET_ORIGIN = datetime(2000, 1, 3)
+
+# Widths "auto" picks from, smallest first; past the last, whole weeks.
+AUTO_WIDTHS = [
+    timedelta(minutes=1), timedelta(minutes=5), timedelta(minutes=15), timedelta(minutes=30),
+    timedelta(hours=1), timedelta(hours=2), timedelta(hours=3), timedelta(hours=6), timedelta(hours=12),
+    timedelta(days=1), timedelta(days=2), timedelta(weeks=1), timedelta(weeks=2), timedelta(weeks=4),
+]
+
+def parse_grouping(grouping: str) -> timedelta:
+    """Bucket width for a named or ``<n><unit>`` grouping; ValueError otherwise."""
+    if grouping in NAMED_GROUPINGS:
+        return NAMED_GROUPINGS[grouping]
+    match = re.fullmatch(r"([1-9][0-9]*)([mhdw])", grouping)
+    if not match:
+        raise ValueError(f"invalid grouping: {grouping!r}")
+    return int(match.group(1)) * UNITS[match.group(2)]
+
+def format_grouping(width: timedelta) -> str:
+    for unit in ("w", "d", "h", "m"):
+        count, rest = divmod(width, UNITS[unit])
+        if not rest:
+            return f"{count}{unit}"
+    raise ValueError(f"bucket width is not a whole number of minutes: {width}")
+
+def auto_grouping(start: Optional[datetime], end: Optional[datetime], max_points: int) -> str:
+    """The narrowest standard width that covers ``[start, end]`` in at most
+    ``max_points`` buckets."""
+    if start is None or end is None or end <= start:
+        return format_grouping(AUTO_WIDTHS[0])
+    span = end - start
+    for width in AUTO_WIDTHS:
+        # A range not aligned to the buckets can straddle one more.
+        if span // width + 1 <= max_points:
+            return format_grouping(width)
+    weeks = math.ceil(span / UNITS["w"] / max(max_points - 1, 1))
+    return format_grouping(weeks * UNITS["w"])
+
+def bucket(column, grouping: str):
+    """SQL expression for the start of ``column``'s bucket."""
+    return func.date_bin(parse_grouping(grouping), column, BUCKET_ORIGIN)
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points Largest-Triangle-Three-Buckets keeps to draw
+    ``(x, y)`` with ``threshold`` points.
+
+    The first and last points are always kept. The rest are split into
+    ``threshold - 2`` equal buckets, and from each the point forming the
+    largest triangle with the point kept before it and the average of the
+    next bucket is kept, which preserves peaks and dips that plain
+    decimation or averaging would flatten.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - avg_x) * (y[lo:hi] - py) - (px - x[lo:hi]) * (avg_y - py))
+        previous = lo + int(np.argmax(areas))
+        keep[i + 1] = previous
+    return keep
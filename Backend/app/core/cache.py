@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Hashable, Optional, Protocol, Tuple
+
+_MISSING = object()
+
+class LRUTTLCache:
+    """Bounded in-process cache: least recently used entries are evicted once
+    ``max_entries`` is reached, and entries older than ``ttl`` seconds (or the
+    ttl given to ``set``) are treated as misses. Safe to share between threads."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+class SharedCacheBackend(Protocol):
+    """A cache shared between processes/replicas. Values are JSON strings."""
+
+    def get(self, key: str) -> Optional[str]: ...
+
+    def set(self, key: str, value: str, ttl: float) -> None: ...
+
+class MemoryCacheBackend:
+    """Local stand-in for a shared backend (``memory://``), for single-process
+    runs and development without a Redis server."""
+
+    def __init__(self):
+        self._cache = LRUTTLCache(max_entries=10_000, ttl=float("inf"))
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self._cache.set(key, value, ttl)
+
+class RedisCacheBackend:
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("A redis:// cache URL needs the 'redis' package installed") from exc
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._client.get(key)
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self._client.set(key, value, px=max(1, int(ttl * 1000)))
+
+def shared_backend_from_url(url: Optional[str]) -> Optional[SharedCacheBackend]:
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryCacheBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCacheBackend(url)
+    raise ValueError(f"Unsupported cache URL: {url}")
+
+def _json_default(value: Any) -> Any:
+    # Shared entries are re-served as-is, so encode datetimes the way the API
+    # response encoder would.
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default, separators=(",", ":"))
+
+def loads(value: str) -> Any:
+    return json.loads(value)
@@ -0,0 +1,632 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.buckets import BUCKET_ORIGIN, parse_grouping
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.defect_masks import DEFECT_TYPES
+from app.models.product_inspection import ProductInspection
+from app.repositories.column_store_repository import FIELDS, ColumnStoreRepository
+from app.repositories.watermark_repository import Watermark, WatermarkRepository
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Rows per block of the sorted segment. Per block and machine the segment
+# keeps running sums of the aggregated columns, so a range aggregate reads two
+# block sums plus at most two blocks of rows at its edges.
+BLOCK_ROWS = 4096
+
+# Appended rows are kept unsorted in a tail that every query scans; past this
+# many they are merged into the sorted segment in the background.
+TAIL_ROWS = 50000
+
+# Sums kept per machine for range aggregates.
+STATS = [
+    "inspections", "defects",
+    "cycle_time_sum", "cycle_time_count",
+    "injection_pressure_sum", "injection_pressure_count",
+    "barrel_temp_sum", "barrel_temp_count",
+]
+MEASURES = ["cycle_time", "injection_pressure", "barrel_temp"]
+
+# Per machine: STATS, and the defects of each of DEFECT_TYPES.
+RangeStats = Tuple[np.ndarray, np.ndarray]
+
+def to_micros(value: datetime) -> int:
+    """Microseconds since the epoch of a timestamp value. Aware datetimes are
+    taken in UTC, as the database session compares them."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // MICROSECOND
+
+def from_micros(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(value))
+
+class Columns:
+    """Inspections as parallel arrays in no particular order, plus the defect
+    types found more than once on an inspection (keyed by its id), which its
+    defect mask cannot count."""
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        timestamps: np.ndarray,
+        machines: np.ndarray,
+        masks: np.ndarray,
+        defects: np.ndarray,
+        measures: Dict[str, np.ndarray],
+        repeat_ids: np.ndarray,
+        repeat_types: np.ndarray,
+        repeat_counts: np.ndarray,
+    ):
+        self.ids = ids
+        self.timestamps = timestamps
+        self.machines = machines
+        self.masks = masks
+        self.defects = defects
+        self.measures = measures
+        self.repeat_ids = repeat_ids
+        self.repeat_types = repeat_types
+        self.repeat_counts = repeat_counts
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray, repeats: Sequence[Tuple[int, str, int]] = ()) -> "Columns":
+        """From ``ColumnStoreRepository.rows`` and ``repeated_defects``. Types
+        outside DEFECT_TYPES have no mask bit and are not counted."""
+        field = {name: rows[:, i] for i, name in enumerate(FIELDS)}
+        extra = [(i, DEFECT_TYPES.index(t), count - 1) for i, t, count in repeats if t in DEFECT_TYPES]
+        return cls(
+            ids=field["id"].astype(np.int32),
+            timestamps=field["timestamp"].astype(np.int64),
+            machines=field["machine"].astype(np.int16),
+            masks=field["defect_mask"].astype(np.int32),
+            defects=field["defect_count"].astype(np.int16),
+            measures={name: np.ascontiguousarray(field[name]) for name in MEASURES},
+            repeat_ids=np.array([e[0] for e in extra], dtype=np.int32),
+            repeat_types=np.array([e[1] for e in extra], dtype=np.int64),
+            repeat_counts=np.array([e[2] for e in extra], dtype=np.int64),
+        )
+
+    @classmethod
+    def empty(cls) -> "Columns":
+        return cls.from_rows(np.empty((0, len(FIELDS))))
+
+    @classmethod
+    def concat(cls, parts: Sequence["Columns"]) -> "Columns":
+        return cls(
+            ids=np.concatenate([p.ids for p in parts]),
+            timestamps=np.concatenate([p.timestamps for p in parts]),
+            machines=np.concatenate([p.machines for p in parts]),
+            masks=np.concatenate([p.masks for p in parts]),
+            defects=np.concatenate([p.defects for p in parts]),
+            measures={name: np.concatenate([p.measures[name] for p in parts]) for name in MEASURES},
+            repeat_ids=np.concatenate([p.repeat_ids for p in parts]),
+            repeat_types=np.concatenate([p.repeat_types for p in parts]),
+            repeat_counts=np.concatenate([p.repeat_counts for p in parts]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def take(self, rows: np.ndarray) -> "Columns":
+        keep = np.isin(self.repeat_ids, self.ids[rows]) if len(self.repeat_ids) else slice(None)
+        return Columns(
+            self.ids[rows], self.timestamps[rows], self.machines[rows], self.masks[rows], self.defects[rows],
+            {name: values[rows] for name, values in self.measures.items()},
+            self.repeat_ids[keep], self.repeat_types[keep], self.repeat_counts[keep],
+        )
+
+    def nbytes(self) -> int:
+        arrays = [self.ids, self.timestamps, self.machines, self.masks, self.defects, *self.measures.values()]
+        return sum(a.nbytes for a in arrays)
+
+def _aggregate(columns: Columns, rows, cells: np.ndarray, size: int, repeats: np.ndarray, repeat_cells: np.ndarray) -> RangeStats:
+    """STATS and defects per type of ``columns[rows]``, summed into ``size``
+    cells by ``cells`` (one per row). ``repeats`` index the columns' repeated
+    defects that fall on those rows, ``repeat_cells`` gives their cells."""
+    defects, masks = columns.defects[rows], columns.masks[rows]
+    stats = [np.bincount(cells, minlength=size), np.bincount(cells, weights=defects, minlength=size)]
+    for name in MEASURES:
+        values = columns.measures[name][rows]
+        valid = ~np.isnan(values)
+        stats.append(np.bincount(cells[valid], weights=values[valid], minlength=size))
+        stats.append(np.bincount(cells[valid], minlength=size))
+
+    defective = masks != 0
+    masks, defective_cells = masks[defective], cells[defective]
+    types = np.stack(
+        [np.bincount(defective_cells, weights=(masks >> bit) & 1, minlength=size) for bit in range(len(DEFECT_TYPES))],
+        axis=1,
+    )
+    np.add.at(types, (repeat_cells, columns.repeat_types[repeats]), columns.repeat_counts[repeats])
+    return np.stack(stats, axis=1).astype(np.float64), types
+
+class Segment:
+    """Columns with their repeated defects resolved to row positions; with
+    ``indexed``, sorted by timestamp and indexed for range aggregates.
+
+    The index is a permutation listing each machine's rows in order, a running
+    defect count, and per block of BLOCK_ROWS rows and machine the running
+    sums of STATS and of the defects per type. Nothing is modified once built,
+    so readers need no lock.
+    """
+
+    def __init__(self, columns: Columns, machine_count: int, indexed: bool):
+        if indexed:
+            columns = columns.take(np.argsort(columns.timestamps, kind="stable"))
+        self.columns = columns
+        self.machine_count = machine_count
+        self.indexed = indexed
+        self.repeat_rows = np.empty(0, dtype=np.int64)
+        if len(columns.repeat_ids):
+            by_id = np.argsort(columns.ids)
+            self.repeat_rows = by_id[np.searchsorted(columns.ids, columns.repeat_ids, sorter=by_id)]
+        if indexed:
+            self._index()
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def _index(self) -> None:
+        c, m = self.columns, self.machine_count
+        self.by_machine = np.argsort(c.machines, kind="stable").astype(np.int32)
+        self.machine_starts = np.searchsorted(c.machines[self.by_machine], np.arange(m + 1))
+        self.defects_cum = np.concatenate([[0], np.cumsum(c.defects, dtype=np.int64)])
+
+        blocks = -(-len(c) // BLOCK_ROWS)
+        cells = np.arange(len(c)) // BLOCK_ROWS * m + c.machines
+        repeats = np.arange(len(self.repeat_rows))
+        stats, types = _aggregate(c, slice(None), cells, blocks * m, repeats, cells[self.repeat_rows])
+        self.block_stats = np.zeros((blocks + 1, m, len(STATS)))
+        np.cumsum(stats.reshape(blocks, m, len(STATS)), axis=0, out=self.block_stats[1:])
+        self.block_types = np.zeros((blocks + 1, m, len(DEFECT_TYPES)))
+        np.cumsum(types.reshape(blocks, m, len(DEFECT_TYPES)), axis=0, out=self.block_types[1:])
+
+    def nbytes(self) -> int:
+        size = self.columns.nbytes()
+        if self.indexed:
+            size += self.by_machine.nbytes + self.defects_cum.nbytes + self.block_stats.nbytes + self.block_types.nbytes
+        return size
+
+    def bounds(self, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        """Positions ``[lo, hi)`` of the rows in the inclusive range."""
+        ts = self.columns.timestamps
+        lo = int(np.searchsorted(ts, start, "left")) if start is not None else 0
+        hi = int(np.searchsorted(ts, end, "right")) if end is not None else len(ts)
+        return lo, max(lo, hi)
+
+    def select(self, start: Optional[int], end: Optional[int], machine: Optional[int] = None) -> np.ndarray:
+        """Positions of the rows in the inclusive range, found by scanning."""
+        c = self.columns
+        keep = np.ones(len(c), dtype=bool)
+        if start is not None: keep &= c.timestamps >= start
+        if end is not None: keep &= c.timestamps <= end
+        if machine is not None: keep &= c.machines == machine
+        return np.flatnonzero(keep)
+
+    def machine_rows(self, machine: int, lo: int, hi: int) -> np.ndarray:
+        """Positions of ``machine``'s rows within ``[lo, hi)``, in order."""
+        if machine >= self.machine_count:
+            return np.empty(0, dtype=np.int32)
+        rows = self.by_machine[self.machine_starts[machine]:self.machine_starts[machine + 1]]
+        return rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)]
+
+    def stats(self, rows: np.ndarray, machine_count: int) -> RangeStats:
+        """Per machine STATS and defects per type of ``rows``."""
+        cells = self.columns.machines[rows].astype(np.int64)
+        repeats = np.flatnonzero(np.isin(self.repeat_rows, rows)) if len(self.repeat_rows) else np.empty(0, dtype=np.int64)
+        repeat_cells = self.columns.machines[self.repeat_rows[repeats]].astype(np.int64)
+        return _aggregate(self.columns, rows, cells, machine_count, repeats, repeat_cells)
+
+    def range_stats(self, lo: int, hi: int, machine_count: int) -> RangeStats:
+        """Per machine STATS and defects per type of the rows in ``[lo, hi)``:
+        whole blocks from the running sums, the rows at the edges directly."""
+        first, last = -(-lo // BLOCK_ROWS), hi // BLOCK_ROWS
+        if first >= last:
+            return self.stats(np.arange(lo, hi), machine_count)
+        m = self.machine_count
+        stats, types = self.stats(np.r_[lo:first * BLOCK_ROWS, last * BLOCK_ROWS:hi], machine_count)
+        stats[:m] += self.block_stats[last] - self.block_stats[first]
+        types[:m] += self.block_types[last] - self.block_types[first]
+        return stats, types
+
+def _sorted_buckets(timestamps: np.ndarray, defects_cum: np.ndarray, width: int, origin: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bucket numbers, inspections and defects of the non-empty buckets over
+    sorted ``timestamps``; ``defects_cum`` is the running defect count, one
+    longer. Bucket edges are binary searched when there are fewer buckets
+    than rows, and otherwise found by comparing neighbouring rows."""
+    n = len(timestamps)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    first, last = (timestamps[0] - origin) // width, (timestamps[-1] - origin) // width
+    if last - first < n:
+        buckets = np.arange(first, last + 1)
+        edges = np.append(np.searchsorted(timestamps, origin + buckets * width, "left"), n)
+    else:
+        numbers = (timestamps - origin) // width
+        edges = np.concatenate([[0], np.flatnonzero(numbers[1:] != numbers[:-1]) + 1, [n]])
+        buckets = numbers[edges[:-1]]
+    counts = np.diff(edges)
+    defects = np.diff(defects_cum[edges])
+    keep = counts > 0
+    return buckets[keep], counts[keep], defects[keep]
+
+class Snapshot:
+    """A consistent view of the store as of ``watermark``: the machine
+    dictionary, the sorted segment and the unsorted tail. Queries take
+    inclusive datetime ranges, either end open, like the SQL repositories."""
+
+    def __init__(self, machines: List[str], main: Segment, tail: Segment, watermark: Watermark, last_id: int):
+        self.machines = machines
+        self.codes = {machine: code for code, machine in enumerate(machines)}
+        self.main = main
+        self.tail = tail
+        self.watermark = watermark
+        self.last_id = last_id
+
+    def __len__(self) -> int:
+        return len(self.main) + len(self.tail)
+
+    def _range(self, start_date: Optional[datetime], end_date: Optional[datetime]) -> Tuple[Optional[int], Optional[int]]:
+        return (to_micros(start_date) if start_date else None, to_micros(end_date) if end_date else None)
+
+    def _code(self, machine_id: Optional[str]) -> Optional[int]:
+        """The code of ``machine_id``, None without one, -1 if never seen."""
+        return self.codes.get(machine_id, -1) if machine_id else None
+
+    def totals(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> RangeStats:
+        start, end = self._range(start_date, end_date)
+        stats, types = self.main.range_stats(*self.main.bounds(start, end), len(self.machines))
+        if len(self.tail):
+            tail_stats, tail_types = self.tail.stats(self.tail.select(start, end), len(self.machines))
+            stats, types = stats + tail_stats, types + tail_types
+        return stats, types
+
+    def first_last(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ) -> Tuple[Optional[datetime], Optional[datetime]]:
+        start, end = self._range(start_date, end_date)
+        code = self._code(machine_id)
+        if code == -1:
+            return None, None
+        lo, hi = self.main.bounds(start, end)
+        rows = self.main.machine_rows(code, lo, hi) if code is not None else np.arange(lo, hi)
+        timestamps = [self.main.columns.timestamps[rows[[0, -1]]]] if len(rows) else []
+        tail_rows = self.tail.select(start, end, code)
+        if len(tail_rows):
+            timestamps.append(self.tail.columns.timestamps[tail_rows])
+        if not timestamps:
+            return None, None
+        timestamps = np.concatenate(timestamps)
+        return from_micros(timestamps.min()), from_micros(timestamps.max())
+
+    def trends(
+        self,
+        grouping: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ) -> List[Tuple[datetime, int, int]]:
+        """``(bucket start, inspections, defects)`` per non-empty bucket, in order."""
+        width, origin = parse_grouping(grouping) // MICROSECOND, to_micros(BUCKET_ORIGIN)
+        start, end = self._range(start_date, end_date)
+        code = self._code(machine_id)
+        if code == -1:
+            return []
+        main = self.main
+        lo, hi = main.bounds(start, end)
+        if code is None:
+            timestamps, defects_cum = main.columns.timestamps[lo:hi], main.defects_cum[lo:hi + 1]
+        else:
+            rows = main.machine_rows(code, lo, hi)
+            timestamps = main.columns.timestamps[rows]
+            defects_cum = np.concatenate([[0], np.cumsum(main.columns.defects[rows], dtype=np.int64)])
+        buckets, counts, defects = _sorted_buckets(timestamps, defects_cum, width, origin)
+
+        tail_rows = self.tail.select(start, end, code)
+        if len(tail_rows):
+            tail_buckets = (self.tail.columns.timestamps[tail_rows] - origin) // width
+            buckets, positions = np.unique(np.concatenate([buckets, tail_buckets]), return_inverse=True)
+            counts = np.bincount(positions, weights=np.concatenate([counts, np.ones(len(tail_rows))]))
+            defects = np.bincount(positions, weights=np.concatenate([defects, self.tail.columns.defects[tail_rows]]))
+        return [(from_micros(origin + b * width), int(c), int(d)) for b, c, d in zip(buckets, counts, defects)]
+
+    def machine_performance(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> List[Tuple[str, Optional[float], Optional[float], Optional[float], int, int]]:
+        """``(machine, average cycle time, injection pressure and barrel
+        temperature, inspections, defects)`` per machine with inspections in
+        range, by machine. Averages skip missing values; None if all are."""
+        stats, _ = self.totals(start_date, end_date)
+        rows = []
+        for code in sorted(np.flatnonzero(stats[:, 0]), key=lambda c: self.machines[c]):
+            s = stats[code]
+            averages = [s[i] / s[i + 1] if s[i + 1] else None for i in (2, 4, 6)]
+            rows.append((self.machines[code], *averages, int(s[0]), int(s[1])))
+        return rows
+
+    def cycle_time_percentiles(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> Dict[str, Tuple[float, float]]:
+        """Per machine with cycle times in range, their median and 95th
+        percentile, interpolated as ``percentile_cont`` does."""
+        start, end = self._range(start_date, end_date)
+        lo, hi = self.main.bounds(start, end)
+        percentiles = {}
+        for code, machine in enumerate(self.machines):
+            values = self.main.columns.measures["cycle_time"][self.main.machine_rows(code, lo, hi)]
+            if len(self.tail):
+                values = np.concatenate([values, self.tail.columns.measures["cycle_time"][self.tail.select(start, end, code)]])
+            values = values[~np.isnan(values)]
+            if len(values):
+                p50, p95 = np.percentile(values, [50, 95])
+                percentiles[machine] = (float(p50), float(p95))
+        return percentiles
+
+    def defect_distribution(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ) -> List[Tuple[str, int]]:
+        """``(defect type, defects)`` per type found in range, most first."""
+        code = self._code(machine_id)
+        if code == -1:
+            return []
+        _, types = self.totals(start_date, end_date)
+        counts = types[code] if code is not None else types.sum(axis=0)
+        found = [(DEFECT_TYPES[t], int(counts[t])) for t in np.flatnonzero(counts)]
+        return sorted(found, key=lambda row: (-row[1], row[0]))
+
+    def summary(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> Tuple[int, int, int, Optional[datetime], Optional[datetime]]:
+        """``(inspections, defects, machines, first, last timestamp)`` in range."""
+        stats, _ = self.totals(start_date, end_date)
+        first, last = self.first_last(start_date, end_date)
+        return int(stats[:, 0].sum()), int(stats[:, 1].sum()), int(np.count_nonzero(stats[:, 0])), first, last
+
+def _newer(watermark: Watermark, than: Watermark) -> bool:
+    # Generation first, since deletes can lower the newest id.
+    return (watermark[1], watermark[0]) > (than[1], than[0])
+
+class ColumnStore:
+    """In-process columnar copy of the inspections the dashboard aggregates
+    read: per inspection its timestamp (int64 microseconds), machine (an index
+    into a dictionary of machine ids), defect mask and count, cycle time,
+    injection pressure and barrel temperature.
+
+    Loaded in the background at startup, after which ``snapshot`` keeps it
+    current: whenever the data watermark moves, inspections past the newest
+    one loaded are appended, together with any of the last ``lookback`` ids
+    still missing (concurrent writers can commit ids out of order). Deleted or
+    rewritten rows are only picked up by a full reload: every
+    ``reload_seconds``, or as soon as the newest id goes backwards or a month
+    is dropped or detached by retention.
+    """
+
+    def __init__(self, lookback: int, reload_seconds: float):
+        self.lookback = lookback
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Snapshot] = None
+        self._job: Optional[threading.Thread] = None
+        # Advanced by every full load, so a merge started before one is dropped.
+        self._epoch = 0
+        self._loaded_at = 0.0
+        # [start, end) of every inspection partition seen since the last load.
+        self._months: Set[Tuple[datetime, datetime]] = set()
+        self.loads = 0
+        self.appends = 0
+        self.merges = 0
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def start(self) -> None:
+        with self._lock:
+            self._background(self._reload)
+
+    def _background(self, target: Callable[[], None]) -> None:
+        # One load or merge at a time; callers hold the lock.
+        if self._job is not None and self._job.is_alive():
+            return
+        self._job = threading.Thread(target=target, name="column-store", daemon=True)
+        self._job.start()
+
+    def _reload(self) -> None:
+        session = SessionLocal()
+        try:
+            self.load(session)
+        except Exception:
+            logger.exception("Column store load failed")
+        finally:
+            session.close()
+
+    def _read(self, repo: ColumnStoreRepository, machines: List[str], *conditions) -> Columns:
+        """The inspections matching ``conditions``; machines not yet in the
+        dictionary ``machines`` are added to it."""
+        found, first, last = repo.machines(*conditions)
+        if not found:
+            return Columns.empty()
+        machines.extend(sorted(set(found) - set(machines)))
+        rows = repo.rows(machines, *conditions, start_date=first, end_date=last)
+        masks = rows[:, FIELDS.index("defect_mask")].astype(np.int32)
+        repeated = rows[:, FIELDS.index("defect_count")] > np.bitwise_count(masks)
+        repeats = repo.repeated_defects(rows[repeated, FIELDS.index("id")], first, last)
+        return Columns.from_rows(rows, repeats)
+
+    def load(self, db: Session, through_id: Optional[int] = None) -> Snapshot:
+        """Read every inspection up to the current watermark, one partition
+        at a time, and replace the snapshot with them. ``through_id`` stops
+        short of the watermark, leaving later inspections to be appended."""
+        started = time.perf_counter()
+        watermark = WatermarkRepository(db).current()
+        if through_id is not None and through_id < watermark[0]:
+            watermark = (through_id, watermark[1])
+        repo = ColumnStoreRepository(db)
+        machines: List[str] = []
+        months = repo.months()
+        parts = [
+            self._read(repo, machines, ProductInspection.timestamp >= start, ProductInspection.timestamp < end, ProductInspection.id <= watermark[0])
+            for start, end in months
+        ]
+        columns = Columns.concat(parts) if parts else Columns.empty()
+        snapshot = Snapshot(
+            machines,
+            Segment(columns, len(machines), indexed=True),
+            Segment(Columns.empty(), len(machines), indexed=False),
+            watermark,
+            int(columns.ids.max()) if len(columns) else 0,
+        )
+        with self._lock:
+            self._epoch += 1
+            self._snapshot = snapshot
+            self._months = set(months)
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+        self.load_seconds = time.perf_counter() - started
+        logger.info("Column store loaded %d inspections in %.1fs", len(snapshot), self.load_seconds)
+        return snapshot
+
+    def snapshot(self, db: Session) -> Optional[Snapshot]:
+        """The store brought up to the current watermark, or None while it is
+        (re)loading and queries should go to the database instead.
+
+        New rows are read without holding the lock, so concurrent queries keep
+        answering from the current snapshot meanwhile, and are added to
+        whichever snapshot is current once read."""
+        watermark = WatermarkRepository(db).current()
+        with self._lock:
+            snapshot, epoch = self._snapshot, self._epoch
+            if snapshot is None:
+                self._background(self._reload)
+                return None
+            if self.reload_seconds and time.monotonic() - self._loaded_at > self.reload_seconds:
+                self._background(self._reload)
+        # Requests racing an ingest can report an older watermark; the
+        # snapshot is at least as new as those.
+        if not _newer(watermark, snapshot.watermark):
+            return snapshot
+        # Retention drops or detaches whole months and bumps only the
+        # generation, so the newest id says nothing about it.
+        if watermark[0] < snapshot.watermark[0] or self._months_removed(db, epoch):
+            self._invalidate(epoch)
+            return None
+
+        machines = list(snapshot.machines)
+        columns = self._read_new(db, snapshot, watermark, machines)
+        with self._lock:
+            current = self._snapshot
+            if current is None or self._epoch != epoch:
+                return current if current is not None and not _newer(watermark, current.watermark) else None
+            if not _newer(watermark, current.watermark):
+                return current
+            snapshot = self._snapshot = self._add(current, snapshot, columns, machines, watermark)
+            if len(snapshot.tail) > TAIL_ROWS:
+                self._background(self._merge)
+            return snapshot
+
+    def _invalidate(self, epoch: int) -> None:
+        with self._lock:
+            if self._epoch == epoch:
+                self._snapshot = None
+                self._background(self._reload)
+
+    def _months_removed(self, db: Session, epoch: int) -> bool:
+        """Whether a month the store may hold rows of has lost its partition."""
+        months = set(ColumnStoreRepository(db).months())
+        with self._lock:
+            if self._epoch != epoch:
+                return False
+            removed = bool(self._months - months)
+            self._months |= months
+            return removed
+
+    def _read_new(self, db: Session, snapshot: Snapshot, watermark: Watermark, machines: List[str]) -> Columns:
+        """Inspections up to ``watermark`` past the snapshot's newest id, and
+        any of the last ``lookback`` ids it is missing."""
+        floor = max(snapshot.last_id - self.lookback, 0)
+        loaded = [segment.columns.ids for segment in (snapshot.main, snapshot.tail)]
+        recent = np.concatenate([ids[ids > floor] for ids in loaded])
+        missing = np.setdiff1d(np.arange(floor + 1, snapshot.last_id + 1), recent)
+
+        repo = ColumnStoreRepository(db)
+        return self._read(repo, machines, repo.after_id(snapshot.last_id, missing), ProductInspection.id <= watermark[0])
+
+    def _add(self, current: Snapshot, read_from: Snapshot, columns: Columns, machines: List[str], watermark: Watermark) -> Snapshot:
+        """``current`` with ``columns``, read against ``read_from``, appended
+        to its tail. If another query or a merge replaced the snapshot
+        meanwhile, the columns' machine codes (indexes into ``machines``) are
+        translated to the current dictionary and rows it already has dropped."""
+        if not len(columns):
+            return Snapshot(current.machines, current.main, current.tail, watermark, current.last_id)
+        names = machines
+        if current is not read_from:
+            names = list(current.machines)
+            names.extend(m for m in machines[len(read_from.machines):] if m not in current.codes)
+            codes = {machine: code for code, machine in enumerate(names)}
+            columns.machines = np.array([codes[m] for m in machines], dtype=np.int16)[columns.machines]
+            low = int(columns.ids.min())
+            stored = np.concatenate([ids[ids >= low] for ids in (current.main.columns.ids, current.tail.columns.ids)])
+            columns = columns.take(np.flatnonzero(~np.isin(columns.ids, stored)))
+        self.appends += 1
+        tail = Segment(Columns.concat([current.tail.columns, columns]), len(names), indexed=False)
+        last_id = max(current.last_id, int(columns.ids.max())) if len(columns) else current.last_id
+        return Snapshot(names, current.main, tail, watermark, last_id)
+
+    def _merge(self) -> None:
+        """Fold the tail into a new sorted segment. Rows appended meanwhile
+        stay in the tail."""
+        with self._lock:
+            snapshot, epoch = self._snapshot, self._epoch
+        if snapshot is None:
+            return
+        merged = len(snapshot.tail)
+        main = Segment(Columns.concat([snapshot.main.columns, snapshot.tail.columns]), len(snapshot.machines), indexed=True)
+        with self._lock:
+            current = self._snapshot
+            if current is None or self._epoch != epoch:
+                return
+            rest = current.tail.columns.take(np.arange(merged, len(current.tail)))
+            tail = Segment(rest, len(current.machines), indexed=False)
+            self._snapshot = Snapshot(current.machines, main, tail, current.watermark, current.last_id)
+            self.merges += 1
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "ready": snapshot is not None,
+            "loading": self._job is not None and self._job.is_alive(),
+            "inspections": len(snapshot) if snapshot else 0,
+            "tail_inspections": len(snapshot.tail) if snapshot else 0,
+            "machines": len(snapshot.machines) if snapshot else 0,
+            "bytes": snapshot.main.nbytes() + snapshot.tail.nbytes() if snapshot else 0,
+            "watermark": list(snapshot.watermark) if snapshot else None,
+            "loads": self.loads,
+            "appends": self.appends,
+            "merges": self.merges,
+            "last_load_seconds": round(self.load_seconds, 2) if self.load_seconds is not None else None,
+        }
+
+column_store = ColumnStore(settings.ANALYTICS_COLUMN_STORE_LOOKBACK, settings.ANALYTICS_COLUMN_STORE_RELOAD_SECONDS)
@@ -1,3 +1,4 @@
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -5,6 +6,46 @@ class Settings(BaseSettings):
     ENV: str = "local"
     DEBUG: bool = True
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    # Threads allowed to run database work for async handlers at once;
+    # defaults to the pool size so offloaded calls never queue on the pool.
+    DB_THREADPOOL_SIZE: Optional[int] = None
+    ANALYTICS_USE_ROLLUPS: bool = True
+    ANALYTICS_CACHE_ENABLED: bool = True
+    ANALYTICS_CACHE_MAX_ENTRIES: int = 512
+    ANALYTICS_CACHE_TTL_SECONDS: float = 300.0
+    ANALYTICS_CACHE_URL: Optional[str] = None
+    # "columnar" answers trends, machine performance, distribution and summary
+    # from an in-process NumPy copy of the inspections (app.core.column_store)
+    # instead of Postgres. The store re-reads this many ids behind its newest
+    # one on each refresh, for rows committed out of order, and reloads in
+    # full this often to pick up deleted or rewritten rows.
+    ANALYTICS_ENGINE: Literal["sql", "columnar"] = "sql"
+    ANALYTICS_COLUMN_STORE_LOOKBACK: int = 10000
+    ANALYTICS_COLUMN_STORE_RELOAD_SECONDS: float = 3600.0
+    # Seconds browsers and the nginx proxy cache may reuse an analytics
+    # response before revalidating it with its ETag.
+    ANALYTICS_HTTP_MAX_AGE: int = 5
+    # Rows fetched per server-side cursor round trip by bulk exports; also the
+    # Parquet row group size.
+    EXPORT_BATCH_SIZE: int = 10000
+    # HTTP ingestion (POST /api/inspections): records queued in process before
+    # producers get 429, records per write transaction, how long a partial
+    # batch may wait, and the number of writer threads.
+    INGEST_QUEUE_SIZE: int = 50000
+    INGEST_BATCH_SIZE: int = 1000
+    INGEST_BATCH_MAX_WAIT_MS: int = 200
+    INGEST_WRITERS: int = 2
+    # Server-Sent Events feed of ingest deltas (/api/analytics/live).
+    LIVE_UPDATES_ENABLED: bool = True
+    # Messages queued per subscriber before it is resynced with a snapshot.
+    LIVE_QUEUE_SIZE: int = 100
+    LIVE_RESYNC_SECONDS: float = 300.0
+    LIVE_HEARTBEAT_SECONDS: float = 15.0
+    # Prometheus metrics at /metrics: request latency by route, pool and
+    # thread gauges, repository and SQL time by method, ingest counters.
+    METRICS_ENABLED: bool = True
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", case_sensitive=True,)
 
@@ -0,0 +1,203 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Select
+
+from app.core.defect_masks import DEFECT_TYPES
+
+class ParameterDefectStats:
+    """Streaming sufficient statistics relating process parameters to defect
+    types for one machine.
+
+    Batches of rows arrive as a parameter matrix (rows x parameters, NaN for
+    missing values) and a 0/1 defect matrix (rows x defect types); each update
+    is a handful of column sums and two matrix products, so memory is bounded
+    by the batch size however many rows are streamed. Values are shifted by
+    the first batch's column means before summing to keep the variances
+    accurate over millions of rows.
+
+    Equal-width bins between the known per-parameter ``lower``/``upper``
+    bounds count inspections and defects so defect rates can be reported
+    across each parameter's range.
+    """
+
+    def __init__(self, lower: np.ndarray, upper: np.ndarray, bins: int):
+        parameters, defect_types = len(lower), len(DEFECT_TYPES)
+        self.bins = bins
+        # Parameters never set in range have NaN bounds; they get no valid cells.
+        self.lower = np.nan_to_num(lower)
+        self.width = np.where(upper > lower, (upper - lower) / bins, 1.0)
+        self.shift = None
+        self.rows = 0
+        self.defects = np.zeros(defect_types)
+        self.n = np.zeros(parameters)
+        self.sx = np.zeros(parameters)
+        self.sxx = np.zeros(parameters)
+        self.sy = np.zeros((parameters, defect_types))
+        self.sxy = np.zeros((parameters, defect_types))
+        self.bin_rows = np.zeros(parameters * bins)
+        self.bin_defects = np.zeros((defect_types, parameters * bins))
+
+    def update(self, x: np.ndarray, y: np.ndarray) -> None:
+        missing = np.isnan(x)
+        valid = ~missing
+        if self.shift is None:
+            counts = valid.sum(axis=0)
+            self.shift = np.where(counts > 0, np.nansum(x, axis=0) / np.maximum(counts, 1), 0.0)
+        xc = x - self.shift
+        xc[missing] = 0.0
+
+        self.rows += len(x)
+        self.defects += y.sum(axis=0)
+        self.n += valid.sum(axis=0)
+        self.sx += xc.sum(axis=0)
+        self.sxx += np.einsum("ij,ij->j", xc, xc)
+        self.sy += valid.T.astype(np.float64) @ y
+        self.sxy += xc.T @ y
+
+        # Flat (parameter, bin) index per cell; missing cells are masked out
+        # below, so whatever their NaN casts to is never counted.
+        scaled = (x - self.lower) / self.width
+        np.clip(scaled, 0, self.bins - 1, out=scaled)
+        with np.errstate(invalid="ignore"):
+            flat = scaled.astype(np.int64) + np.arange(x.shape[1]) * self.bins
+        self.bin_rows += np.bincount(flat[valid], minlength=self.bin_rows.size)
+        for d in np.flatnonzero(y.any(axis=0)):
+            hit = y[:, d] > 0
+            self.bin_defects[d] += np.bincount(flat[hit][valid[hit]], minlength=self.bin_rows.size)
+
+    def scores(self) -> Dict[str, np.ndarray]:
+        """Point-biserial correlation (Pearson's r against the 0/1 defect
+        indicator), its t statistic and the parameter means with and without
+        the defect, each parameters x defect types. NaN where undefined."""
+        n, sx, sxx = self.n[:, None], self.sx[:, None], self.sxx[:, None]
+        sy, sxy = self.sy, self.sxy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (sy * (n - sy)))
+            t = r * np.sqrt((n - 2) / (1 - r * r))
+            shift = self.shift[:, None] if self.shift is not None else 0.0
+            mean_with = shift + sxy / sy
+            mean_without = shift + (sx - sxy) / (n - sy)
+        return {"correlation": r, "t_statistic": t, "mean_with_defect": mean_with, "mean_without_defect": mean_without}
+
+    def binned_rates(self, parameter: int, defect_type: int) -> List[Dict[str, Any]]:
+        span = slice(parameter * self.bins, (parameter + 1) * self.bins)
+        rows, defects = self.bin_rows[span], self.bin_defects[defect_type, span]
+        lower, width = self.lower[parameter], self.width[parameter]
+        return [
+            {
+                "lower": _finite(lower + i * width),
+                "upper": _finite(lower + (i + 1) * width),
+                "inspections": int(rows[i]),
+                "defect_rate": round(float(defects[i] / rows[i]) * 100, 2) if rows[i] else None,
+            }
+            for i in range(self.bins)
+        ]
+
+# Binary COPY framing: a 19-byte header (signature, flags, extension length),
+# then per row an int16 field count and an int32 length before each value.
+COPY_HEADER = 19
+COPY_TRAILER = 2
+
+class _FloatRowSink:
+    """File-like target for ``COPY ... TO STDOUT (FORMAT binary)`` of rows
+    whose columns are all non-null float8. Chunks accumulate until
+    ``batch_rows`` rows are buffered, which are then decoded with one
+    ``np.frombuffer`` and passed to ``handle`` as a rows x width matrix."""
+
+    def __init__(self, width: int, batch_rows: int, handle: Callable[[np.ndarray], None]):
+        self.dtype = np.dtype([("fields", ">i2"), ("values", [("length", ">i4"), ("value", ">f8")], (width,))])
+        self.batch_bytes = batch_rows * self.dtype.itemsize
+        self.handle = handle
+        self.chunks: List[bytes] = []
+        self.size = 0
+        self.started = False
+
+    def write(self, data) -> int:
+        # Called once per row, so it only buffers.
+        self.chunks.append(data)
+        self.size += len(data)
+        if self.size >= self.batch_bytes + COPY_HEADER:
+            self._flush()
+        return len(data)
+
+    def _flush(self, final: bool = False) -> None:
+        buffer = b"".join(self.chunks)
+        if not self.started:
+            extension = int.from_bytes(buffer[15:COPY_HEADER], "big")
+            buffer = buffer[COPY_HEADER + extension:]
+            self.started = True
+        usable = len(buffer) - COPY_TRAILER if final else len(buffer)
+        whole = usable // self.dtype.itemsize * self.dtype.itemsize
+        self.chunks = [buffer[whole:]]
+        self.size = len(buffer) - whole
+        if whole:
+            rows = np.frombuffer(buffer, dtype=self.dtype, count=whole // self.dtype.itemsize)
+            self.handle(rows["values"]["value"].astype(np.float64))
+
+    def close(self) -> None:
+        self._flush(final=True)
+
+def copy_float_rows(
+    connection: Connection,
+    query: Select,
+    width: int,
+    batch_rows: int,
+    handle: Callable[[np.ndarray], None],
+) -> None:
+    """Stream ``query`` (``width`` non-null float8 columns) to ``handle`` in
+    batches of up to ``batch_rows`` rows, inside ``connection``'s transaction.
+
+    Binary COPY skips the per-value text formatting and parsing and the
+    per-row Python objects a cursor fetch costs, which dominate for wide
+    numeric rows: for ~65 parameters over a million inspections this is
+    several times faster than fetching from a server-side cursor.
+    """
+    compiled = query.compile(dialect=connection.dialect)
+    cursor = connection.connection.cursor()
+    try:
+        sql = cursor.mogrify(str(compiled), compiled.params).decode()
+        sink = _FloatRowSink(width, batch_rows, handle)
+        cursor.copy_expert(f"COPY ({sql}) TO STDOUT (FORMAT binary)", sink)
+        sink.close()
+    finally:
+        cursor.close()
+
+def defect_matrix(masks: Sequence[int]) -> np.ndarray:
+    """Expand per-inspection defect bitmasks into a rows x DEFECT_TYPES 0/1 matrix."""
+    bits = np.asarray(masks, dtype=np.int64)
+    return ((bits[:, None] >> np.arange(len(DEFECT_TYPES))) & 1).astype(np.float64)
+
+def _finite(value: float) -> Any:
+    return round(float(value), 4) if np.isfinite(value) else None
+
+def ranked(
+    stats: ParameterDefectStats,
+    parameters: Sequence[str],
+    top: int,
+    min_defects: int = 1,
+    only_type: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """The ``top`` parameters by absolute correlation for each defect type
+    with at least ``min_defects`` defects."""
+    scores = stats.scores()
+    rows = []
+    for d, defect_type in enumerate(DEFECT_TYPES):
+        if (only_type and defect_type != only_type) or stats.defects[d] < min_defects:
+            continue
+        r = scores["correlation"][:, d]
+        order = [p for p in np.argsort(-np.abs(np.nan_to_num(r, nan=0.0))) if np.isfinite(r[p])][:top]
+        for p in order:
+            rows.append({
+                "defect_type": defect_type,
+                "parameter": parameters[p],
+                "correlation": round(float(r[p]), 4),
+                "t_statistic": _finite(scores["t_statistic"][p, d]),
+                "mean_with_defect": _finite(scores["mean_with_defect"][p, d]),
+                "mean_without_defect": _finite(scores["mean_without_defect"][p, d]),
+                "inspections": int(stats.n[p]),
+                "defects": int(stats.sy[p, d]),
+                "bins": stats.binned_rates(p, d),
+            })
+    return rows
@@ -1,10 +1,18 @@
+import functools
+from typing import Any, Callable, Optional, TypeVar
+from anyio import CapacityLimiter, to_thread
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(DATABASE_URL, future=True)
+engine = create_engine(
+    DATABASE_URL,
+    future=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+)
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -23,4 +31,29 @@ def get_db():
         db.close()
 
 def get_engine():
-    return engine
\ No newline at end of file
+    return engine
+
+T = TypeVar("T")
+
+_db_limiter: Optional[CapacityLimiter] = None
+
+def _limiter() -> CapacityLimiter:
+    # Created lazily: a limiter belongs to the running event loop.
+    global _db_limiter
+    if _db_limiter is None:
+        _db_limiter = CapacityLimiter(
+            settings.DB_THREADPOOL_SIZE or settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+        )
+    return _db_limiter
+
+def db_thread_limiter() -> Optional[CapacityLimiter]:
+    """The limiter shared by ``run_in_db_thread``, once the first call has
+    created it."""
+    return _db_limiter
+
+async def run_in_db_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking database work from an async handler without stalling the
+    event loop. Calls share one bounded thread pool sized to the connection
+    pool, so excess requests wait here instead of holding threads that would
+    only block on a pool checkout."""
+    return await to_thread.run_sync(functools.partial(func, *args, **kwargs), limiter=_limiter())
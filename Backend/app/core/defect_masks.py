@@ -0,0 +1,34 @@
+from typing import Iterable, Literal
+
+from sqlalchemy import case, func
+
+from app.schemas.object_detection import ObjectDetectionBase
+
+# Defect types in bit order: bit i of an inspection's ``defect_mask`` is set
+# when any of its detections has a DEFECT_TYPES[i] defect. New types get new
+# bits at the end, so stored masks stay valid; reordering the fields would
+# need the masks backfilled (scripts/defect_masks.py).
+DEFECT_TYPES = [k for k in ObjectDetectionBase.model_fields if k.endswith("_defect")]
+
+DefectType = Literal[tuple(DEFECT_TYPES)]
+
+def defect_bit(defect_type: str) -> int:
+    return 1 << DEFECT_TYPES.index(defect_type)
+
+def mask_of(defect_types: Iterable[str]) -> int:
+    mask = 0
+    for defect_type in defect_types:
+        mask |= defect_bit(defect_type)
+    return mask
+
+def mask_aggregate(defect_type):
+    """SQL aggregate OR-ing together the bits of the ``defect_type`` values."""
+    return func.bit_or(case(
+        {name: 1 << bit for bit, name in enumerate(DEFECT_TYPES)},
+        value=defect_type,
+        else_=0,
+    ))
+
+def has_bits(mask, bits: int):
+    """SQL test that ``mask`` has every bit in ``bits`` set."""
+    return mask.op("&")(bits) == bits
@@ -0,0 +1,107 @@
+import csv
+import io
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Sequence
+
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, DateTime, Float, Integer, String
+
+# Bulk export encodings. Each encoder turns batches of rows into chunks of
+# output as it goes, one chunk per batch, so nothing buffers the whole export.
+ExportFormat = Literal["csv", "ndjson", "parquet"]
+
+MEDIA_TYPES: Dict[str, str] = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def csv_chunks(columns: Sequence[str], batches: Iterable[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def ndjson_chunks(columns: Sequence[str], batches: Iterable[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    for batch in batches:
+        # Appending to one buffer keeps the peak to a single chunk, where
+        # joining a list of per-row strings holds every row twice.
+        chunk = bytearray()
+        for row in batch:
+            chunk += orjson.dumps(dict(zip(columns, row)), option=orjson.OPT_APPEND_NEWLINE)
+        yield bytes(chunk)
+
+class _ChunkSink:
+    """Write-only file for the Parquet writer that hands back what was written
+    since the last ``drain``. The writer records byte offsets in the footer, so
+    ``tell`` counts everything ever written rather than what is buffered."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def _arrow_type(sql_type):
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(sql_type, String):
+        return pa.string()
+    raise TypeError(f"No Parquet type for {sql_type!r}")
+
+def parquet_chunks(columns: Sequence[Any], batches: Iterable[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    """Parquet with one row group per batch; ``columns`` are the selected
+    SQLAlchemy columns, whose types give the schema."""
+    schema = pa.schema([(c.name, _arrow_type(c.type)) for c in columns])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in batches:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+def encode(fmt: ExportFormat, columns: Sequence[Any], batches: Iterable[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    """Chunks of ``batches`` encoded as ``fmt``; ``columns`` are the selected
+    SQLAlchemy columns, in row order."""
+    if fmt == "parquet":
+        return parquet_chunks(columns, batches)
+    names = [c.name for c in columns]
+    if fmt == "ndjson":
+        return ndjson_chunks(names, batches)
+    return csv_chunks(names, batches)
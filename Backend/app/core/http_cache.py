@@ -0,0 +1,53 @@
+import hashlib
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db, run_in_db_thread
+from app.core.responses import ResponseFormat, response_format
+from app.repositories.watermark_repository import WatermarkRepository
+
+def _normalized_query(request: Request) -> str:
+    # Parameter order and empty values do not change the result.
+    items = sorted((k, v) for k, v in request.query_params.multi_items() if v != "")
+    return "&".join(f"{k}={v}" for k, v in items)
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison (RFC 9110 13.1.2): proxies such as nginx's gzip filter
+    turn strong validators into weak ones on the way back to the client."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    fmt: ResponseFormat = Depends(response_format),
+) -> None:
+    """Answer ``If-None-Match`` revalidations from the data watermark alone.
+
+    The ETag hashes the route, the normalized query string, the negotiated
+    format and the watermark, so it changes whenever a repeated request could
+    return something different. A matching request gets ``304 Not Modified`` before any
+    analytics query runs.
+    """
+    watermark = await run_in_db_thread(WatermarkRepository(db).current)
+    digest = hashlib.sha1(
+        f"{request.url.path}?{_normalized_query(request)}|{fmt}|{watermark[0]}:{watermark[1]}".encode()
+    ).hexdigest()[:20]
+    etag = f'"{digest}"'
+
+    headers = {
+        "ETag": etag,
+        # Shared caches may serve the response for a few seconds and must then
+        # revalidate, which costs one watermark read when nothing changed.
+        "Cache-Control": f"public, max-age={settings.ANALYTICS_HTTP_MAX_AGE}, must-revalidate",
+        # The format can be negotiated from Accept.
+        "Vary": "Accept",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
@@ -0,0 +1,222 @@
+import logging
+import math
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import INGEST_BATCH_SECONDS
+from app.repositories.ingest_repository import BAD_RECORD_ERRORS, IngestRepository, write_isolating
+from app.repositories.watermark_repository import WatermarkRepository
+from app.schemas.project_inspection import ProjectInspectionBase
+
+logger = logging.getLogger(__name__)
+
+# Attempts per batch at a transient error before its records are counted as
+# failed and dropped. A record the database rejects for its values is split
+# out of the batch and dropped alone.
+WRITE_ATTEMPTS = 3
+
+# Latencies kept for the percentiles in ``stats``.
+LATENCY_WINDOW = 1000
+
+# Recent batches whose mean write time estimates Retry-After.
+RETRY_SAMPLE = 20
+
+def _percentiles(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "max_ms": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "max_ms": round(ordered[-1] * 1000, 1)}
+
+class IngestWriter:
+    """Bounded in-process queue of validated inspections, drained by
+    background writer threads.
+
+    ``offer`` takes a request's records all or nothing and never blocks, so a
+    full queue turns into an immediate 429 for the producer rather than a
+    stalled event loop. Each writer takes up to ``batch_size`` records once
+    that many are queued or the oldest has waited ``max_wait`` seconds, and
+    writes them with ``IngestRepository.bulk_insert`` in one transaction, as
+    the bulk ingest script does. Concurrent writers are safe: inserts skip
+    natural keys already stored and rollup rows are locked in key order.
+    A batch the database rejects for one record's values is bisected, so
+    the other records, which may be other producers', are still written.
+    """
+
+    def __init__(self, capacity: int, batch_size: int, max_wait: float, writers: int):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.writers = writers
+        self._queue: Deque[Tuple[ProjectInspectionBase, float]] = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.duplicates = 0
+        self.failed = 0
+        # Write attempts that raised, including ones retried successfully.
+        self.errors = 0
+        self.batches = 0
+        self._write_latency: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._queue_latency: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def start(self) -> None:
+        self._stopping = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f"ingest-writer-{i}", daemon=True)
+            for i in range(self.writers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Write out everything queued, then stop the writers."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def offer(self, records: Sequence[ProjectInspectionBase]) -> bool:
+        now = time.monotonic()
+        with self._cond:
+            if self._stopping or len(self._queue) + len(records) > self.capacity:
+                self.rejected += len(records)
+                return False
+            self._queue.extend((record, now) for record in records)
+            self.accepted += len(records)
+            self._cond.notify_all()
+            return True
+
+    def retry_after(self) -> int:
+        """Seconds until the writers have likely drained the queue, from the
+        recent batch write times."""
+        with self._cond:
+            batches = math.ceil(len(self._queue) / self.batch_size)
+            recent = list(self._write_latency)[-RETRY_SAMPLE:]
+        if not recent:
+            return 1
+        return max(1, min(60, math.ceil(batches * statistics.fmean(recent) / max(self.writers, 1))))
+
+    def _take(self) -> Optional[List[Tuple[ProjectInspectionBase, float]]]:
+        with self._cond:
+            while True:
+                if self._queue:
+                    waited = time.monotonic() - self._queue[0][1]
+                    if len(self._queue) >= self.batch_size or waited >= self.max_wait or self._stopping:
+                        count = min(self.batch_size, len(self._queue))
+                        return [self._queue.popleft() for _ in range(count)]
+                    self._cond.wait(self.max_wait - waited)
+                elif self._stopping:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _run(self) -> None:
+        while (batch := self._take()) is not None:
+            self._write(batch)
+
+    def _write(self, batch: List[Tuple[ProjectInspectionBase, float]]) -> None:
+        with INGEST_BATCH_SECONDS.time():
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Tuple[ProjectInspectionBase, float]]) -> None:
+        records = [record for record, _ in batch]
+        # Records dropped after every attempt at a transient error.
+        lost: List[ProjectInspectionBase] = []
+
+        def write(part: Sequence[ProjectInspectionBase]) -> List[int]:
+            ids = self._commit(part)
+            if ids is None:
+                lost.extend(part)
+                return []
+            return ids
+
+        started = time.monotonic()
+        ids, rejected = write_isolating(records, write)
+        finished = time.monotonic()
+
+        for record, exc in rejected:
+            logger.error(
+                "Dropped inspection %s at %s, which the database rejected: %s",
+                record.molding_machine_id, record.timestamp, exc,
+            )
+        failed = len(lost) + len(rejected)
+        with self._cond:
+            self.failed += failed
+            if failed == len(records):
+                return
+            self.batches += 1
+            self.written += len(ids)
+            self.duplicates += len(records) - len(ids) - failed
+            self._write_latency.append(finished - started)
+            self._queue_latency.append(finished - batch[0][1])
+
+    def _commit(self, records: Sequence[ProjectInspectionBase]) -> Optional[List[int]]:
+        """Write ``records`` in one transaction, retrying transient errors;
+        returns the new ids, or None once every attempt has failed. Errors
+        caused by the records' own values are raised at once, for
+        ``write_isolating`` to split the batch around the bad record."""
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            session = SessionLocal()
+            try:
+                ids = IngestRepository(session).bulk_insert(records)
+                session.commit()
+                if ids:
+                    WatermarkRepository(session).bump()
+                    session.commit()
+                return ids
+            except Exception as exc:
+                session.rollback()
+                with self._cond:
+                    self.errors += 1
+                if isinstance(exc, BAD_RECORD_ERRORS):
+                    raise
+                logger.exception("Ingest batch of %d records failed (attempt %d of %d)", len(records), attempt, WRITE_ATTEMPTS)
+                if attempt == WRITE_ATTEMPTS:
+                    return None
+                time.sleep(0.5 * 2 ** (attempt - 1))
+            finally:
+                session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "capacity": self.capacity,
+                "writers": len(self._threads),
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "written": self.written,
+                "duplicates": self.duplicates,
+                "failed": self.failed,
+                "errors": self.errors,
+                "batches": self.batches,
+                # Time to write one batch, and from enqueue to commit for the
+                # oldest record of each batch.
+                "write_latency": _percentiles(self._write_latency),
+                "queue_latency": _percentiles(self._queue_latency),
+            }
+
+ingest_writer = IngestWriter(
+    settings.INGEST_QUEUE_SIZE,
+    settings.INGEST_BATCH_SIZE,
+    settings.INGEST_BATCH_MAX_WAIT_MS / 1000,
+    settings.INGEST_WRITERS,
+)
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import select as io_select
+import threading
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+import orjson
+from sqlalchemy import func
+from sqlalchemy import select as sql_select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models.machine_hourly_rollup import MachineHourlyRollup
+
+logger = logging.getLogger(__name__)
+
+# Ingest announces what it wrote on this channel with NOTIFY in its own
+# transaction, so a delta is delivered exactly when its rows become visible.
+CHANNEL = "inspections_ingested"
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+MAX_PAYLOAD = 7000
+
+# Per new inspection: (machine_id, timestamp, defect count).
+IngestedRow = Tuple[str, datetime, int]
+
+def ingest_payloads(rows: Iterable[IngestedRow]) -> List[str]:
+    """NOTIFY payloads summing ``rows`` per machine and hour, as JSON arrays
+    of ``[machine_id, hour, inspections, defects, first, last]``, split so
+    each stays under MAX_PAYLOAD."""
+    buckets: Dict[Tuple[str, datetime], List[Any]] = {}
+    for machine_id, ts, defects in rows:
+        key = (machine_id, ts.replace(minute=0, second=0, microsecond=0))
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = [1, defects, ts, ts]
+        else:
+            bucket[0] += 1
+            bucket[1] += defects
+            bucket[2] = min(bucket[2], ts)
+            bucket[3] = max(bucket[3], ts)
+
+    payloads, current, size = [], [], 2
+    for (machine_id, hour), (inspections, defects, first, last) in buckets.items():
+        entry = orjson.dumps([machine_id, hour, inspections, defects, first, last])
+        if current and size + len(entry) + 1 > MAX_PAYLOAD:
+            payloads.append(b"[" + b",".join(current) + b"]")
+            current, size = [], 2
+        current.append(entry)
+        size += len(entry) + 1
+    if current:
+        payloads.append(b"[" + b",".join(current) + b"]")
+    return [p.decode() for p in payloads]
+
+def _rate(defects: int, inspections: int) -> float:
+    return round(defects / inspections * 100, 2) if inspections > 0 else 0.0
+
+def _event(event: str, payload: Dict[str, Any]) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(payload) + b"\n\n"
+
+class LiveCounters:
+    """Running all-time totals per machine, seeded from the hourly rollups and
+    advanced by ingest deltas. Shared between the listener thread and the
+    event loop, hence the lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.machines: Dict[str, List[int]] = {}
+        self.date_start: Optional[datetime] = None
+        self.date_end: Optional[datetime] = None
+
+    def load(self, db: Session) -> None:
+        rows = db.execute(
+            sql_select(
+                MachineHourlyRollup.molding_machine_id,
+                func.sum(MachineHourlyRollup.inspection_count),
+                func.sum(MachineHourlyRollup.defect_count),
+                func.min(MachineHourlyRollup.first_timestamp),
+                func.max(MachineHourlyRollup.last_timestamp),
+            ).group_by(MachineHourlyRollup.molding_machine_id)
+        ).all()
+        with self._lock:
+            self.machines = {row[0]: [int(row[1]), int(row[2])] for row in rows}
+            self.date_start = min((row[3] for row in rows), default=None)
+            self.date_end = max((row[4] for row in rows), default=None)
+
+    def _summary(self) -> Dict[str, Any]:
+        inspections = sum(m[0] for m in self.machines.values())
+        defects = sum(m[1] for m in self.machines.values())
+        return {
+            "total_inspections": inspections,
+            "total_defects": defects,
+            "defect_rate": _rate(defects, inspections),
+            "total_machines": len(self.machines),
+            "date_start": self.date_start,
+            "date_end": self.date_end,
+        }
+
+    def _machine(self, machine_id: str) -> Dict[str, Any]:
+        inspections, defects = self.machines[machine_id]
+        return {
+            "machine_id": machine_id,
+            "total_inspections": inspections,
+            "defect_count": defects,
+            "defect_rate": _rate(defects, inspections),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "summary": self._summary(),
+                "machines": [self._machine(m) for m in sorted(self.machines)],
+            }
+
+    def apply(self, entries: List[List[Any]]) -> Dict[str, Any]:
+        """Add one payload's entries; returns the delta event: the per machine
+        hour increments, and the new totals of the summary and of every machine
+        that changed."""
+        changed = set()
+        with self._lock:
+            for machine_id, _, inspections, defects, first, last in entries:
+                totals = self.machines.setdefault(machine_id, [0, 0])
+                totals[0] += inspections
+                totals[1] += defects
+                changed.add(machine_id)
+                first, last = datetime.fromisoformat(first), datetime.fromisoformat(last)
+                self.date_start = first if self.date_start is None else min(self.date_start, first)
+                self.date_end = last if self.date_end is None else max(self.date_end, last)
+            return {
+                "buckets": [
+                    {"timestamp": hour, "machine_id": machine_id, "total_count": inspections, "defect_count": defects}
+                    for machine_id, hour, inspections, defects, _, _ in entries
+                ],
+                "summary": self._summary(),
+                "machines": [self._machine(m) for m in sorted(changed)],
+            }
+
+# Queued in place of the messages a slow subscriber missed; it is sent a
+# fresh snapshot instead.
+RESYNC = object()
+
+class LiveFeed:
+    """Pushes ingest deltas to Server-Sent Events subscribers.
+
+    One listener thread per process holds a dedicated connection that LISTENs
+    on CHANNEL, applies each notification to the shared counters and encodes
+    the resulting event once; the event loop then hands the same bytes to
+    every subscriber's queue, so a delta costs one dictionary update and one
+    ``put_nowait`` per subscriber however many are connected. The counters are
+    reloaded from the rollups every ``resync_seconds`` (and a snapshot sent),
+    which corrects any drift, such as a delta committed while they were
+    loading.
+    """
+
+    def __init__(self, queue_size: int, resync_seconds: float):
+        self.counters = LiveCounters()
+        self.queue_size = queue_size
+        self.resync_seconds = resync_seconds
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    def _reload(self) -> None:
+        db = SessionLocal()
+        try:
+            self.counters.load(db)
+        finally:
+            db.close()
+        self._publish(RESYNC)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            connection = None
+            try:
+                # Detached, so the long-lived listener does not hold a pool slot.
+                connection = engine.raw_connection()
+                raw = connection.driver_connection
+                connection.detach()
+                raw.autocommit = True
+                raw.cursor().execute(f"LISTEN {CHANNEL}")
+                self._reload()
+                reloaded = time.monotonic()
+                while not self._stop.is_set():
+                    if io_select.select([raw], [], [], 1.0)[0]:
+                        raw.poll()
+                        while raw.notifies:
+                            entries = orjson.loads(raw.notifies.pop(0).payload)
+                            self._publish(_event("delta", self.counters.apply(entries)))
+                    if time.monotonic() - reloaded >= self.resync_seconds:
+                        self._reload()
+                        reloaded = time.monotonic()
+            except Exception:
+                logger.exception("Live feed listener failed; reconnecting")
+                self._stop.wait(5)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def _publish(self, message: Any) -> None:
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._fan_out, message)
+
+    def _fan_out(self, message: Any) -> None:
+        for queue in self.subscribers:
+            if message is RESYNC or queue.full():
+                # Whatever is queued is superseded by the snapshot.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+            else:
+                queue.put_nowait(message)
+
+    def _snapshot(self) -> bytes:
+        return _event("snapshot", self.counters.snapshot())
+
+    async def stream(self, heartbeat: float) -> AsyncIterator[bytes]:
+        """An event stream: a snapshot of the totals, then a delta per ingest
+        notification, with a comment line every ``heartbeat`` seconds so idle
+        connections are not timed out by proxies."""
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self.subscribers.add(queue)
+        try:
+            yield self._snapshot()
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield self._snapshot() if message is RESYNC else message
+        finally:
+            self.subscribers.discard(queue)
+
+live_feed = LiveFeed(settings.LIVE_QUEUE_SIZE, settings.LIVE_RESYNC_SECONDS)
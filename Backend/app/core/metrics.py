@@ -0,0 +1,239 @@
+import contextvars
+import functools
+import inspect
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import Response
+from starlette.routing import Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Latency buckets in seconds, from cached and in-process answers (well under
+# a millisecond) to full-range raw queries and bulk exports.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Requests that match no route, or use a nonstandard method, are counted
+# under one label, so probes cannot grow the number of series.
+UNMATCHED = "unmatched"
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last of its response, by route template and status.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being handled, including open streams.",
+    ["method", "route"],
+)
+REPOSITORY_SECONDS = Histogram(
+    "repository_call_duration_seconds",
+    "Wall time of repository method calls, including any result processing in Python.",
+    ["repository", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+STATEMENT_SECONDS = Histogram(
+    "db_statement_duration_seconds",
+    "Time executing SQL statements, by the repository method that issued them.",
+    ["repository", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+STATEMENT_ERRORS = Counter(
+    "db_statement_errors_total",
+    "SQL statements that raised, by the repository method that issued them.",
+    ["repository", "method"],
+)
+INGEST_BATCH_SECONDS = Histogram(
+    "ingest_batch_write_duration_seconds",
+    "Time to write one batch of queued inspections, including retries.",
+    buckets=LATENCY_BUCKETS,
+)
+
+# The repository method being run, outermost first; statements are
+# attributed to it.
+_current_call: contextvars.ContextVar[Optional[Tuple[str, str]]] = contextvars.ContextVar("repository_call", default=None)
+NO_CALL = ("none", "none")
+
+C = TypeVar("C", bound=type)
+
+def _timed(method: Callable) -> Callable:
+    name = method.__name__
+
+    if inspect.isgeneratorfunction(method):
+        # Streaming methods run a step at a time as their consumer pulls rows;
+        # only the time spent inside them is counted.
+        @functools.wraps(method)
+        def generator(self, *args, **kwargs):
+            if _current_call.get() is not None:
+                yield from method(self, *args, **kwargs)
+                return
+            call = (type(self).__name__, name)
+            steps = method(self, *args, **kwargs)
+            elapsed = 0.0
+            try:
+                while True:
+                    token = _current_call.set(call)
+                    started = time.perf_counter()
+                    try:
+                        item = next(steps)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - started
+                        _current_call.reset(token)
+                    yield item
+            finally:
+                steps.close()
+                REPOSITORY_SECONDS.labels(*call).observe(elapsed)
+        return generator
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # Methods called from another one are part of the outer call.
+        if _current_call.get() is not None:
+            return method(self, *args, **kwargs)
+        call = (type(self).__name__, name)
+        token = _current_call.set(call)
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            REPOSITORY_SECONDS.labels(*call).observe(time.perf_counter() - started)
+            _current_call.reset(token)
+    return wrapper
+
+def timed_repository(cls: C) -> C:
+    """Class decorator recording the duration of every public method defined
+    on ``cls``, labelled with the class of the instance it is called on, and
+    attributing the SQL statements run meanwhile to that method."""
+    for name, member in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(member):
+            setattr(cls, name, _timed(member))
+    return cls
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement ``engine`` executes. Raw ``COPY`` through the
+    DBAPI cursor bypasses these events and shows in the repository time only."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _started(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finished(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        STATEMENT_SECONDS.labels(*(_current_call.get() or NO_CALL)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        stack = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+        STATEMENT_ERRORS.labels(*(_current_call.get() or NO_CALL)).inc()
+
+class PoolCollector:
+    """Connection pool and database thread gauges, read at scrape time."""
+
+    def __init__(self, engine: Engine, threads: Callable[[], Optional[Any]]):
+        self.engine = engine
+        self.threads = threads
+
+    def collect(self) -> Iterable:
+        pool = self.engine.pool
+        yield GaugeMetricFamily("db_pool_size", "Connections the pool keeps open.", value=pool.size())
+        yield GaugeMetricFamily("db_pool_checked_out", "Connections in use.", value=pool.checkedout())
+        yield GaugeMetricFamily("db_pool_checked_in", "Idle connections in the pool.", value=pool.checkedin())
+        # QueuePool counts overflow from -pool_size; only the connections
+        # opened beyond the pool size are overflow proper.
+        yield GaugeMetricFamily("db_pool_overflow", "Connections open beyond the pool size.", value=max(pool.overflow(), 0))
+        limiter = self.threads()
+        if limiter is not None:
+            yield GaugeMetricFamily("db_threads_busy", "Threads running database work for async handlers.", value=limiter.borrowed_tokens)
+            yield GaugeMetricFamily("db_threads_limit", "Threads allowed to run database work at once.", value=limiter.total_tokens)
+
+class IngestCollector:
+    """The ingest writer's counters and queue depth, read at scrape time."""
+
+    def __init__(self, stats: Callable[[], Dict[str, Any]]):
+        self.stats = stats
+
+    def collect(self) -> Iterable:
+        stats = self.stats()
+        records = CounterMetricFamily(
+            "ingest_records", "Inspections posted for ingest, by what became of them.", labels=["outcome"]
+        )
+        for outcome in ("accepted", "rejected", "written", "duplicates", "failed"):
+            records.add_metric([outcome], stats[outcome])
+        yield records
+        yield CounterMetricFamily("ingest_batches", "Batches written.", value=stats["batches"])
+        yield CounterMetricFamily("ingest_write_errors", "Batch write attempts that failed, retried or not.", value=stats["errors"])
+        yield GaugeMetricFamily("ingest_queue_depth", "Inspections waiting to be written.", value=stats["queue_depth"])
+        yield GaugeMetricFamily("ingest_queue_capacity", "Inspections the queue holds before ingest returns 429.", value=stats["capacity"])
+
+def register_collectors(*collectors) -> None:
+    for collector in collectors:
+        REGISTRY.register(collector)
+
+class MetricsMiddleware:
+    """Records the latency, status and concurrency of every HTTP request by
+    route template (``/api/inspections/{inspection_id}``, not the raw path).
+
+    Pure ASGI rather than ``BaseHTTPMiddleware``, so responses, streamed ones
+    included, pass through untouched. The route is found before the request is
+    handled, to label the in-progress gauge, by the first route whose pattern
+    matches the path; that skips the parameter conversion of full matching,
+    which cost more than everything else here.
+    """
+
+    def __init__(self, app: ASGIApp, router: Router):
+        self.app = app
+        self.router = router
+        # Labelled children, looked up once per combination of labels.
+        self._in_progress: Dict[Tuple[str, str], Any] = {}
+        self._seconds: Dict[Tuple[str, str, int], Any] = {}
+
+    def _route(self, path: str) -> str:
+        for route in self.router.routes:
+            pattern = getattr(route, "path_regex", None)
+            if pattern is not None and pattern.match(path):
+                return route.path
+        return UNMATCHED
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in METHODS else "OTHER"
+        route = self._route(scope["path"])
+        status = 500
+
+        async def send_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = self._in_progress.get((method, route))
+        if in_progress is None:
+            in_progress = self._in_progress[method, route] = REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            seconds = self._seconds.get((method, route, status))
+            if seconds is None:
+                seconds = self._seconds[method, route, status] = REQUEST_SECONDS.labels(method, route, str(status))
+            seconds.observe(elapsed)
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
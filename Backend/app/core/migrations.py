@@ -0,0 +1,103 @@
+import importlib
+import pkgutil
+from types import ModuleType
+from typing import List, Set
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+MIGRATIONS_PACKAGE = "app.migrations"
+
+# Arbitrary key for the session-level advisory lock that keeps several
+# containers starting at once from running the same migration twice.
+MIGRATION_LOCK_ID = 7_190_001
+
+def discover() -> List[ModuleType]:
+    """Return the migration modules in version order (``mNNNN_<name>.py``)."""
+    package = importlib.import_module(MIGRATIONS_PACKAGE)
+    names = sorted(m.name for m in pkgutil.iter_modules(package.__path__) if m.name.startswith("m"))
+    return [importlib.import_module(f"{MIGRATIONS_PACKAGE}.{name}") for name in names]
+
+def version_of(module: ModuleType) -> str:
+    return module.__name__.rsplit(".", 1)[1]
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version VARCHAR PRIMARY KEY,"
+        " applied_at TIMESTAMP NOT NULL DEFAULT now())"
+    ))
+
+def applied_versions(engine: Engine) -> Set[str]:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+def _apply(conn: Connection, module: ModuleType) -> None:
+    module.upgrade(conn)
+    conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": version_of(module)})
+
+def upgrade(engine: Engine) -> List[str]:
+    """Apply every pending migration; returns the versions applied.
+
+    Migrations run in a transaction each unless the module sets
+    ``TRANSACTIONAL = False`` (needed for ``CREATE INDEX CONCURRENTLY``), in
+    which case they run in autocommit mode and must be safe to re-run.
+    """
+    applied: List[str] = []
+    # The lock connection stays in autocommit so it never holds a snapshot
+    # that a concurrent index build would have to wait for.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            done = applied_versions(engine)
+            for module in discover():
+                if version_of(module) in done:
+                    continue
+                if getattr(module, "TRANSACTIONAL", True):
+                    with engine.begin() as conn:
+                        _apply(conn, module)
+                else:
+                    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                        _apply(conn, module)
+                applied.append(version_of(module))
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+    return applied
+
+def create_index_concurrently(conn: Connection, name: str, definition: str) -> None:
+    """Build an index without blocking writes; rebuilds it if a previous attempt left it invalid."""
+    valid = conn.execute(
+        text("SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid WHERE c.relname = :name"),
+        {"name": name},
+    ).scalar()
+    if valid:
+        return
+    if valid is not None:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(text(f"CREATE INDEX CONCURRENTLY {name} {definition}"))
+
+def rename_out_of_the_way(conn: Connection, table: str, suffix: str) -> None:
+    """Rename ``table``, its partitions, and their indexes and id sequence by
+    appending ``suffix``, so a replacement can be created under the old names.
+
+    Index, sequence and partition names are schema-wide, so they would collide
+    with the ones the new table is created with. The partitions' own indexes
+    are numbered instead, as their generated names are often already at the
+    63 character limit.
+    """
+    partitions = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i"
+        " JOIN pg_class c ON c.oid = i.inhrelid"
+        " JOIN pg_class p ON p.oid = i.inhparent"
+        " WHERE p.relname = :t"
+    ), {"t": table}).scalars().all()
+    for relation in [table, *partitions]:
+        indexes = conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :t"), {"t": relation}).scalars().all()
+        for position, index in enumerate(indexes):
+            renamed = f"{index}{suffix}" if relation == table else f"{relation}{suffix}_{position}"
+            conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "{renamed}"'))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": table}).scalar()
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {sequence.split('.')[-1]}{suffix}"))
+    for relation in [*partitions, table]:
+        conn.execute(text(f"ALTER TABLE {relation} RENAME TO {relation}{suffix}"))
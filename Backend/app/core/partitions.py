@@ -0,0 +1,97 @@
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Set
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Monthly range-partitioned tables, parents before children. Every child is
+# partitioned on its inspection's timestamp, so a month of history lives in one
+# partition per table and can be detached or dropped as a unit.
+PARTITIONED_TABLES = [
+    ("product_inspections", "timestamp"),
+    ("molding_machine_states", "inspection_timestamp"),
+    ("object_detections", "inspection_timestamp"),
+    ("defects", "inspection_timestamp"),
+    ("pixel_severities", "inspection_timestamp"),
+]
+
+# Serializes partition DDL between concurrent ingest workers.
+PARTITION_LOCK_ID = 7_190_013
+
+def month_start(ts: datetime) -> date:
+    return date(ts.year, ts.month, 1)
+
+def next_month(month: date) -> date:
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+def existing_months(conn: Connection) -> Set[date]:
+    """Months that have an inspections partition (the children always match)."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i"
+        " JOIN pg_class c ON c.oid = i.inhrelid"
+        " JOIN pg_class p ON p.oid = i.inhparent"
+        " WHERE p.relname = 'product_inspections'"
+    )).scalars()
+    prefix = len("product_inspections_p")
+    return {date(int(n[prefix:prefix + 4]), int(n[prefix + 4:prefix + 6]), 1) for n in names}
+
+def ensure_months(conn: Connection, months: Iterable[date]) -> List[date]:
+    """Create the partitions of every table for ``months``; returns the months created.
+
+    Creating a partition briefly locks the parent table, so callers run this in
+    its own short transaction rather than inside a long ingest transaction.
+    """
+    wanted = set(months)
+    if not wanted:
+        return []
+    conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+    conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": PARTITION_LOCK_ID})
+    missing = sorted(wanted - existing_months(conn))
+    for month in missing:
+        for table, _ in PARTITIONED_TABLES:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table}"
+                f" FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+            ))
+    return missing
+
+def months_between(start: datetime, end: datetime) -> List[date]:
+    months = []
+    month = month_start(start)
+    while month <= month_start(end):
+        months.append(month)
+        month = next_month(month)
+    return months
+
+def ensure_ahead(conn: Connection, months_ahead: int, today: Optional[date] = None) -> List[date]:
+    """Create this month's partitions and the next ``months_ahead``."""
+    current = month_start(today or date.today())
+    return ensure_months(conn, [add_months(current, i) for i in range(months_ahead + 1)])
+
+def detach_before(conn: Connection, cutoff: date, drop: bool) -> List[date]:
+    """Detach (and optionally drop) every monthly partition wholly before ``cutoff``.
+
+    Children are detached before their parents so no foreign key ever points
+    into a detached partition; nothing is deleted row by row. Returns the
+    months removed.
+    """
+    months = sorted(m for m in existing_months(conn) if next_month(m) <= cutoff)
+    for month in months:
+        for table, _ in reversed(PARTITIONED_TABLES):
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition_name(table, month)}"))
+        if drop:
+            for table, _ in reversed(PARTITIONED_TABLES):
+                conn.execute(text(f"DROP TABLE {partition_name(table, month)}"))
+    return months
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    return conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :t)"),
+        {"t": table},
+    ).scalar()
@@ -0,0 +1,46 @@
+from datetime import date, datetime
+from typing import Any, Literal, Optional
+
+import msgpack
+import orjson
+from fastapi import Query, Request, Response
+
+# "json" keeps the row-per-object payloads the dashboard uses. "columns" and
+# "msgpack" return the same data column-oriented (one array per field) for
+# consumers that plot or load it into data frames.
+ResponseFormat = Literal["json", "columns", "msgpack"]
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+def negotiate_format(format: Optional[str], accept: str) -> ResponseFormat:
+    """An explicit ``format`` wins; otherwise a MessagePack ``Accept`` selects it."""
+    if format:
+        return format
+    if any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+        return "msgpack"
+    return "json"
+
+def response_format(request: Request, format: Optional[ResponseFormat] = Query(None)) -> ResponseFormat:
+    return negotiate_format(format, request.headers.get("accept", ""))
+
+def is_columnar(fmt: ResponseFormat) -> bool:
+    return fmt != "json"
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
+
+def render(payload: Any, fmt: ResponseFormat, response: Response) -> Any:
+    """Encode ``payload`` for ``fmt``. Headers already set on the injected
+    ``response`` (ETag, Cache-Control) are carried over, since FastAPI only
+    merges them into responses it builds itself."""
+    if fmt == "json":
+        return payload
+    if fmt == "msgpack":
+        body = msgpack.packb(payload, default=_msgpack_default)
+        media_type = "application/msgpack"
+    else:
+        body = orjson.dumps(payload)
+        media_type = "application/json"
+    return Response(body, media_type=media_type, headers=dict(response.headers))
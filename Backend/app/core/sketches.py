@@ -0,0 +1,47 @@
+import math
+
+from sqlalchemy import Integer, case, cast, func
+
+# Pixel severity distributions are kept as DDSketch-style log-bucketed
+# histograms: a value x > 0 falls into bin ceil(log_gamma(x)), covering
+# (gamma^(i-1), gamma^i], and is estimated as the bin's midpoint in relative
+# terms. Any quantile read off the bins is then within RELATIVE_ACCURACY of the
+# exact one (relative to the value, whatever the rank), and two sketches merge
+# by adding their counts bin by bin, which is a SQL SUM. Changing the accuracy
+# changes every bin, so the sketch rollups must be rebuilt after it is changed.
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# Values at or below MIN_VALUE (severities are never negative) share one bin
+# and are estimated as 0.
+MIN_VALUE = 1e-9
+ZERO_BIN = -(2 ** 31)
+
+# Sketched per hour x machine x defect type: the severity itself, and its
+# ratio to the defect's threshold (1.0 = at the threshold).
+VALUE = "value"
+THRESHOLD_RATIO = "threshold_ratio"
+
+DEFAULT_QUANTILES = [0.5, 0.9, 0.99]
+
+def bin_index(column):
+    """SQL expression for the sketch bin of ``column``."""
+    return case(
+        (column > MIN_VALUE, cast(func.ceil(func.ln(column) / LOG_GAMMA), Integer)),
+        else_=ZERO_BIN,
+    )
+
+def bin_value(index: int) -> float:
+    """Estimate for the values in bin ``index``."""
+    return 0.0 if index == ZERO_BIN else 2 * GAMMA ** index / (GAMMA + 1)
+
+def quantile_label(q: float) -> str:
+    return f"p{q * 100:g}"
+
+def quantile_bin(bin, running, total, q: float):
+    """SQL aggregate picking, over one sketch's bins with their ``running``
+    (cumulative, by ascending bin) and ``total`` counts, the bin holding the
+    ``q`` quantile. Ranks follow ``percentile_disc``: the value at 1-based
+    rank ceil(q * total)."""
+    return func.min(bin).filter(running >= func.greatest(1, func.ceil(total * q)))
@@ -1,49 +1,198 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
-from typing import Optional, Literal
-from app.core.database import get_db
-from app.repositories.analytics_repository import AnalyticsRepository
+from typing import Annotated, List, Optional
+from pydantic import Field
+from app.core.config import settings
+from app.core.database import get_db, run_in_db_thread
+from app.core.http_cache import conditional_get
+from app.core.live import live_feed
+from app.core.column_store import column_store
+from app.core.responses import ResponseFormat, response_format, is_columnar, render
+from app.core.defect_masks import DefectType
+from app.core.buckets import AUTO, DEFAULT_MAX_POINTS, GROUPING_PATTERN
+from app.core.sketches import DEFAULT_QUANTILES
+from app.repositories.analytics_repository import AnalyticsRepository, PROCESS_PARAMETERS, SeverityBy
+from app.repositories.rollup_repository import RollupAnalyticsRepository
+from app.repositories.columnar_analytics_repository import ColumnarAnalyticsRepository
+from app.repositories.cached_analytics_repository import CachedAnalyticsRepository, analytics_cache
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
-@router.get("/defect-trends")
+Quantile = Annotated[float, Field(gt=0, le=1)]
+
+def get_analytics_repository(
+    db: Session = Depends(get_db),
+    fmt: ResponseFormat = Depends(response_format),
+) -> AnalyticsRepository:
+    repo_cls = RollupAnalyticsRepository if settings.ANALYTICS_USE_ROLLUPS else AnalyticsRepository
+    repo = repo_cls(db, columnar=is_columnar(fmt))
+    if settings.ANALYTICS_ENGINE == "columnar":
+        repo = ColumnarAnalyticsRepository(repo)
+    if settings.ANALYTICS_CACHE_ENABLED:
+        return CachedAnalyticsRepository(repo)
+    return repo
+
+@router.get("/defect-trends", dependencies=[Depends(conditional_get)])
 async def get_defect_trends(
-    grouping: Literal["hour", "day", "week"] = Query("day"),
+    response: Response,
+    grouping: str = Query("day", pattern=GROUPING_PATTERN),
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     machine_id: Optional[str] = None,
-    db: Session = Depends(get_db),
+    max_points: Optional[int] = Query(None, ge=3, le=10000),
+    repo: AnalyticsRepository = Depends(get_analytics_repository),
+    fmt: ResponseFormat = Depends(response_format),
 ):
-    repo = AnalyticsRepository(db)
-    trends = repo.get_defect_trends(grouping, start_date, end_date, machine_id)
-    return {"trends": trends, "grouping": grouping}
+    if grouping == AUTO:
+        grouping = await run_in_db_thread(
+            repo.resolve_grouping, grouping, max_points or DEFAULT_MAX_POINTS, start_date, end_date, machine_id
+        )
+    trends = await run_in_db_thread(repo.get_defect_trends, grouping, start_date, end_date, machine_id, max_points)
+    return render({"trends": trends, "grouping": grouping}, fmt, response)
 
-@router.get("/machine-performance")
+@router.get("/machine-performance", dependencies=[Depends(conditional_get)])
 async def get_machine_performance(
+    response: Response,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
+    percentiles: bool = False,
+    repo: AnalyticsRepository = Depends(get_analytics_repository),
+    fmt: ResponseFormat = Depends(response_format),
 ):
-    repo = AnalyticsRepository(db)
-    machines = repo.get_machine_performance(start_date, end_date)
-    return {"machines": machines}
+    machines = await run_in_db_thread(repo.get_machine_performance, start_date, end_date, percentiles)
+    return render({"machines": machines}, fmt, response)
 
-@router.get("/defect-distribution")
+@router.get("/defect-distribution", dependencies=[Depends(conditional_get)])
 async def get_defect_distribution(
+    response: Response,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     machine_id: Optional[str] = None,
-    db: Session = Depends(get_db),
+    repo: AnalyticsRepository = Depends(get_analytics_repository),
+    fmt: ResponseFormat = Depends(response_format),
+):
+    distribution = await run_in_db_thread(repo.get_defect_distribution, start_date, end_date, machine_id)
+    return render(distribution, fmt, response)
+
+@router.get("/defect-cooccurrence", dependencies=[Depends(conditional_get)])
+async def get_defect_cooccurrence(
+    response: Response,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    machine_id: Optional[str] = None,
+    repo: AnalyticsRepository = Depends(get_analytics_repository),
+    fmt: ResponseFormat = Depends(response_format),
 ):
-    repo = AnalyticsRepository(db)
-    return repo.get_defect_distribution(start_date, end_date, machine_id)
+    """How often defect types occur together on one inspection, per machine."""
+    cooccurrence = await run_in_db_thread(repo.get_defect_cooccurrence, start_date, end_date, machine_id)
+    return render(cooccurrence, fmt, response)
 
-@router.get("/summary")
+@router.get("/parameter-correlations", dependencies=[Depends(conditional_get)])
+async def get_parameter_correlations(
+    response: Response,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    machine_id: Optional[str] = None,
+    defect_type: Optional[DefectType] = None,
+    top: int = Query(10, ge=1, le=len(PROCESS_PARAMETERS)),
+    bins: int = Query(10, ge=2, le=100),
+    repo: AnalyticsRepository = Depends(get_analytics_repository),
+    fmt: ResponseFormat = Depends(response_format),
+):
+    correlations = await run_in_db_thread(
+        repo.get_parameter_correlations, start_date, end_date, machine_id, defect_type, top, bins
+    )
+    return render({"correlations": correlations}, fmt, response)
+
+@router.get("/severity-percentiles", dependencies=[Depends(conditional_get)])
+async def get_severity_percentiles(
+    response: Response,
+    by: SeverityBy = "defect_type",
+    grouping: str = Query("day", pattern=GROUPING_PATTERN),
+    quantiles: List[Quantile] = Query(DEFAULT_QUANTILES, max_length=10),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    machine_id: Optional[str] = None,
+    defect_type: Optional[DefectType] = None,
+    max_points: Optional[int] = Query(None, ge=3, le=10000),
+    repo: AnalyticsRepository = Depends(get_analytics_repository),
+    fmt: ResponseFormat = Depends(response_format),
+):
+    """Pixel severity quantiles per defect type, machine or time bucket
+    (``by``), and how the severities compare with their thresholds. From the
+    rollups they are read off mergeable sketches, within ``relative_error`` of
+    the exact values."""
+    if by == "time" and grouping == AUTO:
+        grouping = await run_in_db_thread(
+            repo.resolve_grouping, grouping, max_points or DEFAULT_MAX_POINTS, start_date, end_date, machine_id
+        )
+    quantiles = sorted(set(quantiles))
+    severities = await run_in_db_thread(
+        repo.get_severity_percentiles, by, grouping, quantiles, start_date, end_date, machine_id, defect_type
+    )
+    return render({**severities, "by": by, "grouping": grouping, "quantiles": quantiles}, fmt, response)
+
+@router.get("/recipe-changes", dependencies=[Depends(conditional_get)])
+async def get_recipe_changes(
+    response: Response,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    machine_id: Optional[str] = None,
+    repo: AnalyticsRepository = Depends(get_analytics_repository),
+    fmt: ResponseFormat = Depends(response_format),
+):
+    """When each machine's setpoints changed, and which ones."""
+    changes = await run_in_db_thread(repo.get_recipe_changes, start_date, end_date, machine_id)
+    return render({"changes": changes}, fmt, response)
+
+@router.get("/summary", dependencies=[Depends(conditional_get)])
 async def get_summary_metrics(
+    response: Response,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
+    repo: AnalyticsRepository = Depends(get_analytics_repository),
+    fmt: ResponseFormat = Depends(response_format),
 ):
-    repo = AnalyticsRepository(db)
-    return repo.get_summary_metrics(start_date, end_date)
\ No newline at end of file
+    summary = await run_in_db_thread(repo.get_summary_metrics, start_date, end_date)
+    return render(summary, fmt, response)
+
+@router.get("/dashboard", dependencies=[Depends(conditional_get)])
+async def get_dashboard(
+    response: Response,
+    grouping: str = Query("day", pattern=GROUPING_PATTERN),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    machine_id: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=3, le=10000),
+    repo: AnalyticsRepository = Depends(get_analytics_repository),
+    fmt: ResponseFormat = Depends(response_format),
+):
+    if grouping == AUTO:
+        grouping = await run_in_db_thread(
+            repo.resolve_grouping, grouping, max_points or DEFAULT_MAX_POINTS, start_date, end_date, machine_id
+        )
+    dashboard = await run_in_db_thread(repo.get_dashboard, grouping, start_date, end_date, machine_id, max_points)
+    return render(dashboard, fmt, response)
+
+@router.get("/live")
+async def live_updates():
+    """Server-Sent Events: a ``snapshot`` of the running totals, then a
+    ``delta`` per ingest with the new inspections per machine hour and the
+    updated summary and machine totals."""
+    if not live_feed.running:
+        raise HTTPException(status_code=503, detail="Live updates are disabled")
+    return StreamingResponse(
+        live_feed.stream(settings.LIVE_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    return analytics_cache.stats()
+
+@router.get("/column-store-stats")
+async def get_column_store_stats():
+    return column_store.stats()
@@ -0,0 +1,141 @@
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db, run_in_db_thread
+from app.core.defect_masks import DefectType
+from app.core.export import MEDIA_TYPES, ExportFormat
+from app.core.ingest_writer import ingest_writer
+from app.schemas.project_inspection import ProjectInspectionBase, validate_record
+from app.repositories.export_repository import ExportRepository
+from app.repositories.inspection_repository import InspectionRepository, decode_cursor
+
+router = APIRouter(prefix="/api/inspections", tags=["inspections"])
+
+def get_inspection_repository(db: Session = Depends(get_db)) -> InspectionRepository:
+    return InspectionRepository(db)
+
+@router.get("")
+async def list_inspections(
+    page_size: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    machine_id: Optional[str] = None,
+    has_defects: Optional[bool] = None,
+    defect_type: Optional[DefectType] = None,
+    repo: InspectionRepository = Depends(get_inspection_repository),
+):
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return await run_in_db_thread(repo.list_inspections, page_size, position, machine_id, has_defects, defect_type)
+
+# Validation errors reported per rejected request.
+MAX_REPORTED_ERRORS = 20
+
+def _parse_records(body: bytes, ndjson: bool) -> List[ProjectInspectionBase]:
+    """Decode and validate a request body: one record or an array of them as
+    JSON, or one record per line as NDJSON. All records must be valid; raises
+    ValueError for malformed JSON and HTTPException(422) for invalid records."""
+    if ndjson:
+        raws = [orjson.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        raws = orjson.loads(body)
+        if not isinstance(raws, list):
+            raws = [raws]
+
+    records, errors = [], []
+    for index, raw in enumerate(raws):
+        try:
+            records.append(validate_record(raw))
+        except Exception as exc:
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"index": index, "error": str(exc)})
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    return records
+
+@router.post("", status_code=202)
+async def ingest_inspections(request: Request):
+    """Queue inspections for the background writer. Accepts a JSON record or
+    array, or NDJSON (``Content-Type: application/x-ndjson``); a request is
+    queued whole or not at all."""
+    if not ingest_writer.running:
+        raise HTTPException(status_code=503, detail="Ingestion is not running")
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    body = await request.body()
+    try:
+        # Validation is CPU-bound; keep it off the event loop.
+        records = await run_in_threadpool(_parse_records, body, ndjson)
+    except orjson.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail=f"Malformed JSON: {exc}")
+    if len(records) > ingest_writer.capacity:
+        raise HTTPException(status_code=413, detail=f"At most {ingest_writer.capacity} records per request")
+    if not ingest_writer.offer(records):
+        return JSONResponse(
+            {"detail": "Ingest queue is full"},
+            status_code=429,
+            headers={"Retry-After": str(ingest_writer.retry_after())},
+        )
+    return {"accepted": len(records), "queue_depth": ingest_writer.stats()["queue_depth"]}
+
+@router.get("/ingest-stats")
+async def get_ingest_stats():
+    return ingest_writer.stats()
+
+@router.get("/machine/{machine_id}/count")
+async def get_machine_inspection_count(
+    machine_id: str,
+    repo: InspectionRepository = Depends(get_inspection_repository),
+):
+    count = await run_in_db_thread(repo.count_for_machine, machine_id, settings.ANALYTICS_USE_ROLLUPS)
+    return {"machine_id": machine_id, "inspection_count": count}
+
+async def _stream_export(
+    fmt: ExportFormat,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    machine_id: Optional[str],
+    defects: Optional[bool],
+    defect_type: Optional[str],
+) -> AsyncIterator[bytes]:
+    # The response outlives the request's dependencies, so the export holds
+    # its own session. Each chunk is produced on the database thread pool.
+    db = SessionLocal()
+    chunks = ExportRepository(db).export(fmt, settings.EXPORT_BATCH_SIZE, start_date, end_date, machine_id, defects, defect_type)
+    try:
+        while (chunk := await run_in_db_thread(next, chunks, None)) is not None:
+            yield chunk
+    finally:
+        chunks.close()
+        db.close()
+
+@router.get("/export")
+async def export_inspections(
+    format: ExportFormat = Query("csv"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    machine_id: Optional[str] = None,
+    has_defects: Optional[bool] = None,
+    defect_type: Optional[DefectType] = None,
+):
+    """Stream every matching inspection, denormalized to one row per defect."""
+    return StreamingResponse(
+        _stream_export(format, start_date, end_date, machine_id, has_defects, defect_type),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="inspections.{format}"'},
+    )
+
+@router.get("/{inspection_id}")
+async def get_inspection(
+    inspection_id: int,
+    repo: InspectionRepository = Depends(get_inspection_repository),
+):
+    inspection = await run_in_db_thread(repo.get_inspection, inspection_id)
+    if inspection is None:
+        raise HTTPException(status_code=404, detail="Inspection not found")
+    return inspection
@@ -1,8 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.config import settings
+from app.core.column_store import column_store
+from app.core.database import db_thread_limiter, engine
+from app.core.ingest_writer import ingest_writer
+from app.core.live import live_feed
+from app.core.metrics import (
+    IngestCollector,
+    MetricsMiddleware,
+    PoolCollector,
+    instrument_engine,
+    metrics_response,
+    register_collectors,
+)
 from app.endpoints.analytics import router as analytics
+from app.endpoints.inspections import router as inspections
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.LIVE_UPDATES_ENABLED:
+        await live_feed.start()
+    ingest_writer.start()
+    if settings.ANALYTICS_ENGINE == "columnar":
+        # Loads in the background; the SQL repositories answer until it is ready.
+        column_store.start()
+    yield
+    # Queued records are written before shutdown completes.
+    await run_in_threadpool(ingest_writer.stop)
+    await live_feed.stop()
 
-app = FastAPI(title="Krevera Take-Home")
+app = FastAPI(title="Krevera Take-Home", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,8 +41,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+    register_collectors(PoolCollector(engine, db_thread_limiter), IngestCollector(ingest_writer.stats))
+    # Added last so it is outermost and times the CORS handling too.
+    app.add_middleware(MetricsMiddleware, router=app.router)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return metrics_response()
+
 @app.get("/health")
 def health():
     return {"status": "healthy"}
 
-app.include_router(analytics)
\ No newline at end of file
+app.include_router(analytics)
+app.include_router(inspections)
\ No newline at end of file
@@ -0,0 +1,6 @@
+# Versioned schema migrations, applied in name order by app.core.migrations.
+#
+# Each module is named mNNNN_<description>.py and defines upgrade(conn).
+# Base.metadata.create_all still creates missing tables first, so migrations
+# only have to evolve tables that already exist and must be no-ops on a fresh
+# database whose models already match.
@@ -0,0 +1,50 @@
+from sqlalchemy import inspect, text
+
+# Databases created before the natural key existed need the column backfilled
+# from the machine state, exact duplicates removed, and the constraint added.
+STATEMENTS = [
+    'ALTER TABLE product_inspections ADD COLUMN shot_count INTEGER NOT NULL DEFAULT -1',
+    """
+    UPDATE product_inspections p SET shot_count = m."ShotCount"
+    FROM molding_machine_states m
+    WHERE m.inspection_id = p.id AND m."ShotCount" IS NOT NULL
+    """,
+    """
+    CREATE TEMP TABLE duplicate_inspections ON COMMIT DROP AS
+    SELECT id FROM (
+        SELECT id, row_number() OVER (
+            PARTITION BY molding_machine_id, timestamp, shot_count ORDER BY id
+        ) AS rn
+        FROM product_inspections
+    ) ranked WHERE rn > 1
+    """,
+    # Without these every parent delete below seq-scans its child tables for FK checks.
+    'CREATE INDEX IF NOT EXISTS ix_molding_machine_states_inspection_id ON molding_machine_states (inspection_id)',
+    'CREATE INDEX IF NOT EXISTS ix_object_detections_inspection_id ON object_detections (inspection_id)',
+    'CREATE INDEX IF NOT EXISTS ix_defects_object_detection_id ON defects (object_detection_id)',
+    """
+    DELETE FROM pixel_severities WHERE defect_id IN (
+        SELECT d.id FROM defects d JOIN object_detections o ON o.id = d.object_detection_id
+        WHERE o.inspection_id IN (SELECT id FROM duplicate_inspections)
+    )
+    """,
+    """
+    DELETE FROM defects WHERE object_detection_id IN (
+        SELECT id FROM object_detections WHERE inspection_id IN (SELECT id FROM duplicate_inspections)
+    )
+    """,
+    'DELETE FROM object_detections WHERE inspection_id IN (SELECT id FROM duplicate_inspections)',
+    'DELETE FROM molding_machine_states WHERE inspection_id IN (SELECT id FROM duplicate_inspections)',
+    'DELETE FROM product_inspections WHERE id IN (SELECT id FROM duplicate_inspections)',
+    """
+    ALTER TABLE product_inspections ADD CONSTRAINT uq_product_inspections_natural_key
+    UNIQUE (molding_machine_id, timestamp, shot_count)
+    """,
+]
+
+def upgrade(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("product_inspections")}
+    if "shot_count" in columns:
+        return
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
@@ -0,0 +1,35 @@
+from sqlalchemy import text
+from app.core.migrations import create_index_concurrently
+
+# Built concurrently so a live database keeps accepting ingest writes.
+TRANSACTIONAL = False
+
+# Matched to the AnalyticsRepository filters and joins: time-range scans on
+# inspections, then inspection -> state / detections -> defects lookups. The
+# INCLUDE columns let the aggregations run as index-only scans. Machine-filtered
+# ranges use the (molding_machine_id, timestamp, shot_count) natural key.
+INDEXES = {
+    "ix_product_inspections_timestamp":
+        "ON product_inspections (timestamp) INCLUDE (id, molding_machine_id)",
+    "ix_molding_machine_states_inspection_covering":
+        'ON molding_machine_states (inspection_id) INCLUDE ("CycleTime", "InjPeakPressure", '
+        '"Barrel1", "Barrel2", "Barrel3", "Barrel4", "Barrel5", "Barrel6")',
+    "ix_object_detections_inspection_covering":
+        "ON object_detections (inspection_id) INCLUDE (id)",
+    "ix_defects_object_detection_covering":
+        "ON defects (object_detection_id) INCLUDE (id, defect_type)",
+}
+
+# Plain FK indexes created by m0001, superseded by the covering ones above.
+SUPERSEDED = [
+    "ix_molding_machine_states_inspection_id",
+    "ix_object_detections_inspection_id",
+    "ix_defects_object_detection_id",
+]
+
+def upgrade(conn):
+    for name, definition in INDEXES.items():
+        create_index_concurrently(conn, name, definition)
+    for name in SUPERSEDED:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(text("ANALYZE product_inspections, molding_machine_states, object_detections, defects"))
@@ -0,0 +1,224 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core import partitions
+from app.core.migrations import rename_out_of_the_way
+
+# Rebuilds the inspection tables as monthly range-partitioned tables. The old
+# tables (with their indexes and id sequences) are renamed out of the way, the
+# new ones created, and the rows copied across with each child's inspection
+# timestamp filled in from its parent.
+#
+# The schema is spelled out as it stood when this migration was written, not
+# taken from the models: later migrations change these tables further, and
+# the old tables being copied never have the later columns.
+OLD_SUFFIX = "_unpartitioned"
+
+# Measurements and setpoints, in the models' order at the time.
+MACHINE_STATE_COLUMNS = {
+    "VtoPTime": "FLOAT",
+    "InjStartPos": "FLOAT",
+    "HoldSegment5PressureSP": "FLOAT",
+    "VPTransferTimeSP": "FLOAT",
+    "FillSegment3pressureSP": "FLOAT",
+    "FillSegment4SP": "FLOAT",
+    "FillSegmentXfer1to2SP": "FLOAT",
+    "H2TempSP": "FLOAT",
+    "Barrel5": "FLOAT",
+    "HoldSegment2PressureSP": "FLOAT",
+    "BuzzerAlarm": "BOOLEAN",
+    "H1TempSP": "FLOAT",
+    "EjFwdTimeCV": "FLOAT",
+    "FillSegmentXfer4to5SP": "FLOAT",
+    "FillSegment4pressureSP": "FLOAT",
+    "H6TempSP": "FLOAT",
+    "FillSegment5SP": "FLOAT",
+    "Barrel2": "FLOAT",
+    "HoldSegment4TimeSP": "FLOAT",
+    "PullBackBeforeSP": "FLOAT",
+    "H3TempSP": "FLOAT",
+    "Barrel6": "FLOAT",
+    "HoldSegment1PressureSP": "FLOAT",
+    "FillSegment2pressureSP": "FLOAT",
+    "AlarmLED": "BOOLEAN",
+    "ShotCount": "INTEGER",
+    "FillSegment1SP": "FLOAT",
+    "CushionMin": "FLOAT",
+    "ClampOpenTimeCV": "FLOAT",
+    "ClampCloseTimeCV": "FLOAT",
+    "InjTimeSP": "FLOAT",
+    "HoldSegment3PressureSP": "FLOAT",
+    "FillSegment3SP": "FLOAT",
+    "CycleTime": "FLOAT",
+    "N1TempSP": "FLOAT",
+    "HoldSegment4PressureSP": "FLOAT",
+    "ClampForceSP": "INTEGER",
+    "Barrel4": "FLOAT",
+    "FillSegment5pressureSP": "FLOAT",
+    "N2TempSP": "FLOAT",
+    "VtoPPos": "FLOAT",
+    "Barrel1": "FLOAT",
+    "VtoPPress": "FLOAT",
+    "H4TempSP": "FLOAT",
+    "FillSegment2SP": "FLOAT",
+    "HoldSegment1TimeSP": "FLOAT",
+    "PullBackAfterSP": "FLOAT",
+    "InjPeakPressure": "FLOAT",
+    "FillSegmentXfer3to4SP": "FLOAT",
+    "ChargeTime": "FLOAT",
+    "FillSegmentXfer2to3SP": "FLOAT",
+    "BarrelN2": "FLOAT",
+    "TonnageForceCV": "INTEGER",
+    "CoolTimeSP": "FLOAT",
+    "FillSegment1pressureSP": "FLOAT",
+    "H5TempSP": "FLOAT",
+    "FillPeakPress": "FLOAT",
+    "ShotSizeSP": "FLOAT",
+    "HoldSegment3TimeSP": "FLOAT",
+    "BarrelN1": "FLOAT",
+    "CushionFin": "FLOAT",
+    "Barrel3": "FLOAT",
+    "EjRetTimeCV": "FLOAT",
+    "CycleStopFault": "BOOLEAN",
+    "HoldSegment2TimeSP": "FLOAT",
+    "VPTransferPositionSP": "FLOAT",
+}
+
+# (table, copied columns, CREATE statements), parents before children. The
+# children's inspection_timestamp is not copied but filled in from the parent.
+TABLES = [
+    (
+        "product_inspections",
+        ["id", "version", "timestamp", "molding_machine_id", "shot_count"],
+        [
+            "CREATE TABLE product_inspections ("
+            " id SERIAL NOT NULL,"
+            " version VARCHAR NOT NULL,"
+            " timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,"
+            " molding_machine_id VARCHAR NOT NULL,"
+            " shot_count INTEGER DEFAULT '-1' NOT NULL,"
+            " PRIMARY KEY (id, timestamp),"
+            " CONSTRAINT uq_product_inspections_natural_key UNIQUE (molding_machine_id, timestamp, shot_count)"
+            ") PARTITION BY RANGE (timestamp)",
+            "CREATE INDEX ix_product_inspections_id ON product_inspections (id)",
+            "CREATE INDEX ix_product_inspections_timestamp ON product_inspections (timestamp) INCLUDE (id, molding_machine_id)",
+        ],
+    ),
+    (
+        "molding_machine_states",
+        ["id", "inspection_id", *MACHINE_STATE_COLUMNS],
+        [
+            "CREATE TABLE molding_machine_states ("
+            " id SERIAL NOT NULL,"
+            " inspection_id INTEGER NOT NULL,"
+            " inspection_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,"
+            + "".join(f' "{name}" {type_},' for name, type_ in MACHINE_STATE_COLUMNS.items()) +
+            " PRIMARY KEY (id, inspection_timestamp),"
+            " FOREIGN KEY (inspection_id, inspection_timestamp) REFERENCES product_inspections (id, timestamp)"
+            ") PARTITION BY RANGE (inspection_timestamp)",
+            "CREATE INDEX ix_molding_machine_states_id ON molding_machine_states (id)",
+            "CREATE INDEX ix_molding_machine_states_inspection_covering ON molding_machine_states (inspection_id)"
+            ' INCLUDE ("CycleTime", "InjPeakPressure", "Barrel1", "Barrel2", "Barrel3", "Barrel4", "Barrel5", "Barrel6")',
+            "CREATE INDEX ix_molding_machine_states_inspection_timestamp ON molding_machine_states (inspection_timestamp)",
+        ],
+    ),
+    (
+        "object_detections",
+        ["id", "inspection_id", "name", "reject"],
+        [
+            "CREATE TABLE object_detections ("
+            " id SERIAL NOT NULL,"
+            " inspection_id INTEGER NOT NULL,"
+            " inspection_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,"
+            " name VARCHAR NOT NULL,"
+            " reject BOOLEAN NOT NULL,"
+            " PRIMARY KEY (id, inspection_timestamp),"
+            " FOREIGN KEY (inspection_id, inspection_timestamp) REFERENCES product_inspections (id, timestamp)"
+            ") PARTITION BY RANGE (inspection_timestamp)",
+            "CREATE INDEX ix_object_detections_id ON object_detections (id)",
+            "CREATE INDEX ix_object_detections_inspection_covering ON object_detections (inspection_id) INCLUDE (id)",
+            "CREATE INDEX ix_object_detections_inspection_timestamp ON object_detections (inspection_timestamp)",
+        ],
+    ),
+    (
+        "defects",
+        ["id", "object_detection_id", "defect_type", "reject"],
+        [
+            "CREATE TABLE defects ("
+            " id SERIAL NOT NULL,"
+            " object_detection_id INTEGER NOT NULL,"
+            " inspection_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,"
+            " defect_type VARCHAR NOT NULL,"
+            " reject BOOLEAN NOT NULL,"
+            " PRIMARY KEY (id, inspection_timestamp),"
+            " FOREIGN KEY (object_detection_id, inspection_timestamp) REFERENCES object_detections (id, inspection_timestamp)"
+            ") PARTITION BY RANGE (inspection_timestamp)",
+            "CREATE INDEX ix_defects_inspection_timestamp ON defects (inspection_timestamp)",
+            "CREATE INDEX ix_defects_object_detection_covering ON defects (object_detection_id) INCLUDE (id, defect_type)",
+        ],
+    ),
+    (
+        "pixel_severities",
+        ["id", "defect_id", "reject", "value", "min_value", "max_value", "threshold"],
+        [
+            "CREATE TABLE pixel_severities ("
+            " id SERIAL NOT NULL,"
+            " defect_id INTEGER NOT NULL,"
+            " inspection_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,"
+            " reject BOOLEAN NOT NULL,"
+            " value FLOAT NOT NULL,"
+            " min_value FLOAT,"
+            " max_value FLOAT,"
+            " threshold FLOAT,"
+            " PRIMARY KEY (id, inspection_timestamp),"
+            " CONSTRAINT pixel_severities_defect_id_key UNIQUE (defect_id, inspection_timestamp),"
+            " FOREIGN KEY (defect_id, inspection_timestamp) REFERENCES defects (id, inspection_timestamp)"
+            ") PARTITION BY RANGE (inspection_timestamp)",
+        ],
+    ),
+]
+
+# How each child finds its inspection timestamp: a join to an already copied
+# (new) parent table.
+TIMESTAMP_SOURCES = {
+    "molding_machine_states": ("product_inspections", "timestamp", "inspection_id"),
+    "object_detections": ("product_inspections", "timestamp", "inspection_id"),
+    "defects": ("object_detections", "inspection_timestamp", "object_detection_id"),
+    "pixel_severities": ("defects", "inspection_timestamp", "defect_id"),
+}
+
+def upgrade(conn: Connection) -> None:
+    if partitions.is_partitioned(conn, "product_inspections"):
+        return
+
+    for table, _, _ in TABLES:
+        rename_out_of_the_way(conn, table, OLD_SUFFIX)
+    for _, _, statements in TABLES:
+        for statement in statements:
+            conn.execute(text(statement))
+
+    months = conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', timestamp)::date FROM product_inspections{OLD_SUFFIX}"
+    )).scalars().all()
+    partitions.ensure_months(conn, months)
+
+    quote = conn.dialect.identifier_preparer.quote
+    for table, columns, _ in TABLES:
+        column_list = ", ".join(quote(c) for c in columns)
+        if table in TIMESTAMP_SOURCES:
+            parent, parent_ts, fk = TIMESTAMP_SOURCES[table]
+            conn.execute(text(
+                f"INSERT INTO {table} ({column_list}, inspection_timestamp)"
+                f" SELECT {', '.join('o.' + quote(c) for c in columns)}, p.{parent_ts}"
+                f" FROM {table}{OLD_SUFFIX} o JOIN {parent} p ON p.id = o.{fk}"
+            ))
+        else:
+            conn.execute(text(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {table}{OLD_SUFFIX}"))
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table}"
+        ))
+
+    for table, _, _ in reversed(TABLES):
+        conn.execute(text(f"DROP TABLE {table}{OLD_SUFFIX}"))
+    for table, _, _ in TABLES:
+        conn.execute(text(f"ANALYZE {table}"))
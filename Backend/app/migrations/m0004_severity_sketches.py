@@ -0,0 +1,53 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# The table and backfill as they were when the sketches were introduced,
+# written out so the migration does not change with later edits to the model
+# or to the rollup code.
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS severity_hourly_sketches (
+        bucket TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        molding_machine_id VARCHAR NOT NULL,
+        defect_type VARCHAR NOT NULL,
+        metric VARCHAR NOT NULL,
+        bin INTEGER NOT NULL,
+        sample_count INTEGER NOT NULL,
+        PRIMARY KEY (bucket, molding_machine_id, defect_type, metric, bin)
+    )
+"""
+
+# app.core.sketches at 1% relative accuracy: bin ceil(ln(x) / ln(gamma)), and
+# one shared bin for values at or below 1e-9.
+BIN = "CASE WHEN {0} > 1e-09 THEN CAST(ceil(ln({0}) / 0.020000666706669435::float8) AS INTEGER) ELSE -2147483648 END"
+
+SKETCH = """
+    SELECT date_trunc('hour', p.timestamp) AS bucket, p.molding_machine_id, d.defect_type,
+        '{metric}' AS metric, {bin} AS bin, count(*) AS sample_count
+    FROM product_inspections p
+    JOIN object_detections o ON o.inspection_id = p.id
+    JOIN defects d ON d.object_detection_id = o.id
+    JOIN pixel_severities ps ON ps.defect_id = d.id
+    {where}
+    GROUP BY bucket, p.molding_machine_id, d.defect_type, bin
+"""
+
+BACKFILL = (
+    "INSERT INTO severity_hourly_sketches (bucket, molding_machine_id, defect_type, metric, bin, sample_count)"
+    + SKETCH.format(metric="value", bin=BIN.format("ps.value"), where="")
+    + "UNION ALL"
+    + SKETCH.format(
+        metric="threshold_ratio",
+        bin=BIN.format("ps.value / ps.threshold"),
+        where="WHERE ps.threshold > 0",
+    )
+)
+
+# create_all adds the severity_hourly_sketches table to an existing database
+# empty; fill it from the rows already stored. Later ingests maintain it along
+# with the other rollups.
+def upgrade(conn: Connection) -> None:
+    conn.execute(text(CREATE_TABLE))
+    if conn.execute(text("SELECT 1 FROM severity_hourly_sketches LIMIT 1")).first() is not None:
+        return
+    conn.execute(text(BACKFILL))
+    conn.execute(text("ANALYZE severity_hourly_sketches"))
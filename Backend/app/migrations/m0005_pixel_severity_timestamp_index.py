@@ -0,0 +1,22 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.migrations import create_index_concurrently
+
+# Built concurrently so a live database keeps accepting ingest writes.
+TRANSACTIONAL = False
+
+# The exact severity percentiles select pixel severities by their own
+# inspection timestamp, as the other child tables already allow. Postgres
+# cannot build an index on a partitioned table concurrently, so each month's
+# partition gets its index first; creating the parent index then attaches
+# them instead of building anything.
+def upgrade(conn: Connection) -> None:
+    partitions = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid"
+        " WHERE i.inhparent = 'pixel_severities'::regclass ORDER BY c.relname"
+    )).scalars().all()
+    for partition in partitions:
+        create_index_concurrently(conn, f"{partition}_inspection_timestamp_idx", f"ON {partition} (inspection_timestamp)")
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_pixel_severities_inspection_timestamp ON pixel_severities (inspection_timestamp)"))
+    conn.execute(text("ANALYZE pixel_severities"))
@@ -0,0 +1,177 @@
+import hashlib
+from typing import Any, Dict
+
+import orjson
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core import partitions
+from app.core.migrations import rename_out_of_the_way
+
+# Moves the *SP setpoints off the machine states into machine_recipes. Every
+# distinct combination is interned as a recipe, then the states table is
+# rebuilt without the setpoint columns (dropping them would leave every row
+# its old size until rewritten), each state referring to its recipe.
+#
+# The schema and the recipe digest are spelled out as they stood when this
+# migration was written, not taken from the models and the recipe repository,
+# so later edits to those do not change what the migration does.
+TABLE = "molding_machine_states"
+RECIPES = "machine_recipes"
+
+OLD_SUFFIX = "_with_setpoints"
+
+# Measured values, kept on every machine state row, and the setpoints moved to
+# the recipes, in the models' order at the time.
+MEASUREMENTS = {
+    "VtoPTime": "FLOAT",
+    "InjStartPos": "FLOAT",
+    "Barrel5": "FLOAT",
+    "BuzzerAlarm": "BOOLEAN",
+    "EjFwdTimeCV": "FLOAT",
+    "Barrel2": "FLOAT",
+    "Barrel6": "FLOAT",
+    "AlarmLED": "BOOLEAN",
+    "ShotCount": "INTEGER",
+    "CushionMin": "FLOAT",
+    "ClampOpenTimeCV": "FLOAT",
+    "ClampCloseTimeCV": "FLOAT",
+    "CycleTime": "FLOAT",
+    "Barrel4": "FLOAT",
+    "VtoPPos": "FLOAT",
+    "Barrel1": "FLOAT",
+    "VtoPPress": "FLOAT",
+    "InjPeakPressure": "FLOAT",
+    "ChargeTime": "FLOAT",
+    "BarrelN2": "FLOAT",
+    "TonnageForceCV": "INTEGER",
+    "FillPeakPress": "FLOAT",
+    "BarrelN1": "FLOAT",
+    "CushionFin": "FLOAT",
+    "Barrel3": "FLOAT",
+    "EjRetTimeCV": "FLOAT",
+    "CycleStopFault": "BOOLEAN",
+}
+
+SETPOINTS = {
+    "HoldSegment5PressureSP": "FLOAT",
+    "VPTransferTimeSP": "FLOAT",
+    "FillSegment3pressureSP": "FLOAT",
+    "FillSegment4SP": "FLOAT",
+    "FillSegmentXfer1to2SP": "FLOAT",
+    "H2TempSP": "FLOAT",
+    "HoldSegment2PressureSP": "FLOAT",
+    "H1TempSP": "FLOAT",
+    "FillSegmentXfer4to5SP": "FLOAT",
+    "FillSegment4pressureSP": "FLOAT",
+    "H6TempSP": "FLOAT",
+    "FillSegment5SP": "FLOAT",
+    "HoldSegment4TimeSP": "FLOAT",
+    "PullBackBeforeSP": "FLOAT",
+    "H3TempSP": "FLOAT",
+    "HoldSegment1PressureSP": "FLOAT",
+    "FillSegment2pressureSP": "FLOAT",
+    "FillSegment1SP": "FLOAT",
+    "InjTimeSP": "FLOAT",
+    "HoldSegment3PressureSP": "FLOAT",
+    "FillSegment3SP": "FLOAT",
+    "N1TempSP": "FLOAT",
+    "HoldSegment4PressureSP": "FLOAT",
+    "ClampForceSP": "INTEGER",
+    "FillSegment5pressureSP": "FLOAT",
+    "N2TempSP": "FLOAT",
+    "H4TempSP": "FLOAT",
+    "FillSegment2SP": "FLOAT",
+    "HoldSegment1TimeSP": "FLOAT",
+    "PullBackAfterSP": "FLOAT",
+    "FillSegmentXfer3to4SP": "FLOAT",
+    "FillSegmentXfer2to3SP": "FLOAT",
+    "CoolTimeSP": "FLOAT",
+    "FillSegment1pressureSP": "FLOAT",
+    "H5TempSP": "FLOAT",
+    "ShotSizeSP": "FLOAT",
+    "HoldSegment3TimeSP": "FLOAT",
+    "HoldSegment2TimeSP": "FLOAT",
+    "VPTransferPositionSP": "FLOAT",
+}
+
+CREATE_RECIPES = (
+    f"CREATE TABLE IF NOT EXISTS {RECIPES} ("
+    " id SERIAL NOT NULL,"
+    " digest VARCHAR NOT NULL,"
+    + "".join(f' "{name}" {type_},' for name, type_ in SETPOINTS.items()) +
+    " PRIMARY KEY (id),"
+    " UNIQUE (digest))"
+)
+
+CREATE_STATES = [
+    f"CREATE TABLE {TABLE} ("
+    " id SERIAL NOT NULL,"
+    " inspection_id INTEGER NOT NULL,"
+    " inspection_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,"
+    " recipe_id INTEGER,"
+    + "".join(f' "{name}" {type_},' for name, type_ in MEASUREMENTS.items()) +
+    " PRIMARY KEY (id, inspection_timestamp),"
+    " FOREIGN KEY (inspection_id, inspection_timestamp) REFERENCES product_inspections (id, timestamp),"
+    f" FOREIGN KEY (recipe_id) REFERENCES {RECIPES} (id)"
+    ") PARTITION BY RANGE (inspection_timestamp)",
+    f"CREATE INDEX ix_{TABLE}_inspection_timestamp ON {TABLE} (inspection_timestamp)",
+    f"CREATE INDEX ix_{TABLE}_inspection_covering ON {TABLE} (inspection_id)"
+    ' INCLUDE ("CycleTime", "InjPeakPressure", "Barrel1", "Barrel2", "Barrel3", "Barrel4", "Barrel5", "Barrel6", recipe_id)',
+    f"CREATE INDEX ix_{TABLE}_id ON {TABLE} (id)",
+]
+
+def recipe_digest(setpoints: Dict[str, Any]) -> str:
+    """The recipe repository's digest at the time: SHA-1 of the setpoint
+    values, in order, as JSON."""
+    return hashlib.sha1(orjson.dumps([setpoints.get(key) for key in SETPOINTS])).hexdigest()
+
+def upgrade(conn: Connection) -> None:
+    columns = conn.execute(
+        text("SELECT column_name FROM information_schema.columns WHERE table_name = :t"), {"t": TABLE}
+    ).scalars().all()
+    if next(iter(SETPOINTS)) not in columns:
+        return
+
+    quote = conn.dialect.identifier_preparer.quote
+    setpoint_list = ", ".join(quote(c) for c in SETPOINTS)
+    conn.execute(text(CREATE_RECIPES))
+    recipes = [dict(zip(SETPOINTS, row)) for row in conn.execute(text(f"SELECT DISTINCT {setpoint_list} FROM {TABLE}"))]
+    if recipes:
+        conn.execute(
+            text(
+                f"INSERT INTO {RECIPES} (digest, {setpoint_list})"
+                f" VALUES (:digest, {', '.join(':' + c for c in SETPOINTS)})"
+                " ON CONFLICT (digest) DO NOTHING"
+            ),
+            [{"digest": recipe_digest(r), **r} for r in recipes],
+        )
+
+    rename_out_of_the_way(conn, TABLE, OLD_SUFFIX)
+    for statement in CREATE_STATES:
+        conn.execute(text(statement))
+    for month in sorted(partitions.existing_months(conn)):
+        conn.execute(text(
+            f"CREATE TABLE {partitions.partition_name(TABLE, month)} PARTITION OF {TABLE}"
+            f" FOR VALUES FROM ('{month.isoformat()}') TO ('{partitions.next_month(month).isoformat()}')"
+        ))
+
+    # Recipes are matched on their setpoints' row text: equal for equal values
+    # (NULLs included), and one hashable key for the join. Rows go in in id
+    # order, so the indexes fill page by page rather than splitting.
+    copied = ["id", "inspection_id", "inspection_timestamp", *MEASUREMENTS]
+    conn.execute(text(
+        f"INSERT INTO {TABLE} ({', '.join(quote(c) for c in copied)}, recipe_id)"
+        f" SELECT {', '.join('o.' + quote(c) for c in copied)}, r.id"
+        f" FROM {TABLE}{OLD_SUFFIX} o"
+        f" LEFT JOIN {RECIPES} r"
+        f" ON md5(ROW({', '.join('r.' + quote(c) for c in SETPOINTS)})::text)"
+        f" = md5(ROW({', '.join('o.' + quote(c) for c in SETPOINTS)})::text)"
+        f" ORDER BY o.id"
+    ))
+    conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), coalesce(max(id), 0) + 1, false) FROM {TABLE}"
+    ))
+    conn.execute(text(f"DROP TABLE {TABLE}{OLD_SUFFIX}"))
+    conn.execute(text(f"ANALYZE {TABLE}"))
+    conn.execute(text(f"ANALYZE {RECIPES}"))
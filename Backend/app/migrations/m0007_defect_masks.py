@@ -0,0 +1,92 @@
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core import partitions
+from app.core.migrations import create_index_concurrently
+
+# Run month by month in autocommit mode, so the backfill never holds a long
+# transaction and the index is built without blocking ingest writes.
+TRANSACTIONAL = False
+
+INDEX = "ix_product_inspections_timestamp"
+COVERING = "(timestamp) INCLUDE (id, molding_machine_id, defect_mask)"
+
+# The defect types in bit order when the masks were introduced
+# (app.core.defect_masks); written out so the backfill does not change with
+# later edits to the types. Bits are never renumbered, only appended.
+DEFECT_TYPES = [
+    "discoloration_defect",
+    "discoloration_patch_defect",
+    "flash_defect",
+    "short_defect",
+    "contamination_defect",
+    "splay_defect",
+    "burn_mark_defect",
+    "jetting_defect",
+    "flow_mark_defect",
+    "sink_mark_defect",
+    "knit_line_defect",
+    "void_defect",
+    "ejector_pin_mark_defect",
+]
+
+MASK = "bit_or(CASE d.defect_type {} ELSE 0 END)".format(
+    " ".join(f"WHEN '{name}' THEN {1 << bit}" for bit, name in enumerate(DEFECT_TYPES))
+)
+
+# Set the mask of inspections in [:start, :end) that have defects, then clear
+# it on those without; rows that are already right are not touched.
+BACKFILL = [
+    f"""
+    UPDATE product_inspections p SET defect_mask = m.mask
+    FROM (
+        SELECT o.inspection_id, {MASK} AS mask
+        FROM object_detections o
+        JOIN defects d ON d.object_detection_id = o.id
+            AND d.inspection_timestamp >= :start AND d.inspection_timestamp < :end
+        WHERE o.inspection_timestamp >= :start AND o.inspection_timestamp < :end
+        GROUP BY o.inspection_id
+    ) m
+    WHERE p.timestamp >= :start AND p.timestamp < :end
+      AND p.id = m.inspection_id AND p.defect_mask != m.mask
+    """,
+    """
+    UPDATE product_inspections p SET defect_mask = 0
+    WHERE p.timestamp >= :start AND p.timestamp < :end AND p.defect_mask != 0
+      AND NOT EXISTS (
+        SELECT 1 FROM object_detections o JOIN defects d ON d.object_detection_id = o.id
+        WHERE o.inspection_id = p.id AND o.inspection_timestamp = p.timestamp
+          AND d.inspection_timestamp = p.timestamp
+      )
+    """,
+]
+
+# Adds ProductInspection.defect_mask, fills it in from the defect rows, and
+# widens the timestamp index with it so mask-only queries (defect filters,
+# co-occurrence) run as index-only scans. The parent index is replaced as in
+# m0005: partition indexes built concurrently, then a parent index that
+# attaches them, renamed over the old one.
+def upgrade(conn: Connection) -> None:
+    conn.execute(text("ALTER TABLE product_inspections ADD COLUMN IF NOT EXISTS defect_mask integer NOT NULL DEFAULT 0"))
+
+    for month in sorted(partitions.existing_months(conn)):
+        start, end = datetime.combine(month, datetime.min.time()), datetime.combine(partitions.next_month(month), datetime.min.time())
+        for statement in BACKFILL:
+            conn.execute(text(statement), {"start": start, "end": end})
+
+    definition = conn.execute(text("SELECT indexdef FROM pg_indexes WHERE indexname = :name"), {"name": INDEX}).scalar()
+    if definition is None or "defect_mask" not in definition:
+        children = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid"
+            " WHERE i.inhparent = 'product_inspections'::regclass ORDER BY c.relname"
+        )).scalars().all()
+        for child in children:
+            create_index_concurrently(conn, f"{child}_timestamp_mask_idx", f"ON {child} {COVERING}")
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {INDEX}_mask ON product_inspections {COVERING}"))
+        conn.execute(text(f"DROP INDEX IF EXISTS {INDEX}"))
+        conn.execute(text(f"ALTER INDEX {INDEX}_mask RENAME TO {INDEX}"))
+
+    # The backfill left a dead row version behind every changed inspection;
+    # index-only scans need the visibility map set again.
+    conn.execute(text("VACUUM ANALYZE product_inspections"))
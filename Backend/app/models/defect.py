@@ -1,12 +1,21 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKeyConstraint, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 class Defect(Base):
     __tablename__ = "defects"
+    __table_args__ = (
+        Index("ix_defects_object_detection_covering", "object_detection_id", postgresql_include=["id", "defect_type"]),
+        ForeignKeyConstraint(
+            ["object_detection_id", "inspection_timestamp"],
+            ["object_detections.id", "object_detections.inspection_timestamp"],
+        ),
+        {"postgresql_partition_by": "RANGE (inspection_timestamp)"},
+    )
 
-    id = Column(Integer, primary_key=True)
-    object_detection_id = Column(Integer, ForeignKey("object_detections.id"), nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    object_detection_id = Column(Integer, nullable=False)
+    inspection_timestamp = Column(DateTime, primary_key=True, nullable=False, index=True)
     defect_type = Column(String, nullable=False)
     reject = Column(Boolean, nullable=False)
     object_detection = relationship("ObjectDetection", back_populates="defects")
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app.core.database import Base
+
+class DefectTypeHourlyRollup(Base):
+    __tablename__ = "defect_type_hourly_rollups"
+
+    bucket = Column(DateTime, primary_key=True)
+    molding_machine_id = Column(String, primary_key=True)
+    defect_type = Column(String, primary_key=True)
+    defect_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,7 @@
+from sqlalchemy import Sequence
+from app.core.database import Base
+
+# Bumped after every committed ingest, so caches can tell that the data changed
+# even when the new rows do not raise max(product_inspections.id) (parallel
+# workers commit their id ranges out of order).
+IngestGeneration = Sequence("ingest_generation_seq", metadata=Base.metadata)
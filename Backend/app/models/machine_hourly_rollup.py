@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from app.core.database import Base
+
+class MachineHourlyRollup(Base):
+    __tablename__ = "machine_hourly_rollups"
+
+    bucket = Column(DateTime, primary_key=True)
+    molding_machine_id = Column(String, primary_key=True)
+    inspection_count = Column(Integer, nullable=False, default=0)
+    defect_count = Column(Integer, nullable=False, default=0)
+    cycle_time_sum = Column(Float, nullable=False, default=0.0)
+    cycle_time_count = Column(Integer, nullable=False, default=0)
+    injection_pressure_sum = Column(Float, nullable=False, default=0.0)
+    injection_pressure_count = Column(Integer, nullable=False, default=0)
+    barrel_temp_sum = Column(Float, nullable=False, default=0.0)
+    barrel_temp_count = Column(Integer, nullable=False, default=0)
+    first_timestamp = Column(DateTime, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
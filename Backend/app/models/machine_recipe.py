@@ -0,0 +1,51 @@
+from sqlalchemy import Column, Integer, Float, String
+from app.core.database import Base
+
+# The *SP setpoints of the machine state. They only change when a recipe is
+# retuned, so each distinct combination is stored once, keyed by a digest of
+# its values, and machine states refer to it by id.
+class MachineRecipe(Base):
+    __tablename__ = "machine_recipes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    digest = Column(String, nullable=False, unique=True)
+
+    HoldSegment5PressureSP = Column(Float, nullable=True)
+    VPTransferTimeSP = Column(Float, nullable=True)
+    FillSegment3pressureSP = Column(Float, nullable=True)
+    FillSegment4SP = Column(Float, nullable=True)
+    FillSegmentXfer1to2SP = Column(Float, nullable=True)
+    H2TempSP = Column(Float, nullable=True)
+    HoldSegment2PressureSP = Column(Float, nullable=True)
+    H1TempSP = Column(Float, nullable=True)
+    FillSegmentXfer4to5SP = Column(Float, nullable=True)
+    FillSegment4pressureSP = Column(Float, nullable=True)
+    H6TempSP = Column(Float, nullable=True)
+    FillSegment5SP = Column(Float, nullable=True)
+    HoldSegment4TimeSP = Column(Float, nullable=True)
+    PullBackBeforeSP = Column(Float, nullable=True)
+    H3TempSP = Column(Float, nullable=True)
+    HoldSegment1PressureSP = Column(Float, nullable=True)
+    FillSegment2pressureSP = Column(Float, nullable=True)
+    FillSegment1SP = Column(Float, nullable=True)
+    InjTimeSP = Column(Float, nullable=True)
+    HoldSegment3PressureSP = Column(Float, nullable=True)
+    FillSegment3SP = Column(Float, nullable=True)
+    N1TempSP = Column(Float, nullable=True)
+    HoldSegment4PressureSP = Column(Float, nullable=True)
+    ClampForceSP = Column(Integer, nullable=True)
+    FillSegment5pressureSP = Column(Float, nullable=True)
+    N2TempSP = Column(Float, nullable=True)
+    H4TempSP = Column(Float, nullable=True)
+    FillSegment2SP = Column(Float, nullable=True)
+    HoldSegment1TimeSP = Column(Float, nullable=True)
+    PullBackAfterSP = Column(Float, nullable=True)
+    FillSegmentXfer3to4SP = Column(Float, nullable=True)
+    FillSegmentXfer2to3SP = Column(Float, nullable=True)
+    CoolTimeSP = Column(Float, nullable=True)
+    FillSegment1pressureSP = Column(Float, nullable=True)
+    H5TempSP = Column(Float, nullable=True)
+    ShotSizeSP = Column(Float, nullable=True)
+    HoldSegment3TimeSP = Column(Float, nullable=True)
+    HoldSegment2TimeSP = Column(Float, nullable=True)
+    VPTransferPositionSP = Column(Float, nullable=True)
@@ -1,12 +1,21 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKeyConstraint, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 class ObjectDetection(Base):
     __tablename__ = "object_detections"
+    __table_args__ = (
+        Index("ix_object_detections_inspection_covering", "inspection_id", postgresql_include=["id"]),
+        ForeignKeyConstraint(
+            ["inspection_id", "inspection_timestamp"],
+            ["product_inspections.id", "product_inspections.timestamp"],
+        ),
+        {"postgresql_partition_by": "RANGE (inspection_timestamp)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    inspection_id = Column(Integer, ForeignKey("product_inspections.id"), nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    inspection_id = Column(Integer, nullable=False)
+    inspection_timestamp = Column(DateTime, primary_key=True, nullable=False, index=True)
     name = Column(String, nullable=False)
     reject = Column(Boolean, nullable=False)
     inspection = relationship("ProductInspection", back_populates="object_detections")
@@ -1,13 +1,22 @@
-from sqlalchemy import Column, Integer, Boolean, Float, ForeignKey
+from sqlalchemy import Column, Integer, Boolean, Float, DateTime, ForeignKeyConstraint, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 
 class PixelSeverity(Base):
     __tablename__ = "pixel_severities"
+    __table_args__ = (
+        UniqueConstraint("defect_id", "inspection_timestamp", name="pixel_severities_defect_id_key"),
+        ForeignKeyConstraint(
+            ["defect_id", "inspection_timestamp"],
+            ["defects.id", "defects.inspection_timestamp"],
+        ),
+        {"postgresql_partition_by": "RANGE (inspection_timestamp)"},
+    )
 
-    id = Column(Integer, primary_key=True)
-    defect_id = Column(Integer, ForeignKey("defects.id"), unique=True, nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    defect_id = Column(Integer, nullable=False)
+    inspection_timestamp = Column(DateTime, primary_key=True, nullable=False, index=True)
     reject = Column(Boolean, nullable=False)
     value = Column(Float, nullable=False)
     min_value = Column(Float)
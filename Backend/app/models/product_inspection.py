@@ -1,13 +1,29 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
+# Stored when the machine state carries no ShotCount so the natural key stays
+# NOT NULL (NULLs never conflict in a Postgres 14 unique index).
+NO_SHOT_COUNT = -1
+
+# Inspections and all their child tables are range-partitioned by month on the
+# inspection timestamp (children carry it as ``inspection_timestamp``), so every
+# key includes it. Partitions are managed by app.core.partitions.
+
 class ProductInspection(Base):
     __tablename__ = "product_inspections"
+    __table_args__ = (
+        UniqueConstraint("molding_machine_id", "timestamp", "shot_count", name="uq_product_inspections_natural_key"),
+        Index("ix_product_inspections_timestamp", "timestamp", postgresql_include=["id", "molding_machine_id", "defect_mask"]),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     version = Column(String, nullable=False)
-    timestamp = Column(DateTime, nullable=False)
+    timestamp = Column(DateTime, primary_key=True, nullable=False)
     molding_machine_id = Column(String, nullable=False)
+    shot_count = Column(Integer, nullable=False, default=NO_SHOT_COUNT, server_default=str(NO_SHOT_COUNT))
+    # The defect types found on any detection, one bit each (app.core.defect_masks).
+    defect_mask = Column(Integer, nullable=False, default=0, server_default="0")
     molding_machine_state = relationship("MoldingMachineState", back_populates="inspection", uselist=False, cascade="all, delete-orphan")
-    object_detections = relationship("ObjectDetection", back_populates="inspection", cascade="all, delete-orphan")
\ No newline at end of file
+    object_detections = relationship("ObjectDetection", back_populates="inspection", cascade="all, delete-orphan")
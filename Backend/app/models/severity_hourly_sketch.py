@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app.core.database import Base
+
+class SeverityHourlySketch(Base):
+    __tablename__ = "severity_hourly_sketches"
+
+    bucket = Column(DateTime, primary_key=True)
+    molding_machine_id = Column(String, primary_key=True)
+    defect_type = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    bin = Column(Integer, primary_key=True)
+    sample_count = Column(Integer, nullable=False, default=0)
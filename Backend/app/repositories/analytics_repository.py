@@ -1,42 +1,179 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, case, and_
+from sqlalchemy import select, func, case, and_, insert, text, cast, literal, Table, MetaData, Column, Integer, BigInteger, Boolean, String, DateTime, Float
+from sqlalchemy.dialects.postgresql import ARRAY
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal, Sequence, Tuple, Union
+import numpy as np
 
+from app.core.metrics import timed_repository
 from app.models.product_inspection import ProductInspection
 from app.models.molding_machine_state import MoldingMachineState
 from app.models.object_detection import ObjectDetection
 from app.models.defect import Defect
+from app.models.pixel_severity import PixelSeverity
+from app.models.machine_recipe import MachineRecipe
+from app.core.correlation import ParameterDefectStats, copy_float_rows, defect_matrix, ranked
+from app.core.defect_masks import DEFECT_TYPES, defect_bit, has_bits
+from app.core.buckets import AUTO, auto_grouping, bucket, lttb
+from app.core.sketches import quantile_label
+from app.repositories.recipe_repository import MEASUREMENTS, SETPOINTS, recipe_join, state_column
 
+# Scratch tables for get_dashboard. They live on their own metadata so
+# create_all never creates them, and are created per call as temporary tables.
+scratch_metadata = MetaData()
+
+DashboardInspections = Table(
+    "dashboard_inspections",
+    scratch_metadata,
+    Column("id", Integer),
+    Column("timestamp", DateTime),
+    Column("molding_machine_id", String),
+    Column("defect_count", BigInteger),
+    Column("cycle_time", Float),
+    Column("injection_pressure", Float),
+    Column("barrel_temp", Float),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+def time_range(column, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[Any]:
+    conditions = []
+    if start_date: conditions.append(column >= start_date)
+    if end_date: conditions.append(column <= end_date)
+    return conditions
+
+# Join conditions between the partitioned tables. Ids are unique across
+# partitions, so the id alone joins correctly; the filtered range is repeated on
+# the child's own partition key so its scans are pruned at plan time (Postgres
+# does not infer range bounds across a join). The timestamps are deliberately
+# not equated as well: the planner treats the two equalities as independent and
+# estimates the join at one row, which turns large joins into nested loops.
+def state_join(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    return and_(
+        MoldingMachineState.inspection_id == ProductInspection.id,
+        *time_range(MoldingMachineState.inspection_timestamp, start_date, end_date),
+    )
+
+def detection_join(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    return and_(
+        ObjectDetection.inspection_id == ProductInspection.id,
+        *time_range(ObjectDetection.inspection_timestamp, start_date, end_date),
+    )
+
+def defect_join(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    return and_(
+        Defect.object_detection_id == ObjectDetection.id,
+        *time_range(Defect.inspection_timestamp, start_date, end_date),
+    )
+
+def severity_join(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    return and_(
+        PixelSeverity.defect_id == Defect.id,
+        *time_range(PixelSeverity.inspection_timestamp, start_date, end_date),
+    )
+
+def has_defects(present: bool = True):
+    """Filter on whether an inspection has any defect, from its stored defect
+    mask: a test on the inspection row itself, with no child table probed."""
+    return ProductInspection.defect_mask != 0 if present else ProductInspection.defect_mask == 0
+
+def has_defect_type(defect_type: str):
+    """Filter on whether an inspection has a defect of ``defect_type``."""
+    return has_bits(ProductInspection.defect_mask, defect_bit(defect_type))
+
+# Every numeric or boolean process parameter on the machine state, measured
+# or set by its recipe. ShotCount is a counter, not a setting.
+PROCESS_PARAMETERS = [key for key in MEASUREMENTS if key != "ShotCount"] + SETPOINTS
+
+def _as_float(key: str):
+    column = state_column(key)
+    if isinstance(column.type, Boolean):
+        column = cast(column, Integer)
+    return cast(column, Float)
+
+# Rows decoded per NumPy batch when streaming inspections for correlations.
+CORRELATION_BATCH_SIZE = 20000
+
+CORRELATION_FIELDS = [
+    "machine_id", "defect_type", "parameter", "correlation", "t_statistic",
+    "mean_with_defect", "mean_without_defect", "inspections", "defects", "bins",
+]
+
+# A list of row objects, or one list per field when the repository is columnar.
+Records = Union[List[Dict[str, Any]], Dict[str, List[Any]]]
+
+# How get_severity_percentiles groups the severities, and the field each
+# group's key is returned under.
+SeverityBy = Literal["defect_type", "machine", "time"]
+SEVERITY_KEY_FIELDS = {"defect_type": "defect_type", "machine": "machine_id", "time": "timestamp"}
+
+# Per group: key, severities, value quantiles, threshold ratio quantiles,
+# severities above their threshold, severities with a threshold.
+SeveritySummary = Tuple[Any, int, List[Optional[float]], List[Optional[float]], int, int]
+
+def _columns(result, width: int) -> List[tuple]:
+    """Transpose result rows into one tuple per column."""
+    columns = list(zip(*result))
+    return columns if columns else [()] * width
+
+def _rate(part, whole) -> float:
+    return round((part / whole * 100), 2) if whole > 0 else 0.0
+
+def _rounded(value) -> Optional[float]:
+    return round(value, 2) if value else None
+
+@timed_repository
 class AnalyticsRepository:
-    def __init__(self, db: Session):
+    """Dashboard aggregates over the raw inspection tables.
+
+    With ``columnar=True`` list results are returned column-oriented, one
+    array per field (``{"timestamp": [...], "defect_rate": [...]}``), built
+    straight from the result rows.
+    """
+
+    def __init__(self, db: Session, columnar: bool = False):
         self.db = db
+        self.columnar = columnar
 
-    def _get_has_defects_subquery(self):
-        return (
-            select(func.count(Defect.id))
-            .select_from(ObjectDetection)
-            .join(Defect)
-            .where(ObjectDetection.inspection_id == ProductInspection.id)
-            .scalar_subquery()
-        )
+    def resolve_grouping(
+        self,
+        grouping: str,
+        max_points: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None
+    ) -> str:
+        """The bucket width to use for ``grouping``: itself, or for "auto" the
+        narrowest standard width giving at most ``max_points`` buckets over the
+        range, with open ends taken from the data."""
+        if grouping != AUTO:
+            return grouping
+        if start_date is None or end_date is None:
+            conditions = [ProductInspection.molding_machine_id == machine_id] if machine_id else []
+            first, last = self.db.execute(
+                select(func.min(ProductInspection.timestamp), func.max(ProductInspection.timestamp))
+                .where(*conditions, *time_range(ProductInspection.timestamp, start_date, end_date))
+            ).one()
+            start_date, end_date = start_date or first, end_date or last
+        return auto_grouping(start_date, end_date, max_points)
 
     def get_defect_trends(
         self, 
         grouping: str, 
         start_date: Optional[datetime] = None, 
         end_date: Optional[datetime] = None, 
-        machine_id: Optional[str] = None
-    ) -> List[Dict[str, Any]]:
+        machine_id: Optional[str] = None,
+        max_points: Optional[int] = None
+    ) -> Records:
         query = (
             select(
-                func.date_trunc(grouping, ProductInspection.timestamp).label("period"),
+                bucket(ProductInspection.timestamp, grouping).label("period"),
                 func.count(func.distinct(ProductInspection.id)).label("total_count"),
                 func.count(func.distinct(Defect.id)).label("defect_count"),
             )
             .select_from(ProductInspection)
-            .join(ObjectDetection, ProductInspection.id == ObjectDetection.inspection_id, isouter=True)
-            .join(Defect, ObjectDetection.id == Defect.object_detection_id, isouter=True)
+            .join(ObjectDetection, detection_join(start_date, end_date), isouter=True)
+            .join(Defect, defect_join(start_date, end_date), isouter=True)
         )
         
         conditions = []
@@ -49,7 +186,25 @@ class AnalyticsRepository:
         
         query = query.group_by("period").order_by("period")
         result = self.db.execute(query).all()
-        
+        return self._format_trends(self._downsample(result, max_points))
+
+    def _downsample(self, result, max_points: Optional[int]):
+        """At most ``max_points`` trend rows, chosen by LTTB on the defect rate."""
+        if not max_points or len(result) <= max_points:
+            return result
+        x = np.array([row.period.timestamp() for row in result])
+        y = np.array([row.defect_count / row.total_count if row.total_count else 0.0 for row in result])
+        return [result[i] for i in lttb(x, y, max_points)]
+
+    def _format_trends(self, result) -> Records:
+        if self.columnar:
+            periods, totals, defects = _columns(result, 3)
+            return {
+                "timestamp": [p.isoformat() for p in periods],
+                "total_count": list(totals),
+                "defect_count": list(defects),
+                "defect_rate": [_rate(d, t) for d, t in zip(defects, totals)],
+            }
         return [
             {
                 "timestamp": row.period.isoformat(),
@@ -62,11 +217,18 @@ class AnalyticsRepository:
     def get_machine_performance(
         self, 
         start_date: Optional[datetime] = None, 
-        end_date: Optional[datetime] = None
-    ) -> List[Dict[str, Any]]:
-        query = (
+        end_date: Optional[datetime] = None,
+        include_percentiles: bool = False,
+    ) -> Records:
+        conditions = []
+        if start_date: conditions.append(ProductInspection.timestamp >= start_date)
+        if end_date: conditions.append(ProductInspection.timestamp <= end_date)
+
+        # Process averages and defect counts are aggregated in separate passes
+        # and joined per machine, so neither is multiplied by the other's rows.
+        process = (
             select(
-                ProductInspection.molding_machine_id,
+                ProductInspection.molding_machine_id.label("molding_machine_id"),
                 func.avg(MoldingMachineState.CycleTime).label("avg_cycle"),
                 func.avg(MoldingMachineState.InjPeakPressure).label("avg_pressure"),
                 func.avg((
@@ -74,26 +236,72 @@ class AnalyticsRepository:
                     MoldingMachineState.Barrel3 + MoldingMachineState.Barrel4 + 
                     MoldingMachineState.Barrel5 + MoldingMachineState.Barrel6
                 ) / 6.0).label("avg_temp"),
-                func.count(func.distinct(ProductInspection.id)).label("total"),
-                func.count(func.distinct(Defect.id)).label("defects"),
+                func.count(ProductInspection.id).label("total"),
             )
             .select_from(ProductInspection)
-            .join(MoldingMachineState, ProductInspection.id == MoldingMachineState.inspection_id, isouter=True)
-            .join(ObjectDetection, ProductInspection.id == ObjectDetection.inspection_id, isouter=True)
-            .join(Defect, ObjectDetection.id == Defect.object_detection_id, isouter=True)
+            .join(MoldingMachineState, state_join(start_date, end_date), isouter=True)
+            .where(*conditions)
+            .group_by(ProductInspection.molding_machine_id)
+            .cte("process")
         )
-        
+        defects = (
+            select(
+                ProductInspection.molding_machine_id.label("molding_machine_id"),
+                func.count(Defect.id).label("defects"),
+            )
+            .select_from(ProductInspection)
+            .join(ObjectDetection, detection_join(start_date, end_date))
+            .join(Defect, defect_join(start_date, end_date))
+            .where(*conditions)
+            .group_by(ProductInspection.molding_machine_id)
+            .cte("machine_defects")
+        )
+        query = (
+            select(
+                process.c.molding_machine_id,
+                process.c.avg_cycle,
+                process.c.avg_pressure,
+                process.c.avg_temp,
+                process.c.total,
+                func.coalesce(defects.c.defects, 0).label("defects"),
+            )
+            .select_from(process)
+            .join(defects, process.c.molding_machine_id == defects.c.molding_machine_id, isouter=True)
+            .order_by(process.c.molding_machine_id)
+        )
+        result = self.db.execute(query).all()
+        percentiles = self._cycle_time_percentiles(start_date, end_date) if include_percentiles else None
+        return self._format_machine_performance(result, percentiles)
+
+    def _cycle_time_percentiles(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+        query = (
+            select(
+                ProductInspection.molding_machine_id,
+                func.percentile_cont(0.5).within_group(MoldingMachineState.CycleTime).label("p50"),
+                func.percentile_cont(0.95).within_group(MoldingMachineState.CycleTime).label("p95"),
+            )
+            .select_from(ProductInspection)
+            .join(MoldingMachineState, state_join(start_date, end_date))
+        )
+
         conditions = []
         if start_date: conditions.append(ProductInspection.timestamp >= start_date)
         if end_date: conditions.append(ProductInspection.timestamp <= end_date)
-        
+
         if conditions:
             query = query.where(and_(*conditions))
-        
-        query = query.group_by(ProductInspection.molding_machine_id).order_by(ProductInspection.molding_machine_id)
-        result = self.db.execute(query).all()
-        
-        return [
+
+        query = query.group_by(ProductInspection.molding_machine_id)
+        return {row.molding_machine_id: (row.p50, row.p95) for row in self.db.execute(query).all()}
+
+    def _format_machine_performance(self, result, percentiles=None) -> Records:
+        if self.columnar:
+            return self._machine_performance_columns(result, percentiles)
+        machines = [
             {
                 "machine_id": row.molding_machine_id,
                 "avg_cycle_time": round(row.avg_cycle, 2) if row.avg_cycle else None,
@@ -104,6 +312,29 @@ class AnalyticsRepository:
                 "defect_rate": round((row.defects / row.total * 100), 2) if row.total > 0 else 0.0,
             } for row in result
         ]
+        if percentiles is not None:
+            for machine in machines:
+                p50, p95 = percentiles.get(machine["machine_id"], (None, None))
+                machine["p50_cycle_time"] = round(p50, 2) if p50 is not None else None
+                machine["p95_cycle_time"] = round(p95, 2) if p95 is not None else None
+        return machines
+
+    def _machine_performance_columns(self, result, percentiles=None) -> Dict[str, List[Any]]:
+        machine_ids, cycles, pressures, temps, totals, defects = _columns(result, 6)
+        columns = {
+            "machine_id": list(machine_ids),
+            "avg_cycle_time": [_rounded(v) for v in cycles],
+            "avg_injection_pressure": [_rounded(v) for v in pressures],
+            "avg_barrel_temp": [_rounded(v) for v in temps],
+            "total_inspections": list(totals),
+            "defect_count": list(defects),
+            "defect_rate": [_rate(d, t) for d, t in zip(defects, totals)],
+        }
+        if percentiles is not None:
+            pairs = [percentiles.get(m, (None, None)) for m in machine_ids]
+            columns["p50_cycle_time"] = [round(p50, 2) if p50 is not None else None for p50, _ in pairs]
+            columns["p95_cycle_time"] = [round(p95, 2) if p95 is not None else None for _, p95 in pairs]
+        return columns
 
     def get_defect_distribution(
         self, 
@@ -113,8 +344,8 @@ class AnalyticsRepository:
     ) -> Dict[str, Any]:
         query = (
             select(Defect.defect_type, func.count(Defect.id).label("count"))
-            .join(ObjectDetection, Defect.object_detection_id == ObjectDetection.id)
-            .join(ProductInspection, ObjectDetection.inspection_id == ProductInspection.id)
+            .join(ObjectDetection, defect_join(start_date, end_date))
+            .join(ProductInspection, detection_join(start_date, end_date))
         )
         
         conditions = []
@@ -125,10 +356,20 @@ class AnalyticsRepository:
         if conditions:
             query = query.where(and_(*conditions))
         
-        query = query.group_by(Defect.defect_type).order_by(func.count(Defect.id).desc())
+        query = query.group_by(Defect.defect_type).order_by(func.count(Defect.id).desc(), Defect.defect_type)
         rows = self.db.execute(query).all()
-        
+        return self._format_distribution(rows)
+
+    def _format_distribution(self, rows) -> Dict[str, Any]:
         total_defects = sum(row.count for row in rows)
+        if self.columnar:
+            defect_types, counts = _columns(rows, 2)
+            distribution = {
+                "defect_type": list(defect_types),
+                "count": list(counts),
+                "percentage": [_rate(c, total_defects) for c in counts],
+            }
+            return {"distribution": distribution, "total_defects": total_defects}
         distribution = [
             {
                 "defect_type": row.defect_type,
@@ -138,6 +379,265 @@ class AnalyticsRepository:
         ]
         return {"distribution": distribution, "total_defects": total_defects}
 
+    def get_defect_cooccurrence(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Per machine, how many inspections had each pair of defect types
+        together: ``matrix[i][j]`` counts the inspections with both
+        DEFECT_TYPES[i] and DEFECT_TYPES[j], so the diagonal counts each type.
+
+        Read from the stored defect masks alone: the inspections are counted
+        per distinct mask in SQL (at most one row per mask and machine), and
+        the masks expanded into the matrix here.
+        """
+        conditions = time_range(ProductInspection.timestamp, start_date, end_date)
+        if machine_id: conditions.append(ProductInspection.molding_machine_id == machine_id)
+        rows = self.db.execute(
+            select(ProductInspection.molding_machine_id, ProductInspection.defect_mask, func.count().label("count"))
+            .where(*conditions)
+            .group_by(ProductInspection.molding_machine_id, ProductInspection.defect_mask)
+            .order_by(ProductInspection.molding_machine_id)
+        ).all()
+
+        machines: Dict[str, List[Any]] = {}
+        for machine, mask, count in rows:
+            totals = machines.setdefault(machine, [0, 0, np.zeros((len(DEFECT_TYPES), len(DEFECT_TYPES)), dtype=np.int64)])
+            totals[0] += count
+            if mask:
+                totals[1] += count
+                present = defect_matrix([mask])[0].astype(np.int64)
+                totals[2] += count * np.outer(present, present)
+        return self._format_cooccurrence(machines)
+
+    def _format_cooccurrence(self, machines: Dict[str, List[Any]]) -> Dict[str, Any]:
+        fields = ["machine_id", "inspections", "defective", "matrix"]
+        rows = [(machine, inspections, defective, matrix.tolist()) for machine, (inspections, defective, matrix) in machines.items()]
+        if self.columnar:
+            cooccurrence = {field: list(column) for field, column in zip(fields, _columns(rows, len(fields)))}
+        else:
+            cooccurrence = [dict(zip(fields, row)) for row in rows]
+        return {"defect_types": DEFECT_TYPES, "machines": cooccurrence}
+
+    def _severity_key(self, by: SeverityBy, grouping: str, timestamp, machine_id, defect_type):
+        if by == "time":
+            return bucket(timestamp, grouping)
+        return machine_id if by == "machine" else defect_type
+
+    def get_severity_percentiles(
+        self,
+        by: SeverityBy,
+        grouping: str,
+        quantiles: Sequence[float],
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        defect_type: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Pixel severity quantiles per defect type, machine or time bucket
+        (``grouping``), for the severity and for its ratio to the threshold,
+        with the share of severities above their threshold. Exact here, from
+        ``percentile_disc`` over the raw rows."""
+        key = self._severity_key(by, grouping, ProductInspection.timestamp, ProductInspection.molding_machine_id, Defect.defect_type)
+        ratio = PixelSeverity.value / func.nullif(PixelSeverity.threshold, 0)
+        qs = literal(list(quantiles), ARRAY(Float))
+        conditions = time_range(ProductInspection.timestamp, start_date, end_date)
+        if machine_id: conditions.append(ProductInspection.molding_machine_id == machine_id)
+        if defect_type: conditions.append(Defect.defect_type == defect_type)
+        query = (
+            select(
+                key.label("key"),
+                func.count(PixelSeverity.id).label("count"),
+                func.percentile_disc(qs).within_group(PixelSeverity.value).label("values"),
+                func.percentile_disc(qs).within_group(ratio).label("ratios"),
+                func.count().filter(ratio > 1).label("above"),
+                func.count(ratio).label("with_threshold"),
+            )
+            .select_from(ProductInspection)
+            .join(ObjectDetection, detection_join(start_date, end_date))
+            .join(Defect, defect_join(start_date, end_date))
+            .join(PixelSeverity, severity_join(start_date, end_date))
+            .where(*conditions)
+            .group_by("key")
+            .order_by("key")
+        )
+        summaries = [
+            (row.key, row.count, row.values, row.ratios or [None] * len(quantiles), row.above, row.with_threshold)
+            for row in self.db.execute(query).all()
+        ]
+        return self._format_severity_percentiles(by, quantiles, summaries, 0.0)
+
+    def _format_severity_percentiles(
+        self,
+        by: SeverityBy,
+        quantiles: Sequence[float],
+        summaries: List[SeveritySummary],
+        relative_error: float,
+    ) -> Dict[str, Any]:
+        key_field = SEVERITY_KEY_FIELDS[by]
+        labels = [quantile_label(q) for q in quantiles]
+        fields = [key_field, "count", *labels, *[f"threshold_ratio_{label}" for label in labels], "above_threshold_rate"]
+        rows = [
+            [
+                key.isoformat() if by == "time" else key,
+                count,
+                *[round(v, 4) if v is not None else None for v in values],
+                *[round(v, 4) if v is not None else None for v in ratios],
+                _rate(above, with_threshold),
+            ]
+            for key, count, values, ratios, above, with_threshold in summaries
+        ]
+        if self.columnar:
+            severities = {field: list(column) for field, column in zip(fields, _columns(rows, len(fields)))}
+        else:
+            severities = [dict(zip(fields, row)) for row in rows]
+        return {"severities": severities, "relative_error": relative_error}
+
+    def get_parameter_correlations(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        defect_type: Optional[str] = None,
+        top: int = 10,
+        bins: int = 10,
+    ) -> Records:
+        """Rank the process parameters by point-biserial correlation with each
+        defect type, per machine.
+
+        Two queries: per-machine parameter bounds for the bins, then every
+        inspection's parameters and stored defect mask streamed as binary COPY
+        output in fixed-size batches that are folded into NumPy accumulators,
+        so memory stays bounded by the batch size.
+        """
+        conditions = time_range(ProductInspection.timestamp, start_date, end_date)
+        if machine_id: conditions.append(ProductInspection.molding_machine_id == machine_id)
+        parameters = [_as_float(key) for key in PROCESS_PARAMETERS]
+
+        bounds_query = (
+            select(
+                ProductInspection.molding_machine_id,
+                *[func.min(p) for p in parameters],
+                *[func.max(p) for p in parameters],
+            )
+            .select_from(ProductInspection)
+            .join(MoldingMachineState, state_join(start_date, end_date))
+            .join(MachineRecipe, recipe_join(), isouter=True)
+            .where(*conditions)
+            .group_by(ProductInspection.molding_machine_id)
+            .order_by(ProductInspection.molding_machine_id)
+        )
+        width = len(parameters)
+        machines: List[str] = []
+        stats: List[ParameterDefectStats] = []
+        for row in self.db.execute(bounds_query):
+            bounds = np.array(row[1:], dtype=np.float64)
+            machines.append(row[0])
+            stats.append(ParameterDefectStats(bounds[:width], bounds[width:], bins))
+        if not machines:
+            return {key: [] for key in CORRELATION_FIELDS} if self.columnar else []
+
+        # Every column is a non-null float8 (the machine as its position in
+        # ``machines``, missing parameters as NaN) so the binary rows have a
+        # fixed layout and each batch decodes with one np.frombuffer.
+        nan = literal(float("nan"), Float)
+        rows_query = (
+            select(
+                cast(func.array_position(literal(machines, ARRAY(String)), ProductInspection.molding_machine_id) - 1, Float),
+                cast(ProductInspection.defect_mask, Float),
+                *[func.coalesce(p, nan) for p in parameters],
+            )
+            .select_from(ProductInspection)
+            .join(MoldingMachineState, state_join(start_date, end_date))
+            .join(MachineRecipe, recipe_join(), isouter=True)
+            .where(*conditions)
+        )
+
+        def fold(batch: np.ndarray) -> None:
+            codes = batch[:, 0].astype(np.int64)
+            y = defect_matrix(batch[:, 1])
+            x = batch[:, 2:]
+            for code in np.unique(codes):
+                rows = codes == code
+                stats[code].update(x[rows], y[rows])
+
+        copy_float_rows(self.db.connection(), rows_query, width + 2, CORRELATION_BATCH_SIZE, fold)
+
+        results = [
+            {"machine_id": machine, **row}
+            for machine, machine_stats in zip(machines, stats)
+            for row in ranked(machine_stats, PROCESS_PARAMETERS, top, only_type=defect_type)
+        ]
+        if self.columnar:
+            return {key: [row[key] for row in results] for key in CORRELATION_FIELDS}
+        return results
+
+    def get_recipe_changes(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ) -> Records:
+        """Each machine's recipe changes in time order: the first shot run on
+        a different recipe than the shot before, and the setpoints that
+        changed. A machine's first shot in the range opens its timeline, with
+        every setpoint changed from nothing.
+
+        The changes are found with ``lag`` over the shots' recipe ids, so only
+        the few recipes involved are loaded to compare setpoints.
+        """
+        conditions = time_range(ProductInspection.timestamp, start_date, end_date)
+        if machine_id: conditions.append(ProductInspection.molding_machine_id == machine_id)
+        window = {
+            "partition_by": ProductInspection.molding_machine_id,
+            "order_by": (ProductInspection.timestamp, ProductInspection.id),
+        }
+        shots = (
+            select(
+                ProductInspection.molding_machine_id.label("machine_id"),
+                ProductInspection.timestamp,
+                ProductInspection.id.label("inspection_id"),
+                MoldingMachineState.recipe_id,
+                func.lag(MoldingMachineState.recipe_id).over(**window).label("previous_recipe_id"),
+                func.row_number().over(**window).label("shot"),
+            )
+            .select_from(ProductInspection)
+            .join(MoldingMachineState, state_join(start_date, end_date))
+            .where(*conditions)
+            .subquery()
+        )
+        changes = self.db.execute(
+            select(shots.c.machine_id, shots.c.timestamp, shots.c.inspection_id, shots.c.recipe_id, shots.c.previous_recipe_id)
+            .where((shots.c.shot == 1) | shots.c.recipe_id.is_distinct_from(shots.c.previous_recipe_id))
+            .order_by(shots.c.machine_id, shots.c.timestamp, shots.c.inspection_id)
+        ).all()
+
+        ids = {row.recipe_id for row in changes} | {row.previous_recipe_id for row in changes}
+        ids.discard(None)
+        recipes = {
+            recipe.id: recipe
+            for recipe in self.db.execute(select(MachineRecipe).where(MachineRecipe.id.in_(ids))).scalars()
+        } if ids else {}
+        return self._format_recipe_changes(changes, recipes)
+
+    def _format_recipe_changes(self, changes, recipes: Dict[int, MachineRecipe]) -> Records:
+        fields = ["machine_id", "timestamp", "inspection_id", "recipe_id", "previous_recipe_id", "setpoints"]
+        rows = []
+        for machine_id, timestamp, inspection_id, recipe_id, previous_recipe_id in changes:
+            current, previous = recipes.get(recipe_id), recipes.get(previous_recipe_id)
+            setpoints = {}
+            for key in SETPOINTS:
+                before = getattr(previous, key) if previous else None
+                after = getattr(current, key) if current else None
+                if before != after:
+                    setpoints[key] = {"from": before, "to": after}
+            rows.append((machine_id, timestamp, inspection_id, recipe_id, previous_recipe_id, setpoints))
+        if self.columnar:
+            return {field: list(column) for field, column in zip(fields, _columns(rows, len(fields)))}
+        return [dict(zip(fields, row)) for row in rows]
+
     def get_summary_metrics(
         self, 
         start_date: Optional[datetime] = None, 
@@ -152,8 +652,8 @@ class AnalyticsRepository:
                 func.max(ProductInspection.timestamp).label("date_end"),
             )
             .select_from(ProductInspection)
-            .join(ObjectDetection, ProductInspection.id == ObjectDetection.inspection_id, isouter=True)
-            .join(Defect, ObjectDetection.id == Defect.object_detection_id, isouter=True)
+            .join(ObjectDetection, detection_join(start_date, end_date), isouter=True)
+            .join(Defect, defect_join(start_date, end_date), isouter=True)
         )
         
         conditions = []
@@ -164,6 +664,9 @@ class AnalyticsRepository:
             query = query.where(and_(*conditions))
         
         row = self.db.execute(query).one()
+        return self._format_summary(row)
+
+    def _format_summary(self, row) -> Dict[str, Any]:
         total_inspections = row.total_inspections or 0
         total_defects = row.total_defects or 0
         
@@ -174,4 +677,124 @@ class AnalyticsRepository:
             "total_machines": row.total_machines or 0,
             "date_start": row.date_start,
             "date_end": row.date_end,
-        }
\ No newline at end of file
+        }
+
+    def _materialize(self, table: Table, source, analyze: bool = True) -> None:
+        """Fill a temporary table from ``source`` within the current transaction.
+
+        Temporary tables are never auto-analyzed; pass ``analyze`` when the
+        table will be joined, so the planner has statistics to pick a join.
+        """
+        conn = self.db.connection()
+        table.create(conn)
+        conn.execute(insert(table).from_select([c.name for c in table.columns], source))
+        if analyze:
+            conn.execute(text(f"ANALYZE {table.name}"))
+
+    def get_dashboard(
+        self,
+        grouping: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        max_points: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Trends, machine performance, distribution and summary in one pass.
+
+        The inspections in the date range are read once into a temporary
+        table, together with their defect count and process values, and all
+        four aggregates are derived from it. ``machine_id`` narrows trends and
+        distribution only, as it does on the individual endpoints.
+        """
+        conditions = []
+        if start_date: conditions.append(ProductInspection.timestamp >= start_date)
+        if end_date: conditions.append(ProductInspection.timestamp <= end_date)
+
+        defects = (
+            select(ObjectDetection.inspection_id.label("inspection_id"), func.count(Defect.id).label("defect_count"))
+            .select_from(ProductInspection)
+            .join(ObjectDetection, detection_join(start_date, end_date))
+            .join(Defect, defect_join(start_date, end_date))
+            .where(*conditions)
+            .group_by(ObjectDetection.inspection_id)
+            .subquery()
+        )
+        source = (
+            select(
+                ProductInspection.id,
+                ProductInspection.timestamp,
+                ProductInspection.molding_machine_id,
+                func.coalesce(defects.c.defect_count, 0),
+                MoldingMachineState.CycleTime,
+                MoldingMachineState.InjPeakPressure,
+                (
+                    MoldingMachineState.Barrel1 + MoldingMachineState.Barrel2 +
+                    MoldingMachineState.Barrel3 + MoldingMachineState.Barrel4 +
+                    MoldingMachineState.Barrel5 + MoldingMachineState.Barrel6
+                ) / 6.0,
+            )
+            .select_from(ProductInspection)
+            .join(MoldingMachineState, state_join(start_date, end_date), isouter=True)
+            .join(defects, ProductInspection.id == defects.c.inspection_id, isouter=True)
+            .where(*conditions)
+        )
+        t = DashboardInspections
+        self._materialize(t, source)
+
+        machine_filter = [t.c.molding_machine_id == machine_id] if machine_id else []
+
+        trends = self.db.execute(
+            select(
+                bucket(t.c.timestamp, grouping).label("period"),
+                func.count().label("total_count"),
+                func.sum(t.c.defect_count).cast(BigInteger).label("defect_count"),
+            )
+            .where(*machine_filter)
+            .group_by("period")
+            .order_by("period")
+        ).all()
+
+        machines = self.db.execute(
+            select(
+                t.c.molding_machine_id,
+                func.avg(t.c.cycle_time).label("avg_cycle"),
+                func.avg(t.c.injection_pressure).label("avg_pressure"),
+                func.avg(t.c.barrel_temp).label("avg_temp"),
+                func.count().label("total"),
+                func.sum(t.c.defect_count).cast(BigInteger).label("defects"),
+            )
+            .group_by(t.c.molding_machine_id)
+            .order_by(t.c.molding_machine_id)
+        ).all()
+
+        count = func.count(Defect.id)
+        distribution = self.db.execute(
+            select(Defect.defect_type, count.label("count"))
+            .select_from(t)
+            .join(ObjectDetection, and_(ObjectDetection.inspection_id == t.c.id, *time_range(ObjectDetection.inspection_timestamp, start_date, end_date)))
+            .join(Defect, defect_join(start_date, end_date))
+            .where(t.c.defect_count > 0, *machine_filter)
+            .group_by(Defect.defect_type)
+            .order_by(count.desc(), Defect.defect_type)
+        ).all()
+
+        summary = self.db.execute(
+            select(
+                func.count().label("total_inspections"),
+                func.sum(t.c.defect_count).cast(BigInteger).label("total_defects"),
+                func.count(func.distinct(t.c.molding_machine_id)).label("total_machines"),
+                func.min(t.c.timestamp).label("date_start"),
+                func.max(t.c.timestamp).label("date_end"),
+            )
+        ).one()
+
+        t.drop(self.db.connection())
+        return self._format_dashboard(grouping, self._downsample(trends, max_points), machines, distribution, summary)
+
+    def _format_dashboard(self, grouping, trends, machines, distribution, summary) -> Dict[str, Any]:
+        return {
+            "trends": {"trends": self._format_trends(trends), "grouping": grouping},
+            "machine_performance": {"machines": self._format_machine_performance(machines)},
+            "distribution": self._format_distribution(distribution),
+            "summary": self._format_summary(summary),
+        }
@@ -0,0 +1,236 @@
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from app.core import cache
+from app.core.config import settings
+from app.repositories.analytics_repository import AnalyticsRepository
+from app.repositories.watermark_repository import Watermark, WatermarkRepository
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str):
+        # The repositories treat an empty filter as no filter.
+        return value.strip() or None
+    return value
+
+class AnalyticsCache:
+    """Result cache for the analytics queries, keyed on the normalized request
+    parameters plus the data watermark.
+
+    Every lookup reads the current watermark (one index-only ``max(id)`` and a
+    sequence read), so a committed ingest makes every earlier entry unreachable
+    immediately; the TTL only bounds how long an entry can survive a missed
+    bump. Results live in a local LRU and, when ``ANALYTICS_CACHE_URL`` is set,
+    in a shared backend so replicas reuse each other's work.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, shared: Optional[cache.SharedCacheBackend] = None):
+        self.local = cache.LRUTTLCache(max_entries, ttl)
+        self.shared = shared
+        self.ttl = ttl
+        self._watermark: Optional[Watermark] = None
+        self._lock = threading.Lock()
+        self.invalidations = 0
+        self.shared_hits = 0
+
+    @classmethod
+    def from_settings(cls) -> "AnalyticsCache":
+        return cls(
+            settings.ANALYTICS_CACHE_MAX_ENTRIES,
+            settings.ANALYTICS_CACHE_TTL_SECONDS,
+            cache.shared_backend_from_url(settings.ANALYTICS_CACHE_URL),
+        )
+
+    def observe(self, watermark: Watermark) -> None:
+        # Entries under an older watermark can never be hit again; drop them
+        # now instead of waiting for the LRU to push them out. Requests racing
+        # an ingest can report an older watermark, so only ever move forward
+        # (generation first, since deletes can lower max id).
+        with self._lock:
+            current = self._watermark
+            if current is not None and (watermark[1], watermark[0]) <= (current[1], current[0]):
+                return
+            if current is not None:
+                self.local.clear()
+                self.invalidations += 1
+            self._watermark = watermark
+
+    def get_or_compute(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        value = self.local.get(key, cache._MISSING)
+        if value is not cache._MISSING:
+            return value
+
+        if self.shared is not None:
+            shared_key = "analytics:" + cache.dumps(key)
+            stored = self.shared.get(shared_key)
+            if stored is not None:
+                value = cache.loads(stored)
+                self.shared_hits += 1
+            else:
+                value = compute()
+                self.shared.set(shared_key, cache.dumps(value), self.ttl)
+        else:
+            value = compute()
+
+        self.local.set(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.local.stats(),
+            "invalidations": self.invalidations,
+            "shared_backend": type(self.shared).__name__ if self.shared is not None else None,
+            "shared_hits": self.shared_hits,
+            "watermark": list(self._watermark) if self._watermark is not None else None,
+        }
+
+analytics_cache = AnalyticsCache.from_settings()
+
+class CachedAnalyticsRepository:
+    """Serves the ``AnalyticsRepository`` methods through ``AnalyticsCache``."""
+
+    def __init__(self, repo: AnalyticsRepository, results: AnalyticsCache = analytics_cache):
+        self.repo = repo
+        self.db = repo.db
+        self.columnar = repo.columnar
+        self.results = results
+
+    def _cached(self, endpoint: str, params: Tuple, compute: Callable[[], Any]) -> Any:
+        watermark = WatermarkRepository(self.db).current()
+        self.results.observe(watermark)
+        key = (endpoint, self.repo.columnar, *(_normalize(p) for p in params), *watermark)
+        return self.results.get_or_compute(key, compute)
+
+    def resolve_grouping(
+        self,
+        grouping: str,
+        max_points: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None
+    ) -> str:
+        return self._cached(
+            "grouping",
+            (grouping, start_date, end_date, machine_id, max_points),
+            lambda: self.repo.resolve_grouping(grouping, max_points, start_date, end_date, machine_id),
+        )
+
+    def get_defect_trends(
+        self,
+        grouping: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        max_points: Optional[int] = None
+    ):
+        return self._cached(
+            "defect_trends",
+            (grouping, start_date, end_date, machine_id, max_points),
+            lambda: self.repo.get_defect_trends(grouping, start_date, end_date, machine_id, max_points),
+        )
+
+    def get_machine_performance(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        include_percentiles: bool = False
+    ):
+        return self._cached(
+            "machine_performance",
+            (None, start_date, end_date, None, include_percentiles),
+            lambda: self.repo.get_machine_performance(start_date, end_date, include_percentiles),
+        )
+
+    def get_defect_distribution(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None
+    ):
+        return self._cached(
+            "defect_distribution",
+            (None, start_date, end_date, machine_id),
+            lambda: self.repo.get_defect_distribution(start_date, end_date, machine_id),
+        )
+
+    def get_defect_cooccurrence(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ):
+        return self._cached(
+            "defect_cooccurrence",
+            (None, start_date, end_date, machine_id),
+            lambda: self.repo.get_defect_cooccurrence(start_date, end_date, machine_id),
+        )
+
+    def get_parameter_correlations(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        defect_type: Optional[str] = None,
+        top: int = 10,
+        bins: int = 10,
+    ):
+        return self._cached(
+            "parameter_correlations",
+            (None, start_date, end_date, machine_id, defect_type, top, bins),
+            lambda: self.repo.get_parameter_correlations(start_date, end_date, machine_id, defect_type, top, bins),
+        )
+
+    def get_severity_percentiles(
+        self,
+        by: str,
+        grouping: str,
+        quantiles: Sequence[float],
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        defect_type: Optional[str] = None,
+    ):
+        return self._cached(
+            "severity_percentiles",
+            (grouping, start_date, end_date, machine_id, by, tuple(quantiles), defect_type),
+            lambda: self.repo.get_severity_percentiles(by, grouping, quantiles, start_date, end_date, machine_id, defect_type),
+        )
+
+    def get_recipe_changes(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ):
+        return self._cached(
+            "recipe_changes",
+            (None, start_date, end_date, machine_id),
+            lambda: self.repo.get_recipe_changes(start_date, end_date, machine_id),
+        )
+
+    def get_summary_metrics(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ):
+        return self._cached(
+            "summary",
+            (None, start_date, end_date, None),
+            lambda: self.repo.get_summary_metrics(start_date, end_date),
+        )
+
+    def get_dashboard(
+        self,
+        grouping: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        max_points: Optional[int] = None
+    ):
+        return self._cached(
+            "dashboard",
+            (grouping, start_date, end_date, machine_id, max_points),
+            lambda: self.repo.get_dashboard(grouping, start_date, end_date, machine_id, max_points),
+        )
@@ -0,0 +1,141 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, cast, literal, any_, Float, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from datetime import datetime
+from typing import Optional, List, Sequence, Tuple
+import numpy as np
+
+from app.core import partitions
+from app.core.correlation import copy_float_rows
+from app.core.defect_masks import mask_aggregate
+from app.core.metrics import timed_repository
+from app.models.product_inspection import ProductInspection
+from app.models.molding_machine_state import MoldingMachineState
+from app.models.object_detection import ObjectDetection
+from app.models.defect import Defect
+from app.repositories.analytics_repository import time_range, state_join, detection_join, defect_join
+from app.repositories.rollup_repository import BARREL_TEMP
+
+# Fields of the rows read into the column store, in order. Every one is a
+# non-null float8 so the rows stream as binary COPY with a fixed layout: the
+# timestamp as microseconds since the epoch (exact in a double), the machine
+# as its position in the machine list passed in, missing measurements as NaN.
+FIELDS = ["id", "timestamp", "machine", "defect_mask", "defect_count", "cycle_time", "injection_pressure", "barrel_temp"]
+
+# Rows decoded per NumPy batch while loading.
+LOAD_BATCH_SIZE = 50000
+
+# Per inspection with more than one defect of a type: (inspection id, defect
+# type, defects of that type).
+RepeatedDefect = Tuple[int, str, int]
+
+@timed_repository
+class ColumnStoreRepository:
+    """Reads inspections, with their defect counts and the process values the
+    dashboard averages, for the in-process column store (``app.core.column_store``).
+
+    Reads are bounded by ``conditions`` on ``ProductInspection``; ``start_date``
+    and ``end_date`` (inclusive) must cover the inspections they match, and
+    only prune the child table partitions.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def months(self) -> List[Tuple[datetime, datetime]]:
+        """``[start, end)`` of every inspection partition, oldest first."""
+        months = sorted(partitions.existing_months(self.db.connection()))
+        return [
+            (datetime.combine(m, datetime.min.time()), datetime.combine(partitions.next_month(m), datetime.min.time()))
+            for m in months
+        ]
+
+    def after_id(self, last_id: int, missing: Sequence[int] = ()):
+        """Condition matching inspections newer than ``last_id``, or among the
+        ``missing`` older ids."""
+        newer = ProductInspection.id > last_id
+        if len(missing) == 0:
+            return newer
+        return newer | (ProductInspection.id == any_(literal([int(i) for i in missing], ARRAY(Integer))))
+
+    def machines(self, *conditions) -> Tuple[List[str], Optional[datetime], Optional[datetime]]:
+        """The machines of the inspections matching ``conditions``, and the
+        first and last of their timestamps."""
+        rows = self.db.execute(
+            select(ProductInspection.molding_machine_id, func.min(ProductInspection.timestamp), func.max(ProductInspection.timestamp))
+            .where(*conditions)
+            .group_by(ProductInspection.molding_machine_id)
+        ).all()
+        if not rows:
+            return [], None, None
+        return [row[0] for row in rows], min(row[1] for row in rows), max(row[2] for row in rows)
+
+    def rows(
+        self,
+        machines: Sequence[str],
+        *conditions,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> np.ndarray:
+        """The inspections matching ``conditions`` as a rows x FIELDS matrix.
+
+        The defect count and mask are computed from the defect rows rather
+        than read from ``defect_mask``, so the store agrees with the SQL
+        aggregates even where the stored masks await a backfill.
+        """
+        defects = (
+            select(
+                ObjectDetection.inspection_id.label("inspection_id"),
+                func.count(Defect.id).label("defect_count"),
+                mask_aggregate(Defect.defect_type).label("defect_mask"),
+            )
+            .select_from(ProductInspection)
+            .join(ObjectDetection, detection_join(start_date, end_date))
+            .join(Defect, defect_join(start_date, end_date))
+            .where(*conditions)
+            .group_by(ObjectDetection.inspection_id)
+            .subquery()
+        )
+        nan = literal(float("nan"), Float)
+        query = (
+            select(
+                cast(ProductInspection.id, Float),
+                cast(func.extract("epoch", ProductInspection.timestamp) * 1000000, Float),
+                cast(func.array_position(literal(list(machines), ARRAY(String)), ProductInspection.molding_machine_id) - 1, Float),
+                cast(func.coalesce(defects.c.defect_mask, 0), Float),
+                cast(func.coalesce(defects.c.defect_count, 0), Float),
+                func.coalesce(MoldingMachineState.CycleTime, nan),
+                func.coalesce(MoldingMachineState.InjPeakPressure, nan),
+                func.coalesce(BARREL_TEMP, nan),
+            )
+            .select_from(ProductInspection)
+            .join(MoldingMachineState, state_join(start_date, end_date), isouter=True)
+            .join(defects, ProductInspection.id == defects.c.inspection_id, isouter=True)
+            .where(*conditions)
+        )
+        batches: List[np.ndarray] = []
+        copy_float_rows(self.db.connection(), query, len(FIELDS), LOAD_BATCH_SIZE, batches.append)
+        return np.vstack(batches) if batches else np.empty((0, len(FIELDS)))
+
+    def repeated_defects(
+        self,
+        inspection_ids: Sequence[int],
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> List[RepeatedDefect]:
+        """Defect types found more than once on any of ``inspection_ids``,
+        which a defect mask alone cannot count."""
+        if len(inspection_ids) == 0:
+            return []
+        count = func.count(Defect.id)
+        return [tuple(row) for row in self.db.execute(
+            select(ObjectDetection.inspection_id, Defect.defect_type, count)
+            .select_from(ObjectDetection)
+            .join(Defect, defect_join(start_date, end_date))
+            .where(
+                ObjectDetection.inspection_id == any_(literal([int(i) for i in inspection_ids], ARRAY(Integer))),
+                *time_range(ObjectDetection.inspection_timestamp, start_date, end_date),
+            )
+            .group_by(ObjectDetection.inspection_id, Defect.defect_type)
+            .having(count > 1)
+        ).all()]
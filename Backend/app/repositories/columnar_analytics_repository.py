@@ -0,0 +1,115 @@
+from collections import namedtuple
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.buckets import AUTO, auto_grouping
+from app.core.column_store import ColumnStore, column_store
+from app.core.metrics import timed_repository
+from app.repositories.analytics_repository import AnalyticsRepository, Records
+
+# Shaped like the result rows of the SQL queries the formatters expect.
+TrendRow = namedtuple("TrendRow", ["period", "total_count", "defect_count"])
+MachineRow = namedtuple("MachineRow", ["molding_machine_id", "avg_cycle", "avg_pressure", "avg_temp", "total", "defects"])
+DistributionRow = namedtuple("DistributionRow", ["defect_type", "count"])
+SummaryRow = namedtuple("SummaryRow", ["total_inspections", "total_defects", "total_machines", "date_start", "date_end"])
+
+@timed_repository
+class ColumnarAnalyticsRepository:
+    """Answers the dashboard aggregates (trends, machine performance, defect
+    distribution, summary) from the in-process column store, formatted by
+    ``repo``. Other queries, and these while the store is loading, go to
+    ``repo``.
+    """
+
+    def __init__(self, repo: AnalyticsRepository, store: ColumnStore = column_store):
+        self.repo = repo
+        self.db = repo.db
+        self.columnar = repo.columnar
+        self.store = store
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.repo, name)
+
+    def resolve_grouping(
+        self,
+        grouping: str,
+        max_points: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None
+    ) -> str:
+        snapshot = self.store.snapshot(self.db)
+        if grouping != AUTO or snapshot is None:
+            return self.repo.resolve_grouping(grouping, max_points, start_date, end_date, machine_id)
+        if start_date is None or end_date is None:
+            first, last = snapshot.first_last(start_date, end_date, machine_id)
+            start_date, end_date = start_date or first, end_date or last
+        return auto_grouping(start_date, end_date, max_points)
+
+    def get_defect_trends(
+        self,
+        grouping: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        max_points: Optional[int] = None
+    ) -> Records:
+        snapshot = self.store.snapshot(self.db)
+        if snapshot is None:
+            return self.repo.get_defect_trends(grouping, start_date, end_date, machine_id, max_points)
+        rows = [TrendRow(*row) for row in snapshot.trends(grouping, start_date, end_date, machine_id)]
+        return self.repo._format_trends(self.repo._downsample(rows, max_points))
+
+    def get_machine_performance(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        include_percentiles: bool = False,
+    ) -> Records:
+        snapshot = self.store.snapshot(self.db)
+        if snapshot is None:
+            return self.repo.get_machine_performance(start_date, end_date, include_percentiles)
+        rows = [MachineRow(*row) for row in snapshot.machine_performance(start_date, end_date)]
+        percentiles = snapshot.cycle_time_percentiles(start_date, end_date) if include_percentiles else None
+        return self.repo._format_machine_performance(rows, percentiles)
+
+    def get_defect_distribution(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        snapshot = self.store.snapshot(self.db)
+        if snapshot is None:
+            return self.repo.get_defect_distribution(start_date, end_date, machine_id)
+        rows = [DistributionRow(*row) for row in snapshot.defect_distribution(start_date, end_date, machine_id)]
+        return self.repo._format_distribution(rows)
+
+    def get_summary_metrics(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        snapshot = self.store.snapshot(self.db)
+        if snapshot is None:
+            return self.repo.get_summary_metrics(start_date, end_date)
+        return self.repo._format_summary(SummaryRow(*snapshot.summary(start_date, end_date)))
+
+    def get_dashboard(
+        self,
+        grouping: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        max_points: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """The four aggregates from one snapshot. ``machine_id`` narrows trends
+        and distribution only, as in the SQL repositories."""
+        snapshot = self.store.snapshot(self.db)
+        if snapshot is None:
+            return self.repo.get_dashboard(grouping, start_date, end_date, machine_id, max_points)
+        trends = [TrendRow(*row) for row in snapshot.trends(grouping, start_date, end_date, machine_id)]
+        machines = [MachineRow(*row) for row in snapshot.machine_performance(start_date, end_date)]
+        distribution = [DistributionRow(*row) for row in snapshot.defect_distribution(start_date, end_date, machine_id)]
+        summary = SummaryRow(*snapshot.summary(start_date, end_date))
+        return self.repo._format_dashboard(grouping, self.repo._downsample(trends, max_points), machines, distribution, summary)
@@ -0,0 +1,78 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func, and_, exists
+from datetime import datetime
+from typing import List
+
+from app.core.defect_masks import mask_aggregate
+from app.core.metrics import timed_repository
+from app.models.product_inspection import ProductInspection
+from app.models.object_detection import ObjectDetection
+from app.models.defect import Defect
+
+# Masks are recomputed one range of inspection timestamps at a time
+# (``start`` inclusive, ``end`` exclusive), normally a month: one partition of
+# each table, and a bounded transaction.
+
+def defect_mask_select(start: datetime, end: datetime):
+    """The defect mask of every inspection in range that has defects,
+    computed from its defect rows."""
+    return (
+        select(ObjectDetection.inspection_id.label("inspection_id"), mask_aggregate(Defect.defect_type).label("mask"))
+        .select_from(ObjectDetection)
+        .join(Defect, and_(
+            Defect.object_detection_id == ObjectDetection.id,
+            Defect.inspection_timestamp >= start,
+            Defect.inspection_timestamp < end,
+        ))
+        .where(ObjectDetection.inspection_timestamp >= start, ObjectDetection.inspection_timestamp < end)
+        .group_by(ObjectDetection.inspection_id)
+    )
+
+def _in_range(start: datetime, end: datetime) -> List:
+    return [ProductInspection.timestamp >= start, ProductInspection.timestamp < end]
+
+def backfill_statements(start: datetime, end: datetime) -> List:
+    """UPDATEs that bring the stored masks in range in line with the defect
+    rows: set the mask of inspections with defects, then clear it on those
+    without. Rows that are already right are not touched."""
+    masks = defect_mask_select(start, end).subquery()
+    any_defect = (
+        exists()
+        .where(
+            ObjectDetection.inspection_id == ProductInspection.id,
+            ObjectDetection.inspection_timestamp == ProductInspection.timestamp,
+            Defect.object_detection_id == ObjectDetection.id,
+            Defect.inspection_timestamp == ProductInspection.timestamp,
+        )
+    )
+    return [
+        update(ProductInspection)
+        .where(*_in_range(start, end), ProductInspection.id == masks.c.inspection_id, ProductInspection.defect_mask != masks.c.mask)
+        .values(defect_mask=masks.c.mask),
+        update(ProductInspection)
+        .where(*_in_range(start, end), ProductInspection.defect_mask != 0, ~any_defect)
+        .values(defect_mask=0),
+    ]
+
+@timed_repository
+class DefectMaskRepository:
+    """Maintains ``ProductInspection.defect_mask`` for inspections written
+    before it existed, or whose defect types were renumbered. Ingest sets the
+    mask of every new inspection itself."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def backfill(self, start: datetime, end: datetime) -> int:
+        """Recompute the masks in range; returns the inspections changed."""
+        return sum(self.db.execute(statement).rowcount for statement in backfill_statements(start, end))
+
+    def check(self, start: datetime, end: datetime) -> int:
+        """Count the inspections in range whose stored mask is wrong."""
+        masks = defect_mask_select(start, end).subquery()
+        return self.db.execute(
+            select(func.count())
+            .select_from(ProductInspection)
+            .join(masks, masks.c.inspection_id == ProductInspection.id, isouter=True)
+            .where(*_in_range(start, end), ProductInspection.defect_mask != func.coalesce(masks.c.mask, 0))
+        ).scalar()
@@ -0,0 +1,117 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
+from datetime import datetime
+from typing import Optional, Iterator, Sequence
+
+from app.core.export import ExportFormat, encode
+from app.core.metrics import timed_repository
+from app.models.product_inspection import ProductInspection
+from app.models.molding_machine_state import MoldingMachineState
+from app.models.machine_recipe import MachineRecipe
+from app.models.object_detection import ObjectDetection
+from app.models.defect import Defect
+from app.models.pixel_severity import PixelSeverity
+from app.repositories.analytics_repository import time_range, state_join, detection_join, defect_join, severity_join, has_defects, has_defect_type
+from app.repositories.inspection_repository import STATE_COLUMNS
+from app.repositories.recipe_repository import state_column, recipe_join
+
+# One row per defect, repeating its inspection, machine state and detection;
+# inspections without defects appear once with the detection and defect
+# columns empty.
+EXPORT_COLUMNS = [
+    ProductInspection.id.label("inspection_id"),
+    ProductInspection.timestamp.label("timestamp"),
+    ProductInspection.molding_machine_id.label("machine_id"),
+    ProductInspection.shot_count.label("shot_count"),
+    ProductInspection.version.label("version"),
+    *[state_column(key).label(key) for key in STATE_COLUMNS],
+    ObjectDetection.name.label("detection"),
+    ObjectDetection.reject.label("detection_reject"),
+    Defect.defect_type.label("defect_type"),
+    Defect.reject.label("defect_reject"),
+    PixelSeverity.value.label("pixel_severity"),
+    PixelSeverity.min_value.label("pixel_severity_min"),
+    PixelSeverity.max_value.label("pixel_severity_max"),
+    PixelSeverity.threshold.label("pixel_severity_threshold"),
+    PixelSeverity.reject.label("pixel_severity_reject"),
+]
+
+@timed_repository
+class ExportRepository:
+    """Denormalized inspection rows for bulk export.
+
+    Rows are read through a server-side cursor and handed out in batches, so
+    memory is bounded by the batch size whatever the size of the export.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def query(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        defects: Optional[bool] = None,
+        defect_type: Optional[str] = None,
+    ) -> Select:
+        query = (
+            select(*EXPORT_COLUMNS)
+            .select_from(ProductInspection)
+            .join(MoldingMachineState, state_join(start_date, end_date), isouter=True)
+            .join(MachineRecipe, recipe_join(), isouter=True)
+            .join(ObjectDetection, detection_join(start_date, end_date), isouter=True)
+            .join(Defect, defect_join(start_date, end_date), isouter=True)
+            .join(PixelSeverity, severity_join(start_date, end_date), isouter=True)
+            .where(*time_range(ProductInspection.timestamp, start_date, end_date))
+        )
+        if machine_id:
+            query = query.where(ProductInspection.molding_machine_id == machine_id)
+        if defects is not None:
+            query = query.where(has_defects(defects))
+        if defect_type:
+            query = query.where(has_defect_type(defect_type))
+        return query
+
+    def batches(
+        self,
+        batch_size: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        defects: Optional[bool] = None,
+        defect_type: Optional[str] = None,
+    ) -> Iterator[Sequence[Row]]:
+        """Rows in batches of up to ``batch_size``, in no particular order.
+
+        Leaving the order open lets Postgres hash-join each month's partitions
+        and return rows as they are produced; sorting a full export would make
+        the first byte wait on the whole result.
+        """
+        query = self.query(start_date, end_date, machine_id, defects, defect_type)
+        result = self.db.execute(query.execution_options(yield_per=batch_size))
+        try:
+            yield from result.partitions()
+        finally:
+            result.close()
+
+    def export(
+        self,
+        fmt: ExportFormat,
+        batch_size: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        defects: Optional[bool] = None,
+        defect_type: Optional[str] = None,
+    ) -> Iterator[bytes]:
+        """The export encoded as ``fmt``, one chunk per batch."""
+        batches = self.batches(batch_size, start_date, end_date, machine_id, defects, defect_type)
+        try:
+            yield from encode(fmt, EXPORT_COLUMNS, batches)
+        finally:
+            # Close the server-side cursor now, not whenever the generator is
+            # collected, which may be after the session is gone.
+            batches.close()
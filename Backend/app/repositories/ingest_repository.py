@@ -0,0 +1,254 @@
+import csv
+import io
+import psycopg2
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError, IntegrityError
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, List, Sequence, Set, Tuple, TypeVar
+
+from app.core import live, partitions
+from app.core.defect_masks import mask_of
+from app.core.metrics import timed_repository
+from app.schemas.project_inspection import ProjectInspectionBase
+from app.schemas.object_detection import ObjectDetectionBase
+from app.models.product_inspection import ProductInspection, NO_SHOT_COUNT
+from app.models.molding_machine_state import MoldingMachineState
+from app.models.object_detection import ObjectDetection
+from app.models.defect import Defect
+from app.models.pixel_severity import PixelSeverity
+from app.repositories.recipe_repository import SETPOINTS, RecipeRepository
+from app.repositories.rollup_repository import RollupRepository
+
+DEFECT_FIELDS = [k for k in ObjectDetectionBase.model_fields if k.endswith("_defect")]
+
+NaturalKey = Tuple[str, datetime, int]
+
+# Errors caused by a record's own values (an integer out of range, a violated
+# constraint). Retrying the same records cannot succeed, but the rest of the
+# batch can. COPY raises the driver's errors unwrapped.
+BAD_RECORD_ERRORS = (DataError, IntegrityError, psycopg2.DataError, psycopg2.IntegrityError)
+
+T = TypeVar("T")
+
+# Months this process has already seen a partition for.
+_known_months: Set[date] = set()
+
+def _naive_utc(ts: datetime) -> datetime:
+    # The column is TIMESTAMP WITHOUT TIME ZONE; normalize client-side so the
+    # values we send compare equal to the ones RETURNING gives back.
+    if ts.tzinfo is not None:
+        return ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+def natural_key(record: ProjectInspectionBase) -> NaturalKey:
+    shot_count = record.molding_machine_state.ShotCount
+    return (
+        record.molding_machine_id,
+        _naive_utc(record.timestamp),
+        shot_count if shot_count is not None else NO_SHOT_COUNT,
+    )
+
+def defect_mask(record: ProjectInspectionBase) -> int:
+    """The record's defect types as a bitmask, as its defect rows will give."""
+    return mask_of(
+        defect_type
+        for od in record.object_detections.values()
+        for defect_type in DEFECT_FIELDS
+        if getattr(od, defect_type) is not None
+    )
+
+def write_isolating(
+    items: Sequence[T], write: Callable[[Sequence[T]], List[int]]
+) -> Tuple[List[int], List[Tuple[T, Exception]]]:
+    """Write ``items`` with ``write``, which commits them in one transaction
+    (rolling back if it raises) and returns the new inspection ids.
+
+    When the write fails with one of ``BAD_RECORD_ERRORS`` the items are
+    bisected and each half written on its own, so only the items that fail
+    alone are left out. Returns the new ids and the failed items with their
+    errors.
+    """
+    try:
+        return write(items), []
+    except BAD_RECORD_ERRORS as exc:
+        if len(items) == 1:
+            return [], [(items[0], exc)]
+    middle = len(items) // 2
+    ids, failed = write_isolating(items[:middle], write)
+    more_ids, more_failed = write_isolating(items[middle:], write)
+    return ids + more_ids, failed + more_failed
+
+@timed_repository
+class IngestRepository:
+    """Writes validated inspections in a fixed number of statements per chunk.
+
+    Keys are assigned by multi-row ``INSERT ... RETURNING`` (one statement per
+    table, batched by SQLAlchemy's insertmanyvalues) and returned in parameter
+    order, so children can be wired to their parents without a flush per row.
+
+    Inspections are upserted on their natural key (machine, timestamp, shot
+    count) with ``ON CONFLICT DO NOTHING``: records already in the database are
+    skipped and none of their child rows are written, so re-ingesting an
+    overlapping export only pays for the new records. Machine setpoints are
+    interned as recipes (``RecipeRepository``), so each state row only keeps
+    its measured values and a recipe id. The hourly rollups are updated from
+    the new inspections in the same transaction, and a summary of them is
+    sent to the live feed (app.core.live) on commit.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def ensure_partitions(self, timestamps: Sequence[datetime]) -> None:
+        """Create any missing monthly partitions for ``timestamps``.
+
+        Runs in its own short transaction: partition DDL locks the parent
+        table, which must not be held for the length of an ingest chunk.
+        """
+        months = {partitions.month_start(ts) for ts in timestamps} - _known_months
+        if not months:
+            return
+        with self.db.get_bind().begin() as conn:
+            partitions.ensure_months(conn, months)
+        _known_months.update(months)
+
+    def _copy(self, model, rows: List[dict]) -> None:
+        """Write ``rows`` with ``COPY ... FROM STDIN``. For wide rows that need
+        no ids back this is several times cheaper than a multi-row INSERT,
+        which Postgres has to parse as one bind parameter per value."""
+        if not rows:
+            return
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # NULL is an unquoted empty field in CSV COPY, so this is only for
+        # tables without text columns, whose empty strings would read as NULL.
+        writer.writerows([["" if row[c] is None else row[c] for c in columns] for row in rows])
+        buffer.seek(0)
+        quoted = ", ".join(f'"{c}"' for c in columns)
+        with self.db.connection().connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {model.__tablename__} ({quoted}) FROM STDIN (FORMAT csv)", buffer)
+
+    def _insert_returning_ids(self, model, rows: List[dict]) -> List[int]:
+        if not rows:
+            return []
+        stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+        return list(self.db.execute(stmt, rows).scalars().all())
+
+    def _insert_new_inspections(self, records: Sequence[ProjectInspectionBase]) -> Dict[NaturalKey, int]:
+        rows: Dict[NaturalKey, dict] = {}
+        for r in records:
+            key = natural_key(r)
+            rows.setdefault(key, {
+                "version": r.version,
+                "timestamp": key[1],
+                "molding_machine_id": key[0],
+                "shot_count": key[2],
+                "defect_mask": defect_mask(r),
+            })
+        if not rows:
+            return {}
+
+        stmt = (
+            pg_insert(ProductInspection)
+            .on_conflict_do_nothing(constraint="uq_product_inspections_natural_key")
+            .returning(
+                ProductInspection.id,
+                ProductInspection.molding_machine_id,
+                ProductInspection.timestamp,
+                ProductInspection.shot_count,
+            )
+        )
+        # Skipped rows return nothing, so match the returned rows back to their
+        # records by natural key rather than by position.
+        result = self.db.execute(stmt, list(rows.values())).all()
+        return {(row.molding_machine_id, row.timestamp, row.shot_count): row.id for row in result}
+
+    def bulk_insert(self, records: Sequence[ProjectInspectionBase]) -> List[int]:
+        """Insert the records not already present; returns the new inspection ids."""
+        self.ensure_partitions([natural_key(r)[1] for r in records])
+        inserted = self._insert_new_inspections(records)
+
+        new_records = []
+        inspection_ids = []
+        timestamps = []
+        for record in records:
+            key = natural_key(record)
+            inspection_id = inserted.pop(key, None)
+            if inspection_id is not None:
+                inspection_ids.append(inspection_id)
+                timestamps.append(key[1])
+                new_records.append(record)
+        records = new_records
+
+        # Every child row carries its inspection's timestamp, the partition key.
+        states = []
+        setpoints = []
+        detection_rows = []
+        detections = []
+        for inspection_id, ts, record in zip(inspection_ids, timestamps, records):
+            state = record.molding_machine_state.model_dump()
+            setpoints.append({key: state.pop(key) for key in SETPOINTS})
+            states.append({"inspection_id": inspection_id, "inspection_timestamp": ts, **state})
+            for od_name, od in record.object_detections.items():
+                detection_rows.append({"inspection_id": inspection_id, "inspection_timestamp": ts, "name": od_name, "reject": od.reject})
+                detections.append((ts, od))
+
+        for state, recipe_id in zip(states, RecipeRepository(self.db).intern(setpoints)):
+            state["recipe_id"] = recipe_id
+        self._copy(MoldingMachineState, states)
+
+        detection_ids = self._insert_returning_ids(ObjectDetection, detection_rows)
+
+        defect_rows = []
+        severities = []
+        for detection_id, (ts, od) in zip(detection_ids, detections):
+            for defect_type in DEFECT_FIELDS:
+                defect = getattr(od, defect_type)
+                if defect is None:
+                    continue
+                defect_rows.append({
+                    "object_detection_id": detection_id,
+                    "inspection_timestamp": ts,
+                    "defect_type": defect_type,
+                    "reject": defect.reject,
+                })
+                severities.append((ts, defect.pixel_severity))
+
+        defect_ids = self._insert_returning_ids(Defect, defect_rows)
+
+        if defect_ids:
+            self.db.execute(
+                insert(PixelSeverity),
+                [
+                    {
+                        "defect_id": defect_id,
+                        "inspection_timestamp": ts,
+                        "value": ps.value,
+                        "reject": ps.reject,
+                        "min_value": ps.min_value,
+                        "max_value": ps.max_value,
+                        "threshold": ps.threshold,
+                    } for defect_id, (ts, ps) in zip(defect_ids, severities)
+                ],
+            )
+
+        RollupRepository(self.db).apply(inspection_ids, timestamps)
+        self.notify(records, timestamps)
+        return inspection_ids
+
+    def notify(self, records: Sequence[ProjectInspectionBase], timestamps: Sequence[datetime]) -> None:
+        """Announce the new inspections to live subscribers. NOTIFY is
+        delivered on commit, so listeners never see rows that were rolled back."""
+        rows = [
+            (
+                record.molding_machine_id,
+                ts,
+                sum(getattr(od, f) is not None for od in record.object_detections.values() for f in DEFECT_FIELDS),
+            )
+            for record, ts in zip(records, timestamps)
+        ]
+        for payload in live.ingest_payloads(rows):
+            self.db.execute(select(func.pg_notify(live.CHANNEL, payload)))
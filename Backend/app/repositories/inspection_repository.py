@@ -0,0 +1,133 @@
+import base64
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select, func, tuple_
+from datetime import datetime
+from typing import Optional, Dict, Any, Tuple
+
+from app.core.metrics import timed_repository
+from app.models.product_inspection import ProductInspection
+from app.models.molding_machine_state import MoldingMachineState
+from app.models.object_detection import ObjectDetection
+from app.models.defect import Defect
+from app.models.machine_hourly_rollup import MachineHourlyRollup
+from app.repositories.analytics_repository import has_defects, has_defect_type
+from app.repositories.recipe_repository import MEASUREMENTS, SETPOINTS
+
+Cursor = Tuple[datetime, int]
+
+def encode_cursor(timestamp: datetime, inspection_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{inspection_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Raises ValueError for anything encode_cursor could not have produced."""
+    try:
+        timestamp, inspection_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(inspection_id)
+    except ValueError as exc:
+        raise ValueError(f"invalid cursor: {cursor!r}") from exc
+
+# The state, detections, defects and severities are each loaded with one
+# ``IN`` query per page, keyed on (id, inspection timestamp) so every query is
+# pruned to the page's partitions; the page's few distinct recipes with one more.
+DETAIL_OPTIONS = (
+    selectinload(ProductInspection.molding_machine_state).selectinload(MoldingMachineState.recipe),
+    selectinload(ProductInspection.object_detections)
+    .selectinload(ObjectDetection.defects)
+    .selectinload(Defect.pixel_severity),
+)
+
+# The machine state as ingested: measured values plus the recipe's setpoints.
+STATE_COLUMNS = MEASUREMENTS + SETPOINTS
+
+def _state(state: Optional[MoldingMachineState]) -> Optional[Dict[str, Any]]:
+    if not state:
+        return None
+    result = {key: getattr(state, key) for key in MEASUREMENTS}
+    result.update({key: getattr(state.recipe, key) if state.recipe else None for key in SETPOINTS})
+    return result
+
+def _detection(detection: ObjectDetection) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"reject": detection.reject}
+    for defect in detection.defects:
+        severity = defect.pixel_severity
+        result[defect.defect_type] = {
+            "reject": defect.reject,
+            "pixel_severity": {
+                "reject": severity.reject,
+                "value": severity.value,
+                "min_value": severity.min_value,
+                "max_value": severity.max_value,
+                "threshold": severity.threshold,
+            } if severity else None,
+        }
+    return result
+
+def _inspection(inspection: ProductInspection) -> Dict[str, Any]:
+    state = inspection.molding_machine_state
+    return {
+        "id": inspection.id,
+        "version": inspection.version,
+        "timestamp": inspection.timestamp,
+        "machine_id": inspection.molding_machine_id,
+        "shot_count": inspection.shot_count,
+        "reject": any(d.reject for d in inspection.object_detections),
+        "cycle_time": state.CycleTime if state else None,
+        "molding_machine_state": _state(state),
+        "object_detections": {d.name: _detection(d) for d in inspection.object_detections},
+    }
+
+@timed_repository
+class InspectionRepository:
+    """Individual inspections with their machine state and detections.
+
+    Lists are newest first and paged by keyset on (timestamp, id): a page is
+    an index range scan that starts right after the previous page's last row,
+    so page 50,000 costs the same as page 1.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def list_inspections(
+        self,
+        page_size: int,
+        cursor: Optional[Cursor] = None,
+        machine_id: Optional[str] = None,
+        defects: Optional[bool] = None,
+        defect_type: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        query = select(ProductInspection).options(*DETAIL_OPTIONS)
+        if cursor:
+            query = query.where(tuple_(ProductInspection.timestamp, ProductInspection.id) < cursor)
+        if machine_id:
+            query = query.where(ProductInspection.molding_machine_id == machine_id)
+        if defects is not None:
+            query = query.where(has_defects(defects))
+        if defect_type:
+            query = query.where(has_defect_type(defect_type))
+        # One extra row tells whether another page follows.
+        query = query.order_by(ProductInspection.timestamp.desc(), ProductInspection.id.desc()).limit(page_size + 1)
+
+        rows = self.db.execute(query).scalars().all()
+        page = rows[:page_size]
+        has_more = len(rows) > page_size
+        return {
+            "inspections": [_inspection(i) for i in page],
+            "page_size": page_size,
+            "has_more": has_more,
+            "next_cursor": encode_cursor(page[-1].timestamp, page[-1].id) if has_more else None,
+        }
+
+    def get_inspection(self, inspection_id: int) -> Optional[Dict[str, Any]]:
+        query = select(ProductInspection).options(*DETAIL_OPTIONS).where(ProductInspection.id == inspection_id)
+        inspection = self.db.execute(query).scalars().first()
+        return _inspection(inspection) if inspection else None
+
+    def count_for_machine(self, machine_id: str, use_rollups: bool = True) -> int:
+        if use_rollups:
+            query = select(func.coalesce(func.sum(MachineHourlyRollup.inspection_count), 0)).where(
+                MachineHourlyRollup.molding_machine_id == machine_id
+            )
+        else:
+            query = select(func.count(ProductInspection.id)).where(ProductInspection.molding_machine_id == machine_id)
+        return int(self.db.execute(query).scalar())
@@ -0,0 +1,63 @@
+import hashlib
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Any, Dict, List, Sequence
+
+import orjson
+
+from app.core.metrics import timed_repository
+from app.models.machine_recipe import MachineRecipe
+from app.models.molding_machine_state import MoldingMachineState
+
+SETPOINTS = [c.key for c in MachineRecipe.__table__.columns if c.key not in ("id", "digest")]
+
+# Measured values, stored on every machine state row.
+MEASUREMENTS = [
+    c.key for c in MoldingMachineState.__table__.columns
+    if c.key not in ("id", "inspection_id", "inspection_timestamp", "recipe_id")
+]
+
+# Recipes this process has interned, by digest. Recipes are never changed or
+# deleted, so an entry stays valid for the life of the process.
+_recipe_ids: Dict[str, int] = {}
+
+def recipe_digest(setpoints: Dict[str, Any]) -> str:
+    """Identifies a combination of setpoint values. Float setpoints are always
+    floats here (the schema coerces them), so equal recipes encode equally."""
+    return hashlib.sha1(orjson.dumps([setpoints.get(key) for key in SETPOINTS])).hexdigest()
+
+def state_column(key: str):
+    """The column holding machine state field ``key``, whether measured or a
+    setpoint; setpoints need the recipe joined (``recipe_join``)."""
+    return getattr(MachineRecipe if key in SETPOINTS else MoldingMachineState, key)
+
+def recipe_join():
+    return MachineRecipe.id == MoldingMachineState.recipe_id
+
+@timed_repository
+class RecipeRepository:
+    """Interns setpoint combinations into ``machine_recipes``."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def intern(self, setpoints: Sequence[Dict[str, Any]]) -> List[int]:
+        """Recipe ids for ``setpoints``, inserting the recipes not stored yet.
+
+        New recipes are committed in their own short transaction, like new
+        partitions: a recipe is harmless on its own, and an id cached from a
+        transaction that later rolled back would point at nothing. Concurrent
+        writers interning the same recipe meet on the unique digest.
+        """
+        digests = [recipe_digest(s) for s in setpoints]
+        missing = {d: s for d, s in zip(digests, setpoints) if d not in _recipe_ids}
+        if missing:
+            rows = [{"digest": d, **{key: s.get(key) for key in SETPOINTS}} for d, s in missing.items()]
+            with self.db.get_bind().begin() as conn:
+                conn.execute(pg_insert(MachineRecipe).on_conflict_do_nothing(index_elements=["digest"]), rows)
+                stored = conn.execute(
+                    select(MachineRecipe.digest, MachineRecipe.id).where(MachineRecipe.digest.in_(list(missing)))
+                ).all()
+            _recipe_ids.update({digest: recipe_id for digest, recipe_id in stored})
+        return [_recipe_ids[d] for d in digests]
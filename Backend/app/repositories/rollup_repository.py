@@ -0,0 +1,504 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, and_, or_, insert, delete, union_all, literal, BigInteger, Table, Column, String, DateTime, Float
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Callable, Sequence, Tuple
+
+from app.core.metrics import timed_repository
+from app.models.product_inspection import ProductInspection
+from app.models.molding_machine_state import MoldingMachineState
+from app.models.object_detection import ObjectDetection
+from app.models.defect import Defect
+from app.models.pixel_severity import PixelSeverity
+from app.models.machine_hourly_rollup import MachineHourlyRollup
+from app.models.defect_type_hourly_rollup import DefectTypeHourlyRollup
+from app.models.severity_hourly_sketch import SeverityHourlySketch
+from app.core.buckets import bucket, parse_grouping
+from app.core import sketches
+from app.repositories.analytics_repository import (
+    AnalyticsRepository, Records, SeverityBy, scratch_metadata, time_range, state_join, detection_join, defect_join,
+    severity_join,
+)
+
+HOUR = timedelta(hours=1)
+
+MACHINE_KEY = ["bucket", "molding_machine_id"]
+MACHINE_SUMS = [
+    "inspection_count", "defect_count",
+    "cycle_time_sum", "cycle_time_count",
+    "injection_pressure_sum", "injection_pressure_count",
+    "barrel_temp_sum", "barrel_temp_count",
+]
+MACHINE_COLUMNS = MACHINE_KEY + MACHINE_SUMS + ["first_timestamp", "last_timestamp"]
+
+DEFECT_TYPE_KEY = ["bucket", "molding_machine_id", "defect_type"]
+DEFECT_TYPE_COLUMNS = DEFECT_TYPE_KEY + ["defect_count"]
+
+SEVERITY_KEY = ["bucket", "molding_machine_id", "defect_type", "metric", "bin"]
+SEVERITY_COLUMNS = SEVERITY_KEY + ["sample_count"]
+
+BARREL_TEMP = (
+    MoldingMachineState.Barrel1 + MoldingMachineState.Barrel2 +
+    MoldingMachineState.Barrel3 + MoldingMachineState.Barrel4 +
+    MoldingMachineState.Barrel5 + MoldingMachineState.Barrel6
+) / 6.0
+
+DashboardBuckets = Table(
+    "dashboard_buckets",
+    scratch_metadata,
+    Column("bucket", DateTime),
+    Column("molding_machine_id", String),
+    *[Column(c, Float if c.endswith("_sum") else BigInteger) for c in MACHINE_SUMS],
+    Column("first_timestamp", DateTime),
+    Column("last_timestamp", DateTime),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+# Float sums are accumulated in a different order by the rollups than by a
+# fresh aggregation, so they are compared with a relative tolerance.
+SUM_TOLERANCE = 1e-6
+
+
+def machine_hourly_select(*conditions, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    """Aggregate raw inspections into rows shaped like ``machine_hourly_rollups``.
+
+    Defects are counted per inspection before the join so the machine-state
+    sums are not multiplied by the number of defects. ``start_date`` and
+    ``end_date`` bound the inspections matched by ``conditions``; they only
+    prune the child table partitions.
+    """
+    defects = (
+        select(ObjectDetection.inspection_id.label("inspection_id"), func.count(Defect.id).label("defect_count"))
+        .select_from(ProductInspection)
+        .join(ObjectDetection, detection_join(start_date, end_date))
+        .join(Defect, defect_join(start_date, end_date))
+        .where(*conditions)
+        .group_by(ObjectDetection.inspection_id)
+        .subquery()
+    )
+    return (
+        select(
+            func.date_trunc("hour", ProductInspection.timestamp).label("bucket"),
+            ProductInspection.molding_machine_id.label("molding_machine_id"),
+            func.count(ProductInspection.id).label("inspection_count"),
+            func.coalesce(func.sum(defects.c.defect_count), 0).label("defect_count"),
+            func.coalesce(func.sum(MoldingMachineState.CycleTime), 0.0).label("cycle_time_sum"),
+            func.count(MoldingMachineState.CycleTime).label("cycle_time_count"),
+            func.coalesce(func.sum(MoldingMachineState.InjPeakPressure), 0.0).label("injection_pressure_sum"),
+            func.count(MoldingMachineState.InjPeakPressure).label("injection_pressure_count"),
+            func.coalesce(func.sum(BARREL_TEMP), 0.0).label("barrel_temp_sum"),
+            func.count(BARREL_TEMP).label("barrel_temp_count"),
+            func.min(ProductInspection.timestamp).label("first_timestamp"),
+            func.max(ProductInspection.timestamp).label("last_timestamp"),
+        )
+        .select_from(ProductInspection)
+        .join(MoldingMachineState, state_join(start_date, end_date), isouter=True)
+        .join(defects, ProductInspection.id == defects.c.inspection_id, isouter=True)
+        .where(*conditions)
+        .group_by("bucket", ProductInspection.molding_machine_id)
+    )
+
+
+def defect_type_hourly_select(*conditions, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    """Aggregate raw defects into rows shaped like ``defect_type_hourly_rollups``."""
+    return (
+        select(
+            func.date_trunc("hour", ProductInspection.timestamp).label("bucket"),
+            ProductInspection.molding_machine_id.label("molding_machine_id"),
+            Defect.defect_type.label("defect_type"),
+            func.count(Defect.id).label("defect_count"),
+        )
+        .select_from(ProductInspection)
+        .join(ObjectDetection, detection_join(start_date, end_date))
+        .join(Defect, defect_join(start_date, end_date))
+        .where(*conditions)
+        .group_by("bucket", ProductInspection.molding_machine_id, Defect.defect_type)
+    )
+
+
+def severity_hourly_select(*conditions, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    """Aggregate raw pixel severities into rows shaped like
+    ``severity_hourly_sketches``: one count per sketch bin, for the severity
+    and for its ratio to the threshold (where there is one)."""
+    def sketch(metric: str, measure, *extra):
+        return (
+            select(
+                func.date_trunc("hour", ProductInspection.timestamp).label("bucket"),
+                ProductInspection.molding_machine_id.label("molding_machine_id"),
+                Defect.defect_type.label("defect_type"),
+                literal(metric).label("metric"),
+                sketches.bin_index(measure).label("bin"),
+                func.count().label("sample_count"),
+            )
+            .select_from(ProductInspection)
+            .join(ObjectDetection, detection_join(start_date, end_date))
+            .join(Defect, defect_join(start_date, end_date))
+            .join(PixelSeverity, severity_join(start_date, end_date))
+            .where(*conditions, *extra)
+            .group_by("bucket", ProductInspection.molding_machine_id, Defect.defect_type, "bin")
+        )
+
+    return union_all(
+        sketch(sketches.VALUE, PixelSeverity.value),
+        sketch(sketches.THRESHOLD_RATIO, PixelSeverity.value / PixelSeverity.threshold, PixelSeverity.threshold > 0),
+    )
+
+
+@timed_repository
+class RollupRepository:
+    """Maintains the hourly rollup tables.
+
+    ``apply`` is called by the ingest path inside the ingest transaction with
+    the ids of the inspections it just inserted, so the rollups commit or roll
+    back together with the raw rows.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _upsert(self, model, source, key: List[str], sums: List[str], extra_set: Optional[Callable[[Any], Dict[str, Any]]] = None) -> None:
+        columns = [c.name for c in source.selected_columns]
+        # Touch rollup rows in key order so concurrent ingest workers lock them
+        # in the same order and cannot deadlock.
+        stmt = pg_insert(model).from_select(columns, source.order_by(*key))
+        set_ = {c: getattr(model, c) + getattr(stmt.excluded, c) for c in sums}
+        set_.update(extra_set(stmt.excluded) if extra_set else {})
+        self.db.execute(stmt.on_conflict_do_update(index_elements=key, set_=set_))
+
+    def apply(self, inspection_ids: Sequence[int], timestamps: Sequence[datetime] = ()) -> None:
+        """``timestamps`` (of the same inspections), when given, confine the
+        lookups to the partitions holding them."""
+        if not inspection_ids:
+            return
+        start_date, end_date = (min(timestamps), max(timestamps)) if timestamps else (None, None)
+        conditions = [ProductInspection.id.in_(list(inspection_ids)), *time_range(ProductInspection.timestamp, start_date, end_date)]
+        bounds = {"start_date": start_date, "end_date": end_date}
+
+        self._upsert(
+            MachineHourlyRollup,
+            machine_hourly_select(*conditions, **bounds),
+            MACHINE_KEY,
+            MACHINE_SUMS,
+            lambda excluded: {
+                "first_timestamp": func.least(MachineHourlyRollup.first_timestamp, excluded.first_timestamp),
+                "last_timestamp": func.greatest(MachineHourlyRollup.last_timestamp, excluded.last_timestamp),
+            },
+        )
+        self._upsert(DefectTypeHourlyRollup, defect_type_hourly_select(*conditions, **bounds), DEFECT_TYPE_KEY, ["defect_count"])
+        self._upsert(SeverityHourlySketch, severity_hourly_select(*conditions, **bounds), SEVERITY_KEY, ["sample_count"])
+
+    def is_empty(self) -> bool:
+        return self.db.execute(select(MachineHourlyRollup.bucket).limit(1)).first() is None
+
+    def rebuild(self) -> None:
+        self.db.execute(delete(MachineHourlyRollup))
+        self.db.execute(delete(DefectTypeHourlyRollup))
+        self.db.execute(delete(SeverityHourlySketch))
+        self.db.execute(insert(MachineHourlyRollup).from_select(MACHINE_COLUMNS, machine_hourly_select()))
+        self.db.execute(insert(DefectTypeHourlyRollup).from_select(DEFECT_TYPE_COLUMNS, defect_type_hourly_select()))
+        self.db.execute(insert(SeverityHourlySketch).from_select(SEVERITY_COLUMNS, severity_hourly_select()))
+
+    def _mismatches(self, model, raw_select, key: List[str], exact: List[str], approx: List[str], limit: int) -> List[Dict[str, Any]]:
+        raw = raw_select.subquery()
+        on = and_(*[getattr(model, k) == raw.c[k] for k in key])
+        differs = [getattr(model, key[0]).is_(None), raw.c[key[0]].is_(None)]
+        differs += [getattr(model, c) != raw.c[c] for c in exact]
+        differs += [
+            func.abs(getattr(model, c) - raw.c[c]) > SUM_TOLERANCE * func.greatest(1.0, func.abs(raw.c[c]))
+            for c in approx
+        ]
+        query = (
+            select(
+                *[func.coalesce(getattr(model, k), raw.c[k]).label(k) for k in key],
+                *[getattr(model, c).label(f"rollup_{c}") for c in exact + approx],
+                *[raw.c[c].label(f"raw_{c}") for c in exact + approx],
+            )
+            .select_from(raw.join(model, on, full=True))
+            .where(or_(*differs))
+            .limit(limit)
+        )
+        return [dict(row._mapping) for row in self.db.execute(query).all()]
+
+    def check(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Compare the rollups with a fresh aggregation of the raw tables; returns mismatching buckets."""
+        approx = [c for c in MACHINE_SUMS if c.endswith("_sum")]
+        exact = [c for c in MACHINE_SUMS if c not in approx] + ["first_timestamp", "last_timestamp"]
+        mismatches = self._mismatches(MachineHourlyRollup, machine_hourly_select(), MACHINE_KEY, exact, approx, limit)
+        mismatches += self._mismatches(DefectTypeHourlyRollup, defect_type_hourly_select(), DEFECT_TYPE_KEY, ["defect_count"], [], limit)
+        mismatches += self._mismatches(SeverityHourlySketch, severity_hourly_select(), SEVERITY_KEY, ["sample_count"], [], limit)
+        return mismatches
+
+
+def _floor_hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+@timed_repository
+class RollupAnalyticsRepository(AnalyticsRepository):
+    """Answers the dashboard queries from the hourly rollups.
+
+    Whole hours inside the requested range are read from the rollup tables;
+    only the partial hours at the edges of the range are aggregated from the
+    raw tables, with the same expressions the rollups are built from.
+    """
+
+    def _split_range(self, start_date: Optional[datetime], end_date: Optional[datetime]) -> Tuple[Optional[Tuple], List[Tuple[Any, datetime, datetime]]]:
+        """Return ``((first_bucket, end_bucket), raw_edges)`` for a range.
+
+        Buckets in ``[first_bucket, end_bucket)`` (either bound may be open) lie
+        wholly inside the range; each raw edge is a ``(condition, start, end)``
+        selecting remaining rows within one partial hour. The bucket bounds are
+        ``None`` when no whole hour is covered.
+        """
+        full_lo = None
+        if start_date is not None:
+            full_lo = _floor_hour(start_date)
+            if full_lo < start_date:
+                full_lo += HOUR
+        # end_date is inclusive, so the bucket starting at floor(end_date) is
+        # always partial and comes from the raw rows.
+        full_hi = _floor_hour(end_date) if end_date is not None else None
+
+        if full_lo is not None and full_hi is not None and full_lo >= full_hi:
+            return None, [(and_(ProductInspection.timestamp >= start_date, ProductInspection.timestamp <= end_date), start_date, end_date)]
+
+        edges = []
+        if full_lo is not None and start_date < full_lo:
+            edges.append((and_(ProductInspection.timestamp >= start_date, ProductInspection.timestamp < full_lo), start_date, full_lo))
+        if full_hi is not None:
+            edges.append((and_(ProductInspection.timestamp >= full_hi, ProductInspection.timestamp <= end_date), full_hi, end_date))
+
+        return (full_lo, full_hi), edges
+
+    def _buckets(self, model, columns: List[str], raw_select, start_date, end_date, machine_id):
+        bucket_range, raw_edges = self._split_range(start_date, end_date)
+        parts = []
+
+        if bucket_range is not None:
+            full_lo, full_hi = bucket_range
+            conditions = []
+            if full_lo is not None: conditions.append(model.bucket >= full_lo)
+            if full_hi is not None: conditions.append(model.bucket < full_hi)
+            if machine_id: conditions.append(model.molding_machine_id == machine_id)
+            parts.append(select(*[getattr(model, c) for c in columns]).where(*conditions))
+
+        # One part per edge, each confined to its own hour's partitions.
+        for raw_condition, edge_start, edge_end in raw_edges:
+            conditions = [raw_condition]
+            if machine_id: conditions.append(ProductInspection.molding_machine_id == machine_id)
+            parts.append(raw_select(*conditions, start_date=edge_start, end_date=edge_end))
+
+        return (union_all(*parts) if len(parts) > 1 else parts[0]).subquery()
+
+    def _machine_buckets(self, start_date, end_date, machine_id=None):
+        return self._buckets(MachineHourlyRollup, MACHINE_COLUMNS, machine_hourly_select, start_date, end_date, machine_id)
+
+    def _defect_type_buckets(self, start_date, end_date, machine_id=None):
+        return self._buckets(DefectTypeHourlyRollup, DEFECT_TYPE_COLUMNS, defect_type_hourly_select, start_date, end_date, machine_id)
+
+    def get_defect_trends(
+        self,
+        grouping: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        max_points: Optional[int] = None
+    ) -> Records:
+        if parse_grouping(grouping) % HOUR:
+            # Sub-hour buckets cannot be built from hourly rollups.
+            return super().get_defect_trends(grouping, start_date, end_date, machine_id, max_points)
+        b = self._machine_buckets(start_date, end_date, machine_id)
+        query = (
+            select(
+                bucket(b.c.bucket, grouping).label("period"),
+                func.sum(b.c.inspection_count).cast(BigInteger).label("total_count"),
+                func.sum(b.c.defect_count).cast(BigInteger).label("defect_count"),
+            )
+            .group_by("period")
+            .order_by("period")
+        )
+        return self._format_trends(self._downsample(self.db.execute(query).all(), max_points))
+
+    def get_machine_performance(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        include_percentiles: bool = False,
+    ) -> Records:
+        b = self._machine_buckets(start_date, end_date)
+        query = (
+            select(
+                b.c.molding_machine_id,
+                (func.sum(b.c.cycle_time_sum) / func.nullif(func.sum(b.c.cycle_time_count), 0)).label("avg_cycle"),
+                (func.sum(b.c.injection_pressure_sum) / func.nullif(func.sum(b.c.injection_pressure_count), 0)).label("avg_pressure"),
+                (func.sum(b.c.barrel_temp_sum) / func.nullif(func.sum(b.c.barrel_temp_count), 0)).label("avg_temp"),
+                func.sum(b.c.inspection_count).cast(BigInteger).label("total"),
+                func.sum(b.c.defect_count).cast(BigInteger).label("defects"),
+            )
+            .group_by(b.c.molding_machine_id)
+            .order_by(b.c.molding_machine_id)
+        )
+        # Percentiles are not decomposable into hourly sums, so they always come
+        # from the raw rows.
+        percentiles = self._cycle_time_percentiles(start_date, end_date) if include_percentiles else None
+        return self._format_machine_performance(self.db.execute(query).all(), percentiles)
+
+    def get_defect_distribution(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        b = self._defect_type_buckets(start_date, end_date, machine_id)
+        count = func.sum(b.c.defect_count).cast(BigInteger)
+        query = (
+            select(b.c.defect_type, count.label("count"))
+            .group_by(b.c.defect_type)
+            .order_by(count.desc(), b.c.defect_type)
+        )
+        return self._format_distribution(self.db.execute(query).all())
+
+    def get_severity_percentiles(
+        self,
+        by: SeverityBy,
+        grouping: str,
+        quantiles: Sequence[float],
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        defect_type: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Merges the hourly severity sketches of each group (summing their bin
+        counts) and reads the quantiles off the merged sketch, so the cost
+        depends on the number of hours and bins, not on the number of defects.
+        Every quantile is within ``sketches.RELATIVE_ACCURACY`` of the exact one."""
+        if by == "time" and parse_grouping(grouping) % HOUR:
+            return super().get_severity_percentiles(by, grouping, quantiles, start_date, end_date, machine_id, defect_type)
+        b = self._buckets(SeverityHourlySketch, SEVERITY_COLUMNS, severity_hourly_select, start_date, end_date, machine_id)
+        key = self._severity_key(by, grouping, b.c.bucket, b.c.molding_machine_id, b.c.defect_type)
+        merged = (
+            select(key.label("key"), b.c.metric, b.c.bin, func.sum(b.c.sample_count).label("count"))
+            .where(*([b.c.defect_type == defect_type] if defect_type else []))
+            .group_by("key", b.c.metric, b.c.bin)
+            .subquery()
+        )
+        sketch = [merged.c.key, merged.c.metric]
+        cumulative = select(
+            merged,
+            func.sum(merged.c.count).over(partition_by=sketch, order_by=merged.c.bin).label("running"),
+            func.sum(merged.c.count).over(partition_by=sketch).label("total"),
+        ).subquery()
+        c = cumulative.c
+        # The quantile ranks are found in SQL, so one row per merged sketch
+        # comes back rather than all of its bins. Ratios above 1.0 (bin 0's
+        # upper bound) are counted exactly.
+        query = (
+            select(
+                c.key,
+                c.metric,
+                c.total.cast(BigInteger).label("total"),
+                func.coalesce(func.sum(c.count).filter(c.bin > 0), 0).cast(BigInteger).label("above"),
+                *[sketches.quantile_bin(c.bin, c.running, c.total, q) for q in quantiles],
+            )
+            .group_by(c.key, c.metric, c.total)
+            .order_by(c.key, c.metric)
+        )
+        merged_sketches: Dict[Any, Dict[str, Any]] = {}
+        for key_value, metric, total, above, *bins in self.db.execute(query).all():
+            merged_sketches.setdefault(key_value, {})[metric] = (total, above, [sketches.bin_value(i) for i in bins])
+
+        none = (0, 0, [None] * len(quantiles))
+        summaries = []
+        for key_value, metrics in merged_sketches.items():
+            count, _, values = metrics.get(sketches.VALUE, none)
+            with_threshold, above, ratios = metrics.get(sketches.THRESHOLD_RATIO, none)
+            summaries.append((key_value, count, values, ratios, above, with_threshold))
+        return self._format_severity_percentiles(by, quantiles, summaries, sketches.RELATIVE_ACCURACY)
+
+    def get_summary_metrics(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        b = self._machine_buckets(start_date, end_date)
+        query = select(
+            func.sum(b.c.inspection_count).cast(BigInteger).label("total_inspections"),
+            func.sum(b.c.defect_count).cast(BigInteger).label("total_defects"),
+            func.count(func.distinct(b.c.molding_machine_id)).label("total_machines"),
+            func.min(b.c.first_timestamp).label("date_start"),
+            func.max(b.c.last_timestamp).label("date_end"),
+        )
+        return self._format_summary(self.db.execute(query).one())
+
+    def get_dashboard(
+        self,
+        grouping: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+        max_points: Optional[int] = None
+    ) -> Dict[str, Any]:
+        if parse_grouping(grouping) % HOUR:
+            return super().get_dashboard(grouping, start_date, end_date, machine_id, max_points)
+        # Trends, machine performance and summary are all re-aggregations of
+        # the hour x machine buckets for the range. When the range has partial
+        # hours, the buckets (rollups plus raw edges) are materialized once so
+        # the edges are aggregated from the raw tables only once; otherwise the
+        # rollup table already is that set and copying it would only cost time.
+        _, raw_edges = self._split_range(start_date, end_date)
+        materialized = bool(raw_edges)
+        if materialized:
+            t = DashboardBuckets
+            # Single-table aggregates only, so no statistics are needed.
+            self._materialize(t, select(self._machine_buckets(start_date, end_date)), analyze=False)
+        else:
+            t = self._machine_buckets(start_date, end_date)
+
+        machine_filter = [t.c.molding_machine_id == machine_id] if machine_id else []
+
+        trends = self.db.execute(
+            select(
+                bucket(t.c.bucket, grouping).label("period"),
+                func.sum(t.c.inspection_count).cast(BigInteger).label("total_count"),
+                func.sum(t.c.defect_count).cast(BigInteger).label("defect_count"),
+            )
+            .where(*machine_filter)
+            .group_by("period")
+            .order_by("period")
+        ).all()
+
+        machines = self.db.execute(
+            select(
+                t.c.molding_machine_id,
+                (func.sum(t.c.cycle_time_sum) / func.nullif(func.sum(t.c.cycle_time_count), 0)).label("avg_cycle"),
+                (func.sum(t.c.injection_pressure_sum) / func.nullif(func.sum(t.c.injection_pressure_count), 0)).label("avg_pressure"),
+                (func.sum(t.c.barrel_temp_sum) / func.nullif(func.sum(t.c.barrel_temp_count), 0)).label("avg_temp"),
+                func.sum(t.c.inspection_count).cast(BigInteger).label("total"),
+                func.sum(t.c.defect_count).cast(BigInteger).label("defects"),
+            )
+            .group_by(t.c.molding_machine_id)
+            .order_by(t.c.molding_machine_id)
+        ).all()
+
+        summary = self.db.execute(
+            select(
+                func.sum(t.c.inspection_count).cast(BigInteger).label("total_inspections"),
+                func.sum(t.c.defect_count).cast(BigInteger).label("total_defects"),
+                func.count(func.distinct(t.c.molding_machine_id)).label("total_machines"),
+                func.min(t.c.first_timestamp).label("date_start"),
+                func.max(t.c.last_timestamp).label("date_end"),
+            )
+        ).one()
+
+        b = self._defect_type_buckets(start_date, end_date, machine_id)
+        count = func.sum(b.c.defect_count).cast(BigInteger)
+        distribution = self.db.execute(
+            select(b.c.defect_type, count.label("count"))
+            .group_by(b.c.defect_type)
+            .order_by(count.desc(), b.c.defect_type)
+        ).all()
+
+        if materialized:
+            t.drop(self.db.connection())
+        return self._format_dashboard(grouping, self._downsample(trends, max_points), machines, distribution, summary)
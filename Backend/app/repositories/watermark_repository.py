@@ -0,0 +1,31 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, text
+from typing import Tuple
+
+from app.core.metrics import timed_repository
+from app.models.product_inspection import ProductInspection
+from app.models.ingest_generation import IngestGeneration
+
+Watermark = Tuple[int, int]
+
+@timed_repository
+class WatermarkRepository:
+    """Reads and advances the data watermark: (max inspection id, ingest generation)."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def current(self) -> Watermark:
+        row = self.db.execute(
+            select(
+                func.coalesce(func.max(ProductInspection.id), 0),
+                text("(SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM ingest_generation_seq)"),
+            )
+        ).one()
+        return int(row[0]), int(row[1])
+
+    def bump(self) -> int:
+        """Advance the generation. Call after the ingest transaction has committed:
+        sequences are not transactional, so bumping earlier would let readers
+        see the new watermark before the data it stands for."""
+        return self.db.execute(IngestGeneration.next_value()).scalar()
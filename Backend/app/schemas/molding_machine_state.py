@@ -1,5 +1,8 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, Optional
+
+# The INTEGER columns these are stored in: larger values would fail the insert.
+Int32 = Annotated[int, Field(ge=-2**31, le=2**31 - 1)]
 
 class MoldingMachineStateBase(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -29,7 +32,7 @@ class MoldingMachineStateBase(BaseModel):
     HoldSegment1PressureSP: Optional[float] = None
     FillSegment2pressureSP: Optional[float] = None
     AlarmLED: Optional[bool] = None
-    ShotCount: Optional[int] = None
+    ShotCount: Optional[Int32] = None
     FillSegment1SP: Optional[float] = None
     CushionMin: Optional[float] = None
     ClampOpenTimeCV: Optional[float] = None
@@ -40,7 +43,7 @@ class MoldingMachineStateBase(BaseModel):
     CycleTime: Optional[float] = None
     N1TempSP: Optional[float] = None
     HoldSegment4PressureSP: Optional[float] = None
-    ClampForceSP: Optional[int] = None
+    ClampForceSP: Optional[Int32] = None
     Barrel4: Optional[float] = None
     FillSegment5pressureSP: Optional[float] = None
     N2TempSP: Optional[float] = None
@@ -56,7 +59,7 @@ class MoldingMachineStateBase(BaseModel):
     ChargeTime: Optional[float] = None
     FillSegmentXfer2to3SP: Optional[float] = None
     BarrelN2: Optional[float] = None
-    TonnageForceCV: Optional[int] = None
+    TonnageForceCV: Optional[Int32] = None
     CoolTimeSP: Optional[float] = None
     FillSegment1pressureSP: Optional[float] = None
     H5TempSP: Optional[float] = None
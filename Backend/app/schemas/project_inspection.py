@@ -1,13 +1,95 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Dict
+from pydantic import AfterValidator, BaseModel, ConfigDict
+from typing import Annotated, Any, Dict
 from .object_detection import ObjectDetectionBase
 from .molding_machine_state import MoldingMachineStateBase
 from datetime import datetime
 
+
+def _storable(value: str) -> str:
+    # Postgres text cannot hold NUL, and the driver rejects it only at insert.
+    if "\x00" in value:
+        raise ValueError("must not contain NUL characters")
+    return value
+
+
+Text = Annotated[str, AfterValidator(_storable)]
+
 class ProjectInspectionBase(BaseModel):
     model_config = ConfigDict(from_attributes=True)
-    version: str
+    version: Text
     timestamp: datetime
-    molding_machine_id: str
+    molding_machine_id: Text
     molding_machine_state: MoldingMachineStateBase
-    object_detections: Dict[str, ObjectDetectionBase]
\ No newline at end of file
+    object_detections: Dict[Text, ObjectDetectionBase]
+
+
+def _parse_timestamp(ts: Any) -> datetime:
+    if isinstance(ts, (int, float)):
+        return datetime.fromtimestamp(ts)
+    if isinstance(ts, str):
+        if ts.endswith(("Z", "z")):
+            # datetime.fromisoformat only accepts the "Z" suffix from Python 3.11.
+            ts = ts[:-1] + "+00:00"
+        try:
+            return datetime.fromisoformat(ts)
+        except ValueError:
+            try:
+                return datetime.fromtimestamp(float(ts))
+            except Exception as exc:
+                raise ValueError(f"Unrecognized timestamp format: {ts}") from exc
+    raise ValueError(f"Unrecognized timestamp type: {type(ts)}")
+
+
+def _normalize_object_detections(raw: dict) -> dict:
+    if "object_detections" in raw:
+        detections = raw["object_detections"]
+    elif "object_detection" in raw:
+        od = raw["object_detection"]
+        if isinstance(od, dict):
+            detections = {"default": od}
+        else:
+            detections = {"default": od}
+    else:
+        return {}
+
+    normalized = {}
+    for name, od in detections.items():
+        if not isinstance(od, dict):
+            continue
+        
+        item = {
+            "reject": od.get("reject", False),
+            "label_detection": od.get("label_detection") or {},
+        }
+        
+        for key, value in od.items():
+            if key not in ("reject", "label_detection"):
+                item[key] = value
+        
+        normalized[name] = item
+    
+    return normalized
+
+
+def prepare_record(raw: dict) -> dict:
+    """Normalize a record in the dataset's shape (dashed keys, epoch or ISO
+    timestamps, a single ``object_detection``) for validation."""
+    data = raw.copy()
+
+    for key in list(data.keys()):
+        if "-" in key:
+            data[key.replace("-", "_")] = data.pop(key)
+
+    if "timestamp" in data:
+        data["timestamp"] = _parse_timestamp(data["timestamp"])
+
+    if "molding_machine_state" not in data:
+        data["molding_machine_state"] = {}
+
+    data["object_detections"] = _normalize_object_detections(data)
+
+    return data
+
+
+def validate_record(raw: dict) -> ProjectInspectionBase:
+    return ProjectInspectionBase.model_validate(prepare_record(raw))
@@ -0,0 +1,138 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import os
+import time
+import socket
+import argparse
+import requests
+import subprocess
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# What the dashboard fetches on every filter change.
+DASHBOARD_PATHS = [
+    "/api/analytics/dashboard?grouping=day",
+]
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def serve(workers: int, env: Optional[Dict[str, str]] = None) -> Iterator[Tuple[str, subprocess.Popen]]:
+    """Start uvicorn on a free port for the duration of the benchmark.
+
+    ``env`` overrides settings for the server only (e.g. to disable the cache).
+    """
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT,
+        env={**os.environ, **(env or {})},
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                requests.get(url + "/health", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        else:
+            raise RuntimeError("uvicorn did not come up")
+        yield url, proc
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def run(url: str, clients: int, duration: float) -> Dict[str, Dict[str, float]]:
+    """Each client reloads the dashboard in a loop; one extra client polls /health
+    to show how long cheap requests wait behind the analytics queries."""
+    latencies: Dict[str, List[float]] = {"dashboard request": [], "health": []}
+    errors = 0
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(clients + 2)
+    deadline = 0.0
+
+    def client(paths: List[str], bucket: str) -> None:
+        nonlocal errors
+        session = requests.Session()
+        local: List[float] = []
+        failed = 0
+        start_barrier.wait()
+        while time.perf_counter() < deadline:
+            for path in paths:
+                started = time.perf_counter()
+                try:
+                    session.get(url + path, timeout=120).raise_for_status()
+                except requests.RequestException:
+                    failed += 1
+                local.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies[bucket].extend(local)
+            errors += failed
+
+    threads = [threading.Thread(target=client, args=(DASHBOARD_PATHS, "dashboard request")) for _ in range(clients)]
+    threads.append(threading.Thread(target=client, args=(["/health"], "health")))
+    for thread in threads:
+        thread.start()
+    deadline = time.perf_counter() + duration
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report: Dict[str, Dict[str, float]] = {}
+    for name, values in latencies.items():
+        values.sort()
+        report[name] = {
+            "requests": len(values),
+            "throughput_rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 0.50),
+            "p99_ms": percentile(values, 0.99),
+        }
+    report["errors"] = {"count": errors}
+    return report
+
+def main(url: Optional[str], clients: int, duration: float, workers: int) -> None:
+    if url is None:
+        with serve(workers) as (served, _):
+            report = run(served, clients, duration)
+    else:
+        report = run(url, clients, duration)
+
+    print(f"{clients} dashboard clients for {duration:.0f}s")
+    for name, stats in report.items():
+        if name == "errors":
+            print(f"  errors: {stats['count']}")
+            continue
+        print(
+            f"  {name:18} {stats['requests']:7d} req  {stats['throughput_rps']:8.1f} req/s"
+            f"  p50 {stats['p50_ms']:8.1f} ms  p99 {stats['p99_ms']:8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Concurrent dashboard load against the analytics API")
+    parser.add_argument("--url", help="Base URL of a running API; omitted, a local uvicorn is started")
+    parser.add_argument("--clients", type=int, default=200, help="Concurrent dashboard clients")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when starting a local server")
+    args = parser.parse_args()
+
+    main(args.url, args.clients, args.duration, args.workers)
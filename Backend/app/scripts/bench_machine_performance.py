@@ -0,0 +1,107 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import time
+import argparse
+import statistics
+from datetime import timedelta
+from sqlalchemy import select, func, and_
+from app.core.database import SessionLocal
+from app.models.product_inspection import ProductInspection
+from app.models.molding_machine_state import MoldingMachineState
+from app.models.object_detection import ObjectDetection
+from app.models.defect import Defect
+from app.repositories.analytics_repository import AnalyticsRepository, state_join, detection_join, defect_join
+from app.repositories.rollup_repository import RollupAnalyticsRepository
+from app.scripts.check_query_plans import seed
+
+
+def legacy_machine_performance(db, start_date=None, end_date=None):
+    """The original single-pass query: every state row is repeated once per defect."""
+    query = (
+        select(
+            ProductInspection.molding_machine_id,
+            func.avg(MoldingMachineState.CycleTime).label("avg_cycle"),
+            func.avg(MoldingMachineState.InjPeakPressure).label("avg_pressure"),
+            func.avg((
+                MoldingMachineState.Barrel1 + MoldingMachineState.Barrel2 +
+                MoldingMachineState.Barrel3 + MoldingMachineState.Barrel4 +
+                MoldingMachineState.Barrel5 + MoldingMachineState.Barrel6
+            ) / 6.0).label("avg_temp"),
+            func.count(func.distinct(ProductInspection.id)).label("total"),
+            func.count(func.distinct(Defect.id)).label("defects"),
+        )
+        .select_from(ProductInspection)
+        .join(MoldingMachineState, state_join(), isouter=True)
+        .join(ObjectDetection, detection_join(), isouter=True)
+        .join(Defect, defect_join(), isouter=True)
+    )
+    conditions = []
+    if start_date: conditions.append(ProductInspection.timestamp >= start_date)
+    if end_date: conditions.append(ProductInspection.timestamp <= end_date)
+    if conditions:
+        query = query.where(and_(*conditions))
+    query = query.group_by(ProductInspection.molding_machine_id).order_by(ProductInspection.molding_machine_id)
+    return AnalyticsRepository(db)._format_machine_performance(db.execute(query).all())
+
+
+def measure(call, runs: int):
+    call()  # warm the cache so every variant is measured hot
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = call()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return statistics.median(timings), p95, result
+
+
+def main(runs: int, days: int) -> None:
+    db = SessionLocal()
+    try:
+        total, end = db.execute(select(func.count(ProductInspection.id), func.max(ProductInspection.timestamp))).one()
+        print(f"{total} inspections")
+        windows = {"full range": (None, None), f"last {days} days": (end - timedelta(days=days), end)}
+
+        for label, (start_date, end_date) in windows.items():
+            variants = {
+                "legacy join fan-out": lambda: legacy_machine_performance(db, start_date, end_date),
+                "pre-aggregated passes": lambda: AnalyticsRepository(db).get_machine_performance(start_date, end_date),
+                "pre-aggregated + p50/p95": lambda: AnalyticsRepository(db).get_machine_performance(start_date, end_date, True),
+                "hourly rollups": lambda: RollupAnalyticsRepository(db).get_machine_performance(start_date, end_date),
+            }
+            print(f"\n{label}")
+            results = {}
+            for name, call in variants.items():
+                median, p95, results[name] = measure(call, runs)
+                print(f"  {name:28} median {median:9.1f} ms   p95 {p95:9.1f} ms")
+
+            # The legacy averages are weighted by defect count; show how far off they were.
+            drift = max(
+                (abs((old["avg_cycle_time"] or 0) - (new["avg_cycle_time"] or 0))
+                 for old, new in zip(results["legacy join fan-out"], results["pre-aggregated passes"])),
+                default=0.0,
+            )
+            print(f"  max avg_cycle_time difference, legacy vs unweighted: {drift:.2f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark machine-performance aggregation")
+    parser.add_argument("--seed", type=int, default=0, help="Insert this many synthetic inspections first")
+    parser.add_argument("--machines", type=int, default=10, help="Machines to spread seeded inspections over")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per variant")
+    parser.add_argument("--days", type=int, default=30, help="Width of the narrower date window")
+    args = parser.parse_args()
+
+    if args.seed:
+        print(f"Seeding {args.seed} inspections...")
+        seed(args.seed, args.machines)
+
+    main(args.runs, args.days)
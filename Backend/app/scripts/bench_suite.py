@@ -0,0 +1,271 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import os
+import json
+import time
+import platform
+import argparse
+import requests
+import resource
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from app.core.config import settings
+from app.core.database import SessionLocal, get_engine
+from app.models.product_inspection import ProductInspection
+from app.scripts.bench_concurrency import percentile, serve
+from app.scripts.generate_dataset import generate_records, write_records
+from app.scripts.ingest_data import bulk_ingest_from_url
+from app.scripts import ingest_parallel
+
+RESULTS_VERSION = 1
+GROUPINGS = ["hour", "day", "week"]
+
+
+def _rss_mb(kilobytes: int) -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return kilobytes / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def process_peak_rss_mb(pid: int) -> Optional[float]:
+    """Peak RSS of ``pid`` and its direct children (uvicorn workers), from /proc."""
+    def hwm(p: int) -> Optional[int]:
+        try:
+            with open(f"/proc/{p}/status") as fh:
+                for line in fh:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+        return None
+
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as fh:
+            pids += [int(p) for p in fh.read().split()]
+    except OSError:
+        pass
+    peaks = [peak for peak in map(hwm, pids) if peak is not None]
+    return _rss_mb(max(peaks)) if peaks else None
+
+
+def generate(path: str, args) -> Dict[str, float]:
+    started = time.perf_counter()
+    records = generate_records(
+        args.inspections, args.machines, args.days, args.start,
+        args.defect_rate, machine_prefix=args.machine_prefix, seed=args.seed,
+    )
+    with open(path, "wb") as fh:
+        count = write_records(records, fh)
+    elapsed = time.perf_counter() - started
+    return {"records": count, "seconds": elapsed, "records_per_sec": count / elapsed if elapsed > 0 else 0.0}
+
+
+def ingest(path: str, workers: int, chunk_size: int) -> Dict[str, float]:
+    started = time.perf_counter()
+    if workers > 1:
+        stats = ingest_parallel.run(path, workers, chunk_size)
+        inserted = stats["inserted"]
+    else:
+        inserted = bulk_ingest_from_url(path, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - started
+    return {
+        "inserted": inserted,
+        "seconds": elapsed,
+        "records_per_sec": inserted / elapsed if elapsed > 0 else 0.0,
+        "workers": workers,
+        "chunk_size": chunk_size,
+    }
+
+
+def cases(machine_id: str, end: datetime) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """Every endpoint for each grouping, machine filter and date range: ``(key, path, params)``."""
+    ranges = {
+        "all": {},
+        "7d": {"start_date": (end - timedelta(days=7)).isoformat(), "end_date": end.isoformat()},
+        "24h": {"start_date": (end - timedelta(hours=24)).isoformat(), "end_date": end.isoformat()},
+    }
+    machines = {"all machines": {}, "one machine": {"machine_id": machine_id}}
+    result = []
+    for range_name, dates in ranges.items():
+        for endpoint in ("defect-trends", "dashboard"):
+            for grouping in GROUPINGS:
+                for machine_name, machine in machines.items():
+                    key = f"{endpoint} grouping={grouping} {machine_name} range={range_name}"
+                    result.append((key, f"/api/analytics/{endpoint}", {"grouping": grouping, **dates, **machine}))
+        for machine_name, machine in machines.items():
+            result.append((f"defect-distribution {machine_name} range={range_name}", "/api/analytics/defect-distribution", {**dates, **machine}))
+        result.append((f"machine-performance range={range_name}", "/api/analytics/machine-performance", dates))
+        result.append((f"machine-performance percentiles range={range_name}", "/api/analytics/machine-performance", {"percentiles": "true", **dates}))
+        result.append((f"summary range={range_name}", "/api/analytics/summary", dates))
+    return result
+
+
+def measure_endpoints(url: str, matrix: List[Tuple[str, str, Dict[str, Any]]], repeat: int) -> List[Dict[str, Any]]:
+    session = requests.Session()
+    results = []
+    for key, path, params in matrix:
+        session.get(url + path, params=params, timeout=600)  # warm-up, not timed
+        timings: List[float] = []
+        errors = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            try:
+                session.get(url + path, params=params, timeout=600).raise_for_status()
+            except requests.RequestException:
+                errors += 1
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        result = {
+            "key": key,
+            "path": path,
+            "params": params,
+            "requests": len(timings),
+            "errors": errors,
+            "p50_ms": percentile(timings, 0.50),
+            "p95_ms": percentile(timings, 0.95),
+            "p99_ms": percentile(timings, 0.99),
+            "max_ms": timings[-1],
+        }
+        print(f"  {key:58} p50 {result['p50_ms']:8.1f}  p95 {result['p95_ms']:8.1f}  p99 {result['p99_ms']:8.1f} ms{f'  {errors} errors' if errors else ''}")
+        results.append(result)
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_bounds(machine_prefix: str) -> Tuple[int, Optional[datetime]]:
+    session = SessionLocal()
+    try:
+        total = session.execute(select(func.count(ProductInspection.id))).scalar()
+        end = session.execute(
+            select(func.max(ProductInspection.timestamp)).where(ProductInspection.molding_machine_id.like(f"{machine_prefix}-%"))
+        ).scalar()
+        return total, end
+    finally:
+        session.close()
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> None:
+    def change(old: Optional[float], new: Optional[float]) -> str:
+        if not old or new is None:
+            return "     n/a"
+        return f"{(new - old) / old * 100:+7.1f}%"
+
+    print(f"\nCompared with {previous.get('created_at')} ({(previous.get('git_commit') or 'unknown')[:10]}):")
+    if previous.get("ingest") and current.get("ingest"):
+        old, new = previous["ingest"]["records_per_sec"], current["ingest"]["records_per_sec"]
+        print(f"  ingest records/sec {old:10.0f} -> {new:10.0f} {change(old, new)}")
+    for name, new in current["peak_rss_mb"].items():
+        old = previous.get("peak_rss_mb", {}).get(name)
+        if old is not None and new is not None:
+            print(f"  peak RSS {name:16} {old:8.1f} -> {new:8.1f} MB {change(old, new)}")
+    before = {e["key"]: e for e in previous.get("endpoints", [])}
+    for entry in current["endpoints"]:
+        old = before.get(entry["key"])
+        if old is None:
+            continue
+        print(
+            f"  {entry['key']:58} p50 {change(old['p50_ms'], entry['p50_ms'])}"
+            f"  p95 {change(old['p95_ms'], entry['p95_ms'])}  p99 {change(old['p99_ms'], entry['p99_ms'])}"
+        )
+
+
+def main(args) -> Dict[str, Any]:
+    results: Dict[str, Any] = {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "inspections": args.inspections, "machines": args.machines, "days": args.days,
+            "start": args.start.isoformat(), "defect_rate": args.defect_rate, "seed": args.seed,
+            "machine_prefix": args.machine_prefix, "repeat": args.repeat, "cache": args.cache,
+            "use_rollups": not args.raw, "server_workers": args.server_workers,
+        },
+        "generate": None,
+        "ingest": None,
+        "endpoints": [],
+        "peak_rss_mb": {},
+    }
+    with get_engine().connect() as conn:
+        results["host"]["postgres"] = conn.exec_driver_sql("SHOW server_version").scalar()
+
+    if not args.skip_ingest:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = args.dataset or os.path.join(tmp, "dataset.ndjson")
+            if not os.path.exists(path):
+                print(f"Generating {args.inspections} records for {args.machines} machines over {args.days:g} days...")
+                results["generate"] = generate(path, args)
+                print(f"  {results['generate']['records_per_sec']:.0f} records/sec")
+            print(f"Ingesting {path} ({args.ingest_workers} workers)...")
+            results["ingest"] = ingest(path, args.ingest_workers, args.chunk_size)
+            print(f"  {results['ingest']['inserted']} inserted, {results['ingest']['records_per_sec']:.0f} records/sec")
+        results["peak_rss_mb"]["ingest_workers"] = (
+            _rss_mb(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) if args.ingest_workers > 1 else None
+        )
+
+    total, end = dataset_bounds(args.machine_prefix)
+    if end is None:
+        raise SystemExit(f"No inspections for machines {args.machine_prefix}-*; run without --skip-ingest first.")
+    results["dataset"] = {"total_inspections": total, "end": end.isoformat()}
+
+    env = {
+        "ANALYTICS_CACHE_ENABLED": str(args.cache).lower(),
+        "ANALYTICS_USE_ROLLUPS": str(not args.raw).lower(),
+    }
+    print(f"Timing endpoints over {total} inspections ({args.repeat} requests each, cache {'on' if args.cache else 'off'}, {'raw tables' if args.raw else 'rollups'})...")
+    with serve(args.server_workers, env) as (url, proc):
+        results["endpoints"] = measure_endpoints(url, cases(f"{args.machine_prefix}-000", end), args.repeat)
+        results["peak_rss_mb"]["server"] = process_peak_rss_mb(proc.pid)
+    results["peak_rss_mb"]["benchmark"] = _rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    for name, value in results["peak_rss_mb"].items():
+        if value is not None:
+            print(f"  peak RSS {name}: {value:.1f} MB")
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="End-to-end benchmark: generate, ingest, then time every analytics endpoint")
+    parser.add_argument("--inspections", type=int, default=1_000_000, help="Synthetic records to generate and ingest")
+    parser.add_argument("--machines", type=int, default=20, help="Molding machines")
+    parser.add_argument("--days", type=float, default=30, help="Approximate time span of the dataset")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=datetime(2024, 1, 1), help="First timestamp (ISO 8601)")
+    parser.add_argument("--defect-rate", type=float, default=0.08, help="Mean share of inspections with a defect")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the generator")
+    parser.add_argument("--machine-prefix", default="SYN", help="Prefix of the generated machine ids")
+    parser.add_argument("--dataset", help="NDJSON file to ingest; generated here if it does not exist yet, so runs can share it")
+    parser.add_argument("--skip-ingest", action="store_true", help="Only time the endpoints against data already loaded")
+    parser.add_argument("--ingest-workers", type=int, default=1, help="Worker processes for ingest (1 uses the sequential bulk path)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Records per ingest transaction")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed requests per endpoint case")
+    parser.add_argument("--cache", action="store_true", help="Leave the analytics result cache on (off by default so queries are timed)")
+    parser.add_argument("--raw", action="store_true", help="Serve analytics from the raw tables instead of the rollups")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--output", help="Results file (default: bench-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results file to print changes against")
+    args = parser.parse_args()
+
+    print(f"Database: {settings.DATABASE_URL.rsplit('@', 1)[-1]}")
+    results = main(args)
+
+    output = args.output or f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            compare(json.load(fh), results)
@@ -0,0 +1,140 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import time
+import argparse
+import statistics
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import select, func
+from app.core.config import settings
+from app.core.column_store import ColumnStore
+from app.core.database import SessionLocal
+from app.models.product_inspection import ProductInspection
+from app.repositories.analytics_repository import AnalyticsRepository
+from app.repositories.columnar_analytics_repository import ColumnarAnalyticsRepository
+# Mapped by ProductInspection's relationships.
+import app.models.molding_machine_state
+
+# Averages and rates are rounded to 2 decimals after summing in a different
+# order than Postgres does, so they may differ by one in the last place.
+TOLERANCE = 0.0100001
+
+
+def _differences(sql: Any, store: Any, path: str = "") -> List[str]:
+    if isinstance(sql, dict) and isinstance(store, dict):
+        if sql.keys() != store.keys():
+            return [f"{path}: keys {sorted(sql)} != {sorted(store)}"]
+        return [d for key in sql for d in _differences(sql[key], store[key], f"{path}.{key}")]
+    if isinstance(sql, list) and isinstance(store, list):
+        if len(sql) != len(store):
+            return [f"{path}: {len(sql)} rows != {len(store)}"]
+        return [d for i, (a, b) in enumerate(zip(sql, store)) for d in _differences(a, b, f"{path}[{i}]")]
+    if isinstance(sql, float) and isinstance(store, float):
+        return [] if abs(sql - store) <= TOLERANCE else [f"{path}: {sql} != {store}"]
+    return [] if sql == store else [f"{path}: {sql!r} != {store!r}"]
+
+
+def _cases(db) -> List[Tuple[str, Optional[datetime], Optional[datetime], Optional[str], str]]:
+    """(label, start, end, machine, grouping) covering open and closed ranges,
+    ranges inside one block of rows, narrow and empty ones."""
+    first, last = db.execute(select(func.min(ProductInspection.timestamp), func.max(ProductInspection.timestamp))).one()
+    machines = db.execute(
+        select(ProductInspection.molding_machine_id, func.count())
+        .group_by(ProductInspection.molding_machine_id)
+        .order_by(func.count().desc(), ProductInspection.molding_machine_id)
+    ).scalars().all()
+    busiest, quietest = machines[0], machines[-1]
+    middle = first + (last - first) / 2
+    ranges = [
+        ("everything", None, None, "week"),
+        ("from the middle", middle, None, "day"),
+        ("up to the middle", None, middle, "auto"),
+        ("last 30 days", last - timedelta(days=30), last, "6h"),
+        ("one odd week", middle + timedelta(seconds=37, microseconds=5), middle + timedelta(days=7, minutes=13), "hour"),
+        ("one hour", middle, middle + timedelta(hours=1), "15m"),
+        ("after the data", last + timedelta(days=1), last + timedelta(days=2), "day"),
+    ]
+    cases = []
+    for label, start, end, grouping in ranges:
+        for machine in (None, busiest, quietest, "no-such-machine"):
+            cases.append((f"{label}, {machine or 'all machines'}", start, end, machine, grouping))
+    return cases
+
+
+def _calls(repo, start, end, machine, grouping) -> Dict[str, Callable[[], Any]]:
+    return {
+        "grouping": lambda: repo.resolve_grouping(grouping, 500, start, end, machine),
+        "trends": lambda: repo.get_defect_trends(
+            repo.resolve_grouping(grouping, 500, start, end, machine) if grouping == "auto" else grouping, start, end, machine
+        ),
+        "trends (downsampled)": lambda: repo.get_defect_trends("day", start, end, machine, 50),
+        "machine performance": lambda: repo.get_machine_performance(start, end, True),
+        "distribution": lambda: repo.get_defect_distribution(start, end, machine),
+        "summary": lambda: repo.get_summary_metrics(start, end),
+        "dashboard": lambda: repo.get_dashboard("day", start, end, machine, 200),
+    }
+
+
+def check(tail: int, limit: int) -> int:
+    session = SessionLocal()
+    try:
+        store = ColumnStore(settings.ANALYTICS_COLUMN_STORE_LOOKBACK, 0)
+        newest = session.execute(select(func.max(ProductInspection.id))).scalar() or 0
+        started = time.perf_counter()
+        store.load(session, through_id=newest - tail if tail else None)
+        loaded = time.perf_counter() - started
+        started = time.perf_counter()
+        store.snapshot(session)
+        stats = store.stats()
+        print(
+            f"Loaded {stats['inspections'] - stats['tail_inspections']} inspections in {loaded:.2f}s, "
+            f"appended {stats['tail_inspections']} in {time.perf_counter() - started:.2f}s; "
+            f"{stats['machines']} machines, {stats['bytes'] / 2**20:.1f} MiB."
+        )
+
+        timings: Dict[str, Tuple[List[float], List[float]]] = {}
+        mismatches = 0
+        for label, start, end, machine, grouping in _cases(session):
+            sql_calls = _calls(AnalyticsRepository(session), start, end, machine, grouping)
+            store_calls = _calls(ColumnarAnalyticsRepository(AnalyticsRepository(session), store), start, end, machine, grouping)
+            for name, call in sql_calls.items():
+                began = time.perf_counter()
+                expected = call()
+                sql_ms = (time.perf_counter() - began) * 1000
+                began = time.perf_counter()
+                actual = store_calls[name]()
+                store_ms = (time.perf_counter() - began) * 1000
+                sql_times, store_times = timings.setdefault(name, ([], []))
+                sql_times.append(sql_ms)
+                store_times.append(store_ms)
+
+                differences = _differences(expected, actual)
+                if differences:
+                    mismatches += 1
+                    print(f"{label}: {name}")
+                    for difference in differences[:limit]:
+                        print(f"    {difference}")
+        session.rollback()
+    finally:
+        session.close()
+
+    # Store timings include the watermark read that brings it up to date.
+    print(f"\n{'':22} {'sql median':>12} {'store median':>14} {'store max':>11}")
+    for name, (sql_times, store_times) in timings.items():
+        print(f"{name:22} {statistics.median(sql_times):9.1f} ms {statistics.median(store_times):11.3f} ms {max(store_times):8.3f} ms")
+    print(f"\n{store.merges} tail merges. {mismatches} results from the column store that do not match SQL.")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare the column store's dashboard aggregates against SQL")
+    parser.add_argument("--tail", type=int, default=20000, help="Load all but the newest this many inspections, then append them")
+    parser.add_argument("--limit", type=int, default=5, help="Maximum differences to print per result")
+    args = parser.parse_args()
+
+    sys.exit(check(args.tail, args.limit))
@@ -0,0 +1,249 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import argparse
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+from app.core import migrations, partitions
+from app.core.config import settings
+from app.core.database import Base
+from app.migrations.m0003_monthly_partitions import MACHINE_STATE_COLUMNS
+from app.repositories.defect_mask_repository import DefectMaskRepository
+import app.models.product_inspection
+import app.models.machine_recipe
+import app.models.molding_machine_state
+import app.models.object_detection
+import app.models.defect
+import app.models.pixel_severity
+import app.models.machine_hourly_rollup
+import app.models.defect_type_hourly_rollup
+import app.models.severity_hourly_sketch
+import app.models.ingest_generation
+
+# The schema create_tables.py produced before there were any migrations: what
+# a database deployed from the first release looks like.
+BASELINE_SCHEMA = [
+    """
+    CREATE TABLE product_inspections (
+        id SERIAL PRIMARY KEY,
+        version VARCHAR NOT NULL,
+        timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        molding_machine_id VARCHAR NOT NULL
+    )
+    """,
+    "CREATE INDEX ix_product_inspections_id ON product_inspections (id)",
+    "CREATE TABLE molding_machine_states ("
+    " id SERIAL PRIMARY KEY,"
+    " inspection_id INTEGER NOT NULL REFERENCES product_inspections (id)"
+    + "".join(f', "{name}" {type_}' for name, type_ in MACHINE_STATE_COLUMNS.items()) +
+    ")",
+    "CREATE INDEX ix_molding_machine_states_id ON molding_machine_states (id)",
+    """
+    CREATE TABLE object_detections (
+        id SERIAL PRIMARY KEY,
+        inspection_id INTEGER NOT NULL REFERENCES product_inspections (id),
+        name VARCHAR NOT NULL,
+        reject BOOLEAN NOT NULL
+    )
+    """,
+    "CREATE INDEX ix_object_detections_id ON object_detections (id)",
+    """
+    CREATE TABLE defects (
+        id SERIAL PRIMARY KEY,
+        object_detection_id INTEGER NOT NULL REFERENCES object_detections (id),
+        defect_type VARCHAR NOT NULL,
+        reject BOOLEAN NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE pixel_severities (
+        id SERIAL PRIMARY KEY,
+        defect_id INTEGER NOT NULL UNIQUE REFERENCES defects (id),
+        reject BOOLEAN NOT NULL,
+        value FLOAT NOT NULL,
+        min_value FLOAT,
+        max_value FLOAT,
+        threshold FLOAT
+    )
+    """,
+]
+
+# Inspections every 6 hours across several months, a few setpoint
+# combinations, one duplicate of each 50th inspection for m0001 to remove,
+# and a defect on every third detection.
+SEED_STATEMENTS = [
+    """
+    INSERT INTO product_inspections (version, timestamp, molding_machine_id)
+    SELECT 'migration-check', timestamp '2024-01-01' + g * interval '6 hours', 'M-' || (g % :machines)
+    FROM generate_series(1, :rows) g
+    """,
+    """
+    INSERT INTO molding_machine_states (inspection_id, "ShotCount", "CycleTime", "InjPeakPressure", "Barrel1", "H1TempSP", "ClampForceSP")
+    SELECT id, id, 20 + id % 7, 900 + id % 50, 210 + id % 5, 200 + id % 4, 1000
+    FROM product_inspections
+    """,
+    """
+    INSERT INTO product_inspections (version, timestamp, molding_machine_id)
+    SELECT version, timestamp, molding_machine_id FROM product_inspections WHERE id % 50 = 0
+    """,
+    """
+    INSERT INTO molding_machine_states (inspection_id, "ShotCount", "CycleTime", "InjPeakPressure", "Barrel1", "H1TempSP", "ClampForceSP")
+    SELECT d.id, o.id, 20, 900, 210, 200, 1000
+    FROM product_inspections d JOIN product_inspections o
+      ON o.timestamp = d.timestamp AND o.molding_machine_id = d.molding_machine_id AND o.id < d.id
+    """,
+    "INSERT INTO object_detections (inspection_id, name, reject) SELECT id, 'default', false FROM product_inspections",
+    """
+    INSERT INTO defects (object_detection_id, defect_type, reject)
+    SELECT id, (ARRAY['flash_defect', 'short_defect', 'splay_defect', 'void_defect'])[1 + id % 4], true
+    FROM object_detections WHERE id % 3 = 0
+    """,
+    "INSERT INTO pixel_severities (defect_id, reject, value, min_value, max_value, threshold) SELECT id, true, random(), 0, 1, 0.5 FROM defects",
+]
+
+# Rows each table should hold after the upgrade, counted on the baseline:
+# m0001 deletes the later copies of duplicate inspections with their children.
+KEPT = """
+    WITH kept AS (
+        SELECT id FROM product_inspections p
+        WHERE NOT EXISTS (
+            SELECT 1 FROM product_inspections e
+            WHERE e.molding_machine_id = p.molding_machine_id AND e.timestamp = p.timestamp AND e.id < p.id
+        )
+    )
+"""
+EXPECTED_COUNTS = {
+    "product_inspections": "SELECT count(*) FROM kept",
+    "molding_machine_states": "SELECT count(*) FROM molding_machine_states m JOIN kept k ON k.id = m.inspection_id",
+    "object_detections": "SELECT count(*) FROM object_detections o JOIN kept k ON k.id = o.inspection_id",
+    "defects": """
+        SELECT count(*) FROM defects d
+        JOIN object_detections o ON o.id = d.object_detection_id JOIN kept k ON k.id = o.inspection_id
+    """,
+    "pixel_severities": """
+        SELECT count(*) FROM pixel_severities ps JOIN defects d ON d.id = ps.defect_id
+        JOIN object_detections o ON o.id = d.object_detection_id JOIN kept k ON k.id = o.inspection_id
+    """,
+}
+
+
+def _scratch_engine(database: str, **kwargs) -> Engine:
+    return create_engine(make_url(settings.DATABASE_URL).set(database=database), **kwargs)
+
+
+def _recreate(database: str) -> None:
+    server = create_engine(settings.DATABASE_URL, isolation_level="AUTOCOMMIT")
+    with server.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{database}"'))
+        conn.execute(text(f'CREATE DATABASE "{database}"'))
+    server.dispose()
+
+
+def _drop(database: str) -> None:
+    server = create_engine(settings.DATABASE_URL, isolation_level="AUTOCOMMIT")
+    with server.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{database}"'))
+    server.dispose()
+
+
+def _counts(engine: Engine, prefix: str = "", queries: Dict[str, str] = None) -> Dict[str, int]:
+    queries = queries or {table: f"SELECT count(*) FROM {table}" for table in EXPECTED_COUNTS}
+    with engine.connect() as conn:
+        return {table: conn.execute(text(prefix + query)).scalar() for table, query in queries.items()}
+
+
+def _problems(engine: Engine, expected: Dict[str, int]) -> List[str]:
+    problems = []
+    pending = {migrations.version_of(m) for m in migrations.discover()} - migrations.applied_versions(engine)
+    if pending:
+        problems.append(f"not applied: {', '.join(sorted(pending))}")
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        stored = {c["name"] for c in inspector.get_columns(table.name)}
+        modelled = {c.name for c in table.columns}
+        if stored != modelled:
+            problems.append(
+                f"{table.name}: missing {sorted(modelled - stored)}, unexpected {sorted(stored - modelled)}"
+            )
+        stored_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in stored_indexes:
+                problems.append(f"{table.name}: missing index {index.name}")
+
+    with engine.connect() as conn:
+        for table, _ in partitions.PARTITIONED_TABLES:
+            if not partitions.is_partitioned(conn, table):
+                problems.append(f"{table} is not partitioned")
+        unlinked = conn.execute(text("SELECT count(*) FROM molding_machine_states WHERE recipe_id IS NULL")).scalar()
+        if unlinked:
+            problems.append(f"{unlinked} machine states without a recipe")
+        # Every seeded severity has all of its metrics set.
+        sketched = conn.execute(text(
+            "SELECT metric, sum(sample_count) FROM severity_hourly_sketches GROUP BY metric"
+        )).all()
+        for metric, count in sketched:
+            if count != expected["pixel_severities"]:
+                problems.append(f"severity sketches hold {count} {metric} values, not {expected['pixel_severities']}")
+        if not sketched:
+            problems.append("severity sketches are empty")
+
+    after = _counts(engine)
+    for table, count in expected.items():
+        if after[table] != count:
+            problems.append(f"{table}: {after[table]} rows after the upgrade, expected {count}")
+
+    with Session(engine) as session:
+        wrong = DefectMaskRepository(session).check(datetime(2000, 1, 1), datetime(2100, 1, 1))
+    if wrong:
+        problems.append(f"{wrong} inspections with a wrong defect mask")
+    return problems
+
+
+def check(database: str, rows: int, machines: int, keep: bool) -> int:
+    _recreate(database)
+    engine = _scratch_engine(database)
+    try:
+        with engine.begin() as conn:
+            for statement in BASELINE_SCHEMA:
+                conn.execute(text(statement))
+            for statement in SEED_STATEMENTS:
+                conn.execute(text(statement), {"rows": rows, "machines": machines})
+        expected = _counts(engine, KEPT, EXPECTED_COUNTS)
+
+        # As create_tables.py does on startup.
+        Base.metadata.create_all(engine)
+        applied = migrations.upgrade(engine)
+        print(f"Applied {', '.join(applied)} to a baseline database of {rows + rows // 50} inspections.")
+
+        problems = _problems(engine, expected)
+        again = migrations.upgrade(engine)
+        if again:
+            problems.append(f"applied again on a second run: {', '.join(again)}")
+    finally:
+        engine.dispose()
+        if not keep:
+            _drop(database)
+
+    for problem in problems:
+        print(f"FAIL {problem}")
+    print("Upgrade from the baseline schema ok." if not problems else f"{len(problems)} problems.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Upgrade a scratch database from the baseline schema and verify the result")
+    parser.add_argument("--database", default="migration_check", help="Scratch database to create (and drop) on the same server")
+    parser.add_argument("--rows", type=int, default=2000, help="Inspections to seed")
+    parser.add_argument("--machines", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database for inspection")
+    args = parser.parse_args()
+
+    sys.exit(check(args.database, args.rows, args.machines, args.keep))
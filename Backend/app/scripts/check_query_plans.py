@@ -0,0 +1,218 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import re
+import json
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Set, Tuple
+from sqlalchemy import event, text, func, select
+from app.core import partitions
+from app.core.database import SessionLocal, get_engine
+from app.models.product_inspection import ProductInspection
+from app.repositories.analytics_repository import AnalyticsRepository
+from app.repositories.rollup_repository import RollupAnalyticsRepository, RollupRepository
+
+# Tables that grow with history; a sequential scan on any of them for a
+# selective dashboard query means an index is missing or unusable.
+LARGE_TABLES = {
+    "product_inspections",
+    "molding_machine_states",
+    "object_detections",
+    "defects",
+    "pixel_severities",
+    "machine_hourly_rollups",
+    "defect_type_hourly_rollups",
+    "severity_hourly_sketches",
+}
+
+SEED_VERSION = "plan-check-seed"
+SEED_START = datetime(2020, 1, 1)
+SEED_INTERVAL = timedelta(seconds=30)
+
+PARTITION_NAME = re.compile(r"^(?P<table>.+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+SEED_STATEMENTS = [
+    """
+    INSERT INTO product_inspections (version, timestamp, molding_machine_id, shot_count)
+    SELECT :version, timestamp '2020-01-01' + g * (:interval)::interval, 'SEED-' || (g % :machines), g
+    FROM generate_series(1, :rows) g
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO molding_machine_states (inspection_id, inspection_timestamp, "ShotCount", "CycleTime", "InjPeakPressure",
+        "Barrel1", "Barrel2", "Barrel3", "Barrel4", "Barrel5", "Barrel6")
+    SELECT p.id, p.timestamp, p.shot_count, 20 + random() * 10, 900 + random() * 200,
+        210 + random() * 10, 210 + random() * 10, 210 + random() * 10,
+        210 + random() * 10, 210 + random() * 10, 210 + random() * 10
+    FROM product_inspections p
+    WHERE p.version = :version
+      AND NOT EXISTS (SELECT 1 FROM molding_machine_states m WHERE m.inspection_id = p.id AND m.inspection_timestamp = p.timestamp)
+    """,
+    """
+    INSERT INTO object_detections (inspection_id, inspection_timestamp, name, reject)
+    SELECT p.id, p.timestamp, 'default', false
+    FROM product_inspections p
+    WHERE p.version = :version
+      AND NOT EXISTS (SELECT 1 FROM object_detections o WHERE o.inspection_id = p.id AND o.inspection_timestamp = p.timestamp)
+    """,
+    """
+    INSERT INTO defects (object_detection_id, inspection_timestamp, defect_type, reject)
+    SELECT o.id, o.inspection_timestamp, (ARRAY['flash_defect', 'short_defect', 'splay_defect', 'void_defect'])[1 + o.id % 4], true
+    FROM object_detections o JOIN product_inspections p ON p.id = o.inspection_id AND p.timestamp = o.inspection_timestamp
+    WHERE p.version = :version AND random() < 0.1
+      AND NOT EXISTS (SELECT 1 FROM defects d WHERE d.object_detection_id = o.id AND d.inspection_timestamp = o.inspection_timestamp)
+    """,
+    """
+    INSERT INTO pixel_severities (defect_id, inspection_timestamp, reject, value, min_value, max_value, threshold)
+    SELECT d.id, d.inspection_timestamp, true, random(), 0, 1, 0.5
+    FROM defects d
+    WHERE NOT EXISTS (SELECT 1 FROM pixel_severities ps WHERE ps.defect_id = d.id AND ps.inspection_timestamp = d.inspection_timestamp)
+    """,
+]
+
+
+def seed(rows: int, machines: int) -> None:
+    with get_engine().begin() as conn:
+        partitions.ensure_months(conn, partitions.months_between(SEED_START, SEED_START + SEED_INTERVAL * rows))
+
+    params = {"version": SEED_VERSION, "rows": rows, "machines": machines, "interval": f"{SEED_INTERVAL.total_seconds()} seconds"}
+    session = SessionLocal()
+    try:
+        for statement in SEED_STATEMENTS:
+            session.execute(text(statement), params)
+        RollupRepository(session).rebuild()
+        session.commit()
+    finally:
+        session.close()
+
+    with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+
+
+def _walk(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _walk(child)
+
+
+def capture_statements(call) -> List[Tuple[str, Any]]:
+    captured: List[Tuple[str, Any]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    engine = get_engine()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def _explain(statement: str, parameters: Any, analyze: bool = False) -> Dict[str, Any]:
+    options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+    with get_engine().connect() as conn:
+        raw = conn.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters).scalar()
+        conn.rollback()
+    plan = raw if isinstance(raw, list) else json.loads(raw)
+    return plan[0]["Plan"]
+
+def _parent_table(relation: str) -> str:
+    match = PARTITION_NAME.match(relation)
+    return match.group("table") if match else relation
+
+def sequential_scans(statement: str, parameters: Any) -> List[str]:
+    return [
+        _parent_table(node["Relation Name"])
+        for node in _walk(_explain(statement, parameters))
+        if node["Node Type"] == "Seq Scan" and _parent_table(node.get("Relation Name", "")) in LARGE_TABLES
+    ]
+
+def partitions_outside(statement: str, parameters: Any, months: Set[date]) -> List[str]:
+    """Monthly partitions outside ``months`` that the statement actually read.
+
+    Uses EXPLAIN ANALYZE: partitions pruned at run time (by a parameterized
+    join) are still listed by a plain EXPLAIN but are never executed.
+    """
+    scanned = []
+    for node in _walk(_explain(statement, parameters, analyze=True)):
+        match = PARTITION_NAME.match(node.get("Relation Name", ""))
+        if not match or not node.get("Actual Loops"):
+            continue
+        if date(int(match.group("year")), int(match.group("month")), 1) not in months:
+            scanned.append(node["Relation Name"])
+    return scanned
+
+
+def main(window_hours: int) -> int:
+    session = SessionLocal()
+    try:
+        middle_id = select((func.min(ProductInspection.id) + func.max(ProductInspection.id)) / 2).scalar_subquery()
+        anchor = session.execute(
+            select(ProductInspection.timestamp, ProductInspection.molding_machine_id)
+            .where(ProductInspection.id >= middle_id)
+            .order_by(ProductInspection.id)
+            .limit(1)
+        ).first()
+        if anchor is None:
+            print("No inspections found; run with --seed first.")
+            return 1
+
+        # A selective window around a real inspection, deliberately not
+        # aligned to the hour so the rollup path exercises its raw edges.
+        machine_id = anchor.molding_machine_id
+        start = anchor.timestamp.replace(minute=17, second=0, microsecond=0)
+        end = start + timedelta(hours=window_hours, minutes=26)
+
+        months = set(partitions.months_between(start, end))
+        failures = 0
+        for repo_cls in (AnalyticsRepository, RollupAnalyticsRepository):
+            repo = repo_cls(session)
+            calls = {
+                "get_defect_trends(hour, machine)": lambda: repo.get_defect_trends("hour", start, end, machine_id),
+                "get_defect_trends(day)": lambda: repo.get_defect_trends("day", start, end),
+                "get_machine_performance": lambda: repo.get_machine_performance(start, end),
+                "get_defect_distribution(machine)": lambda: repo.get_defect_distribution(start, end, machine_id),
+                "get_defect_distribution": lambda: repo.get_defect_distribution(start, end),
+                "get_summary_metrics": lambda: repo.get_summary_metrics(start, end),
+                "get_defect_cooccurrence(machine)": lambda: repo.get_defect_cooccurrence(start, end, machine_id),
+                "get_defect_cooccurrence": lambda: repo.get_defect_cooccurrence(start, end),
+                "get_severity_percentiles(defect_type, machine)": lambda: repo.get_severity_percentiles("defect_type", "day", [0.5, 0.99], start, end, machine_id),
+                "get_severity_percentiles(time)": lambda: repo.get_severity_percentiles("time", "hour", [0.5, 0.99], start, end),
+                "get_recipe_changes(machine)": lambda: repo.get_recipe_changes(start, end, machine_id),
+            }
+            for name, call in calls.items():
+                for statement, parameters in capture_statements(call):
+                    scans = sequential_scans(statement, parameters)
+                    unpruned = partitions_outside(statement, parameters, months)
+                    status = "FAIL" if scans or unpruned else "ok"
+                    detail = f" (seq scan on {', '.join(sorted(set(scans)))})" if scans else ""
+                    if unpruned:
+                        detail += f" (read partitions outside the range: {', '.join(sorted(set(unpruned)))})"
+                    print(f"{status:4} {repo_cls.__name__}.{name}{detail}")
+                    failures += bool(scans or unpruned)
+    finally:
+        session.close()
+
+    print(f"{failures} queries fell back to sequential scans or read partitions outside their date range.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Fail if a repository query sequentially scans a large table or misses partition pruning")
+    parser.add_argument("--seed", type=int, default=0, help="Insert this many synthetic inspections first")
+    parser.add_argument("--machines", type=int, default=10, help="Machines to spread seeded inspections over")
+    parser.add_argument("--window-hours", type=int, default=24, help="Width of the filtered date range")
+    args = parser.parse_args()
+
+    if args.seed:
+        print(f"Seeding {args.seed} inspections...")
+        seed(args.seed, args.machines)
+
+    sys.exit(main(args.window_hours))
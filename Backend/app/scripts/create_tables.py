@@ -5,16 +5,23 @@ ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(ROOT))
 
 from app.core.database import get_engine, Base
+from app.core import migrations
 import app.models.product_inspection
+import app.models.machine_recipe
 import app.models.molding_machine_state
 import app.models.object_detection
 import app.models.defect
 import app.models.pixel_severity
-from sqlalchemy import inspect
+import app.models.machine_hourly_rollup
+import app.models.defect_type_hourly_rollup
+import app.models.severity_hourly_sketch
+import app.models.ingest_generation
 
 def main():
     engine = get_engine()
     Base.metadata.create_all(engine)
+    for version in migrations.upgrade(engine):
+        print(f"Applied migration {version}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
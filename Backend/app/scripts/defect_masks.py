@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import time
+import argparse
+from datetime import datetime
+from typing import List, Tuple
+from app.core import partitions
+from app.core.database import SessionLocal
+from app.repositories.defect_mask_repository import DefectMaskRepository
+from app.repositories.watermark_repository import WatermarkRepository
+# Mapped by ProductInspection's relationships.
+import app.models.molding_machine_state
+
+
+def _months(session) -> List[Tuple[datetime, datetime]]:
+    months = sorted(partitions.existing_months(session.connection()))
+    return [
+        (datetime.combine(m, datetime.min.time()), datetime.combine(partitions.next_month(m), datetime.min.time()))
+        for m in months
+    ]
+
+
+def backfill() -> None:
+    """Recompute every inspection's defect mask, one month per transaction."""
+    session = SessionLocal()
+    try:
+        started = time.perf_counter()
+        changed = 0
+        for start, end in _months(session):
+            changed += DefectMaskRepository(session).backfill(start, end)
+            session.commit()
+        if changed:
+            WatermarkRepository(session).bump()
+            session.commit()
+        print(f"Updated {changed} defect masks in {time.perf_counter() - started:.2f}s.")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def check() -> int:
+    session = SessionLocal()
+    try:
+        mismatches = 0
+        for start, end in _months(session):
+            count = DefectMaskRepository(session).check(start, end)
+            if count:
+                print(f"{start:%Y-%m}: {count} inspections")
+            mismatches += count
+    finally:
+        session.close()
+
+    print(f"{mismatches} inspections with a defect mask that does not match their defects.")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Maintain the per-inspection defect masks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backfill", help="Recompute the masks from the defect rows")
+    sub.add_parser("check", help="Compare the masks against the defect rows")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        backfill()
+    else:
+        sys.exit(check())
@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import time
+import argparse
+from datetime import datetime
+from typing import Optional
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.defect_masks import DEFECT_TYPES
+from app.repositories.export_repository import ExportRepository
+
+
+def export(
+    fmt: str,
+    output: Optional[str],
+    batch_size: int,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    machine_id: Optional[str],
+    defects: Optional[bool],
+    defect_type: Optional[str],
+) -> None:
+    session = SessionLocal()
+    target = open(output, "wb") if output else sys.stdout.buffer
+    try:
+        started = time.perf_counter()
+        written = 0
+        for chunk in ExportRepository(session).export(fmt, batch_size, start_date, end_date, machine_id, defects, defect_type):
+            target.write(chunk)
+            written += len(chunk)
+        target.flush()
+        print(f"Exported {written / 1e6:.1f} MB in {time.perf_counter() - started:.2f}s.", file=sys.stderr)
+    finally:
+        if output:
+            target.close()
+        session.close()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Export inspections, one row per defect, as CSV, NDJSON or Parquet")
+    parser.add_argument("--format", choices=["csv", "ndjson", "parquet"], default="csv")
+    parser.add_argument("--output", "-o", help="File to write (default: stdout)")
+    parser.add_argument("--start-date", type=datetime.fromisoformat)
+    parser.add_argument("--end-date", type=datetime.fromisoformat)
+    parser.add_argument("--machine-id")
+    defects = parser.add_mutually_exclusive_group()
+    defects.add_argument("--with-defects", dest="defects", action="store_const", const=True, help="Only inspections with defects")
+    defects.add_argument("--without-defects", dest="defects", action="store_const", const=False, help="Only inspections without defects")
+    parser.add_argument("--defect-type", choices=DEFECT_TYPES, help="Only inspections with a defect of this type")
+    parser.add_argument("--batch-size", type=int, default=settings.EXPORT_BATCH_SIZE, help="Rows per fetch and Parquet row group")
+    args = parser.parse_args()
+
+    export(args.format, args.output, args.batch_size, args.start_date, args.end_date, args.machine_id, args.defects, args.defect_type)
@@ -0,0 +1,263 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import time
+import heapq
+import random
+import argparse
+from itertools import accumulate
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple, BinaryIO
+
+import orjson
+from app.schemas.molding_machine_state import MoldingMachineStateBase
+from app.schemas.object_detection import ObjectDetectionBase
+
+STATE_FIELDS = list(MoldingMachineStateBase.model_fields)
+DEFECT_TYPES = [k for k in ObjectDetectionBase.model_fields if k.endswith("_defect")]
+
+# Relative frequency of each defect type on a defective part; types missing
+# here (added to the schema later) get a weight of 1.
+DEFECT_WEIGHTS = {
+    "flash_defect": 18, "short_defect": 14, "splay_defect": 12, "sink_mark_defect": 10,
+    "flow_mark_defect": 9, "void_defect": 8, "knit_line_defect": 7, "burn_mark_defect": 5,
+    "jetting_defect": 5, "contamination_defect": 4, "discoloration_defect": 3,
+    "discoloration_patch_defect": 2, "ejector_pin_mark_defect": 3,
+}
+_DEFECT_CUM_WEIGHTS = list(accumulate(DEFECT_WEIGHTS.get(t, 1) for t in DEFECT_TYPES))
+
+# Setpoint ranges by field-name pattern, first match wins. Setpoints are fixed
+# per recipe; the measured values below are derived from them with noise.
+SETPOINT_RANGES: List[Tuple[str, float, float]] = [
+    ("TempSP", 190.0, 250.0),
+    ("pressureSP", 500.0, 1200.0),
+    ("PressureSP", 300.0, 800.0),
+    ("TimeSP", 0.5, 3.0),
+    ("FillSegmentXfer", 5.0, 50.0),
+    ("FillSegment", 10.0, 80.0),
+    ("PullBack", 2.0, 8.0),
+    ("ShotSizeSP", 30.0, 80.0),
+    ("VPTransferPositionSP", 8.0, 20.0),
+]
+INTEGER_SETPOINTS = {"ClampForceSP": (80, 300)}
+ALARMS = ["AlarmLED", "BuzzerAlarm", "CycleStopFault"]
+
+# Process excursions: how often one starts (per shot), how many shots it lasts
+# on average, and how much it multiplies the defect rate.
+EXCURSION_START_P = 0.0005
+EXCURSION_SHOTS = (20, 400)
+EXCURSION_DEFECT_FACTOR = 6.0
+_EXCURSION_SHARE = EXCURSION_START_P * sum(EXCURSION_SHOTS) / 2 / (1 + EXCURSION_START_P * sum(EXCURSION_SHOTS) / 2)
+
+# Unplanned stops: chance per shot and duration range in seconds.
+DOWNTIME_P = 0.001
+DOWNTIME_SECONDS = (600.0, 7200.0)
+
+
+def _setpoint_range(field: str) -> Optional[Tuple[float, float]]:
+    for pattern, lo, hi in SETPOINT_RANGES:
+        if pattern in field:
+            return lo, hi
+    return None
+
+
+def new_recipe(rng: random.Random) -> Dict[str, Any]:
+    recipe: Dict[str, Any] = {}
+    for field in STATE_FIELDS:
+        if field in INTEGER_SETPOINTS:
+            recipe[field] = rng.randint(*INTEGER_SETPOINTS[field])
+        elif field.endswith("SP"):
+            bounds = _setpoint_range(field)
+            if bounds:
+                recipe[field] = round(rng.uniform(*bounds), 1)
+    recipe["CoolTimeSP"] = round(rng.uniform(8.0, 20.0), 1)
+    recipe["InjTimeSP"] = round(rng.uniform(1.0, 4.0), 2)
+    return recipe
+
+
+class Machine:
+    """One machine's shot stream: a recipe that changes now and then, measured
+    values scattered around it, and occasional process excursions (drifting
+    temperatures and pressures) during which defects are far more likely."""
+
+    def __init__(self, machine_id: str, seed: int, start: datetime, spacing: float, defect_rate: float, recipe_changes_per_day: float):
+        self.id = machine_id
+        self.rng = random.Random(seed)
+        self.ts = start + timedelta(seconds=self.rng.uniform(0, spacing))
+        self.spacing = spacing
+        self.shot = self.rng.randint(0, 100_000)
+        # Machines differ in how well they run; the factors average out to the
+        # requested rate once excursions are accounted for.
+        base_rate = defect_rate / (1 + (EXCURSION_DEFECT_FACTOR - 1) * _EXCURSION_SHARE)
+        self.defect_rate = min(0.95, base_rate * self.rng.lognormvariate(-0.125, 0.5))
+        self.recipe_change_p = recipe_changes_per_day * spacing / 86_400
+        self.recipe = new_recipe(self.rng)
+        self.excursion = 0
+
+    def _state(self) -> Dict[str, Any]:
+        rng, sp = self.rng, self.recipe
+        gauss = rng.gauss
+        drift = 1.0 + (0.04 if self.excursion else 0.0) * gauss(1.0, 0.3)
+        state = dict(sp)
+        for k in range(1, 7):
+            state[f"Barrel{k}"] = sp[f"H{k}TempSP"] * drift + gauss(0.0, 1.5)
+        state["BarrelN1"] = sp["N1TempSP"] * drift + gauss(0.0, 1.5)
+        state["BarrelN2"] = sp["N2TempSP"] * drift + gauss(0.0, 1.5)
+        fill_pressure = max(sp[f"FillSegment{k}pressureSP"] for k in range(1, 6))
+        state["FillPeakPress"] = fill_pressure * drift + gauss(0.0, 10.0)
+        state["InjPeakPressure"] = state["FillPeakPress"] * 1.05 + gauss(0.0, 8.0)
+        state["VtoPTime"] = sp["InjTimeSP"] * 0.8 + gauss(0.0, 0.03)
+        state["VtoPPos"] = sp["VPTransferPositionSP"] + gauss(0.0, 0.2)
+        state["VtoPPress"] = state["FillPeakPress"] * 0.9 + gauss(0.0, 8.0)
+        state["InjStartPos"] = sp["ShotSizeSP"] + sp["PullBackAfterSP"] + gauss(0.0, 0.1)
+        state["CushionFin"] = rng.uniform(3.0, 6.0)
+        state["CushionMin"] = state["CushionFin"] - abs(gauss(0.0, 0.3))
+        state["ChargeTime"] = rng.uniform(3.0, 8.0)
+        state["ClampOpenTimeCV"] = rng.uniform(0.8, 1.6)
+        state["ClampCloseTimeCV"] = rng.uniform(0.8, 1.6)
+        state["EjFwdTimeCV"] = rng.uniform(0.3, 0.8)
+        state["EjRetTimeCV"] = rng.uniform(0.3, 0.8)
+        state["TonnageForceCV"] = sp["ClampForceSP"] + rng.randint(-3, 3)
+        hold = sum(sp[f"HoldSegment{k}TimeSP"] for k in range(1, 5))
+        state["CycleTime"] = (
+            sp["InjTimeSP"] + hold + sp["CoolTimeSP"] + state["ClampOpenTimeCV"]
+            + state["ClampCloseTimeCV"] + state["EjFwdTimeCV"] + state["EjRetTimeCV"] + abs(gauss(0.0, 0.2))
+        )
+        for alarm in ALARMS:
+            state[alarm] = rng.random() < (0.05 if self.excursion else 0.002)
+        state["ShotCount"] = self.shot
+        return state
+
+    def _detection(self) -> Dict[str, Any]:
+        rng = self.rng
+        detection: Dict[str, Any] = {"reject": False, "label_detection": {}}
+        rate = min(0.95, self.defect_rate * (EXCURSION_DEFECT_FACTOR if self.excursion else 1.0))
+        if rng.random() >= rate:
+            return detection
+        count = 1 + (rng.random() < 0.25) + (rng.random() < 0.05)
+        for defect_type in set(rng.choices(DEFECT_TYPES, cum_weights=_DEFECT_CUM_WEIGHTS, k=count)):
+            threshold = 0.5
+            value = rng.betavariate(2.0, 2.0)
+            reject = value >= threshold
+            detection[defect_type] = {
+                "reject": reject,
+                "pixel_severity": {"reject": reject, "value": value, "min_value": 0.0, "max_value": 1.0, "threshold": threshold},
+            }
+            detection["reject"] |= reject
+        return detection
+
+    def next(self) -> Tuple[datetime, Dict[str, Any]]:
+        rng = self.rng
+        if rng.random() < self.recipe_change_p:
+            self.recipe = new_recipe(rng)
+        if self.excursion:
+            self.excursion -= 1
+        elif rng.random() < EXCURSION_START_P:
+            self.excursion = rng.randint(*EXCURSION_SHOTS)
+
+        ts = self.ts
+        record = {
+            "version": "1.0",
+            "timestamp": ts.isoformat(),
+            "molding-machine-id": self.id,
+            "molding_machine_state": self._state(),
+            "object_detections": {"part": self._detection()},
+        }
+        self.shot += 1
+        # A shot takes its cycle time; idle time between shots (and the odd
+        # stop) fills the rest of the mean spacing.
+        cycle = record["molding_machine_state"]["CycleTime"]
+        gap = cycle
+        idle = self.spacing - cycle - DOWNTIME_P * sum(DOWNTIME_SECONDS) / 2
+        if idle > 0:
+            gap += rng.expovariate(1.0 / idle)
+        if rng.random() < DOWNTIME_P:
+            gap += rng.uniform(*DOWNTIME_SECONDS)
+        self.ts = ts + timedelta(seconds=gap)
+        return ts, record
+
+
+def generate_records(
+    inspections: int,
+    machines: int = 20,
+    days: float = 30.0,
+    start: datetime = datetime(2024, 1, 1),
+    defect_rate: float = 0.08,
+    recipe_changes_per_day: float = 2.0,
+    machine_prefix: str = "SYN",
+    seed: int = 1,
+) -> Iterator[Dict[str, Any]]:
+    """Yield ``inspections`` raw records (the ``dataset.json`` shape) in
+    timestamp order, spread over ``machines`` machines and about ``days`` days.
+
+    Output is deterministic for a given seed and only one pending record per
+    machine is held in memory, so any size can be streamed.
+    """
+    spacing = machines * days * 86_400 / max(inspections, 1)
+    streams = [
+        Machine(f"{machine_prefix}-{m:03d}", seed * 100_003 + m, start, spacing, defect_rate, recipe_changes_per_day)
+        for m in range(machines)
+    ]
+    heap = [(machine.ts, index) for index, machine in enumerate(streams)]
+    heapq.heapify(heap)
+    for _ in range(inspections):
+        _, index = heap[0]
+        machine = streams[index]
+        _, record = machine.next()
+        heapq.heapreplace(heap, (machine.ts, index))
+        yield record
+
+
+@contextmanager
+def open_output(path: str) -> Iterator[BinaryIO]:
+    if path == "-":
+        yield sys.stdout.buffer
+        return
+    with open(path, "wb") as fh:
+        yield fh
+
+
+def write_records(records: Iterator[Dict[str, Any]], fh: BinaryIO, fmt: str = "ndjson") -> int:
+    count = 0
+    if fmt == "json":
+        fh.write(b"[")
+    for record in records:
+        if fmt == "json":
+            fh.write(b"," if count else b"")
+            fh.write(orjson.dumps(record))
+        else:
+            fh.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+        count += 1
+    if fmt == "json":
+        fh.write(b"]")
+    return count
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic inspection dataset for ingest and benchmarks")
+    parser.add_argument("--inspections", type=int, default=100_000, help="Records to generate")
+    parser.add_argument("--machines", type=int, default=20, help="Molding machines")
+    parser.add_argument("--days", type=float, default=30, help="Approximate time span covered")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=datetime(2024, 1, 1), help="First timestamp (ISO 8601)")
+    parser.add_argument("--defect-rate", type=float, default=0.08, help="Mean share of inspections with a defect")
+    parser.add_argument("--recipe-changes-per-day", type=float, default=2.0, help="Mean setpoint changes per machine per day")
+    parser.add_argument("--machine-prefix", default="SYN", help="Prefix of the generated machine ids")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed; the same seed yields the same dataset")
+    parser.add_argument("--format", choices=["ndjson", "json"], default="ndjson", help="One record per line, or a JSON array")
+    parser.add_argument("--output", default="-", help="Output file, or '-' for stdout")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    records = generate_records(
+        args.inspections, args.machines, args.days, args.start,
+        args.defect_rate, args.recipe_changes_per_day, args.machine_prefix, args.seed,
+    )
+    with open_output(args.output) as fh:
+        count = write_records(records, fh, args.format)
+    elapsed = time.perf_counter() - started
+    print(f"Generated {count} records in {elapsed:.2f}s ({count / elapsed if elapsed > 0 else 0:.0f} records/sec).", file=sys.stderr)
@@ -4,15 +4,25 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(ROOT))
 
+import io
 import os
+import re
 import json
 import requests
+import time
 import argparse
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any, List, Optional
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional, TextIO
 from urllib.request import urlopen, Request
-from app.schemas.project_inspection import ProjectInspectionBase
-from app.core.database import get_db
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.schemas.project_inspection import ProjectInspectionBase, prepare_record, validate_record
+from app.core.database import get_db, SessionLocal
+from app.repositories.ingest_repository import IngestRepository, defect_mask, natural_key
+from app.repositories.recipe_repository import SETPOINTS, RecipeRepository
+from app.repositories.rollup_repository import RollupRepository
+from app.repositories.watermark_repository import WatermarkRepository
 from app.models.product_inspection import ProductInspection
 from app.models.molding_machine_state import MoldingMachineState
 from app.models.object_detection import ObjectDetection
@@ -20,71 +30,11 @@ from app.models.defect import Defect
 from app.models.pixel_severity import PixelSeverity
 
 DEFAULT_URL = os.getenv("DATASET_URL", "https://static.krevera.com/dataset.json")
+DEFAULT_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+READ_SIZE = 1 << 16
 
-def _parse_timestamp(ts: Any) -> datetime:
-    if isinstance(ts, (int, float)):
-        return datetime.fromtimestamp(ts)
-    if isinstance(ts, str):
-        try:
-            return datetime.fromisoformat(ts)
-        except ValueError:
-            try:
-                return datetime.fromtimestamp(float(ts))
-            except Exception as exc:
-                raise ValueError(f"Unrecognized timestamp format: {ts}") from exc
-    raise ValueError(f"Unrecognized timestamp type: {type(ts)}")
-
-
-def _normalize_object_detections(raw: dict) -> dict:
-    if "object_detections" in raw:
-        detections = raw["object_detections"]
-    elif "object_detection" in raw:
-        od = raw["object_detection"]
-        if isinstance(od, dict):
-            detections = {"default": od}
-        else:
-            detections = {"default": od}
-    else:
-        return {}
-
-    normalized = {}
-    for name, od in detections.items():
-        if not isinstance(od, dict):
-            continue
-        
-        item = {
-            "reject": od.get("reject", False),
-            "label_detection": od.get("label_detection") or {},
-        }
-        
-        for key, value in od.items():
-            if key not in ("reject", "label_detection"):
-                item[key] = value
-        
-        normalized[name] = item
-    
-    return normalized
-
-
-def _prepare(raw: dict) -> dict:
-    data = raw.copy()
-
-    for key in list(data.keys()):
-        if "-" in key:
-            data[key.replace("-", "_")] = data.pop(key)
-
-    if "timestamp" in data:
-        data["timestamp"] = _parse_timestamp(data["timestamp"])
-
-    if "molding_machine_state" not in data:
-        data["molding_machine_state"] = {}
-
-    data["object_detections"] = _normalize_object_detections(data)
-
-    return data
-
-
-def ingest_one(raw: dict, db_session=None) -> ProductInspection:
+def ingest_one(raw: dict, db_session=None) -> Optional[ProductInspection]:
+    """Write one record; returns None if its natural key is already stored."""
     created_session = False
     session = db_session
 
@@ -93,28 +43,44 @@ def ingest_one(raw: dict, db_session=None) -> ProductInspection:
         created_session = True
 
     try:
-        prepared = _prepare(raw)
+        prepared = prepare_record(raw)
         validated = ProjectInspectionBase.model_validate(prepared)
 
-        inspection = ProductInspection(
-            version=validated.version,
-            timestamp=validated.timestamp,
-            molding_machine_id=validated.molding_machine_id,
-        )
-        session.add(inspection)
-        session.flush()
+        molding_machine_id, timestamp, shot_count = natural_key(validated)
+        ingest = IngestRepository(session)
+        ingest.ensure_partitions([timestamp])
+        inspection_id = session.execute(
+            pg_insert(ProductInspection)
+            .values(
+                version=validated.version,
+                timestamp=timestamp,
+                molding_machine_id=molding_machine_id,
+                shot_count=shot_count,
+                defect_mask=defect_mask(validated),
+            )
+            .on_conflict_do_nothing(constraint="uq_product_inspections_natural_key")
+            .returning(ProductInspection.id)
+        ).scalar()
+        if inspection_id is None:
+            session.rollback()
+            return None
+        inspection = session.get(ProductInspection, (inspection_id, timestamp))
 
-        state = validated.molding_machine_state
+        state = validated.molding_machine_state.model_dump()
+        setpoints = {key: state.pop(key) for key in SETPOINTS}
 
         machine_state = MoldingMachineState(
             inspection_id=inspection.id,
-            **state.model_dump(exclude_none=True)
+            inspection_timestamp=timestamp,
+            recipe_id=RecipeRepository(session).intern([setpoints])[0],
+            **{key: value for key, value in state.items() if value is not None}
         )
         session.add(machine_state)
 
         for od_name, od in validated.object_detections.items():
             object_detection = ObjectDetection(
                 inspection_id=inspection.id,
+                inspection_timestamp=timestamp,
                 name=od_name,
                 reject=od.reject,
             )
@@ -131,6 +97,7 @@ def ingest_one(raw: dict, db_session=None) -> ProductInspection:
 
                 defect_row = Defect(
                     object_detection_id=object_detection.id,
+                    inspection_timestamp=timestamp,
                     defect_type=defect_type,
                     reject=defect.reject,
                 )
@@ -139,6 +106,7 @@ def ingest_one(raw: dict, db_session=None) -> ProductInspection:
 
                 pixel_severity = PixelSeverity(
                     defect_id=defect_row.id,
+                    inspection_timestamp=timestamp,
                     value=ps.value,
                     reject=ps.reject,
                     min_value=ps.min_value,
@@ -147,6 +115,11 @@ def ingest_one(raw: dict, db_session=None) -> ProductInspection:
                 )
                 session.add(pixel_severity)
 
+        session.flush()
+        RollupRepository(session).apply([inspection.id], [timestamp])
+        ingest.notify([validated], [timestamp])
+        session.commit()
+        WatermarkRepository(session).bump()
         session.commit()
         session.refresh(inspection)
         return inspection
@@ -160,68 +133,256 @@ def ingest_one(raw: dict, db_session=None) -> ProductInspection:
             session.close()
 
 
-def ingest_from_url(url: Optional[str] = None, db_session=None) -> List[ProductInspection]:
-    url = url or DEFAULT_URL
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ingest_batch(raws: List[dict], db_session=None) -> List[int]:
+    """Validate a chunk of raw records and write it in one transaction.
+
+    Unlike ``ingest_one`` this does not flush per row: every table is written
+    with a single multi-row insert, so the number of round trips per chunk is
+    constant. Records whose natural key is already stored are skipped.
+    Returns the ids of the inspections actually inserted.
+    """
+    created_session = False
+    session = db_session
+
+    if session is None:
+        session = SessionLocal()
+        created_session = True
+
+    try:
+        validated = []
+        for index, raw in enumerate(raws):
+            try:
+                validated.append(validate_record(raw))
+            except Exception as exc:
+                raise ValueError(f"Invalid record at chunk index {index}: {raw}") from exc
+
+        ids = IngestRepository(session).bulk_insert(validated)
+        session.commit()
+        if ids:
+            WatermarkRepository(session).bump()
+            session.commit()
+        return ids
 
-    if url.startswith("file://") or os.path.isfile(url):
+    except Exception:
+        session.rollback()
+        raise
+
+    finally:
+        if created_session:
+            session.close()
+
+
+# Largest single value (in characters) the streaming decoder will buffer
+# while waiting for the rest of it; records are a few KB.
+MAX_VALUE_SIZE = 1 << 24
+
+# The end of a buffer cut part-way through a number or a literal (true,
+# false, null, NaN, Infinity).
+PARTIAL_TOKEN = re.compile(r"[0-9A-Za-z.+-]+")
+
+
+def _truncated(buf: str, error: json.JSONDecodeError) -> bool:
+    """Whether decoding failed only because ``buf`` ends part-way through a
+    value, so that reading more may complete it."""
+    if error.pos >= len(buf) or error.msg.startswith("Unterminated string"):
+        return True
+    rest = buf[error.pos:]
+    if error.msg.startswith("Invalid \\uXXXX escape"):
+        return len(rest) <= 6
+    return PARTIAL_TOKEN.fullmatch(rest) is not None
+
+
+def iter_json_values(fh: TextIO, read_size: int = READ_SIZE, max_value_size: int = MAX_VALUE_SIZE) -> Iterator[Any]:
+    """Incrementally decode a JSON document from a text stream.
+
+    A top-level array is yielded element by element; anything else (a single
+    object, NDJSON, concatenated values) is yielded value by value. Only the
+    current read buffer and the value being decoded are held in memory, and a
+    value longer than ``max_value_size`` characters is an error.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    # Characters dropped from the front of ``buf``, for error positions.
+    offset = 0
+    eof = False
+    in_array = None
+    # Inside an array: "first" (a value or "]"), "value" (after a comma) or
+    # "separator" (a comma or "]" after a value).
+    expect = "first"
+
+    def read_more() -> None:
+        nonlocal buf, pos, eof, offset
+        if len(buf) - pos > max_value_size:
+            raise ValueError(f"JSON value at character {offset + pos} is longer than {max_value_size} characters")
+        chunk = fh.read(read_size)
+        eof = not chunk
+        offset += pos
+        buf, pos = buf[pos:] + chunk, 0
+
+    def invalid(msg: str, at: int) -> ValueError:
+        return ValueError(f"Invalid JSON at character {offset + at}: {msg}")
+
+    while True:
+        while pos < len(buf) and buf[pos].isspace():
+            pos += 1
+
+        if pos == len(buf):
+            if eof:
+                if in_array:
+                    raise ValueError("Unexpected end of input inside top-level array")
+                return
+            read_more()
+            continue
+
+        if in_array is None:
+            in_array = buf[pos] == "["
+            if in_array:
+                pos += 1
+            continue
+
+        if in_array:
+            if buf[pos] == "]" and expect != "value":
+                return
+            if expect == "separator":
+                if buf[pos] != ",":
+                    raise invalid("expecting ',' or ']'", pos)
+                pos += 1
+                expect = "value"
+                continue
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as error:
+            if eof or not _truncated(buf, error):
+                raise invalid(error.msg, error.pos) from error
+            read_more()
+            continue
+
+        # A number touching, or followed only by a partial token up to, the
+        # end of the buffer may be truncated ("12" of "12.5"), so read more
+        # before trusting it.
+        if not eof and (end == len(buf) or PARTIAL_TOKEN.fullmatch(buf, end)):
+            read_more()
+            continue
+
+        pos = end
+        expect = "separator"
+        yield value
+
+
+@contextmanager
+def open_source(url: str) -> Iterator[TextIO]:
+    """Open a dataset as a text stream: ``-`` (stdin), a local path or ``file://`` URL, or HTTP(S)."""
+    if url == "-":
+        yield sys.stdin
+    elif url.startswith("file://") or os.path.isfile(url):
         path = url[len("file://"):] if url.startswith("file://") else url
         with open(path, "r", encoding="utf-8") as fh:
-            payload = json.load(fh)
+            yield fh
     else:
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+            "Accept": "application/json, text/plain, */*",
+            "Referer": "/",
+        }
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
-                "Accept": "application/json, text/plain, */*",
-                "Referer": "/",
-            }
-            resp = requests.get(url, headers=headers, timeout=10)
+            resp = requests.get(url, headers=headers, timeout=30, stream=True)
             resp.raise_for_status()
-            payload = resp.json()
         except Exception:
             req = Request(url, headers={"User-Agent": "ingest-script/1.0"})
-            with urlopen(req) as resp:
-                payload = json.load(resp)
+            with urlopen(req) as raw:
+                yield io.TextIOWrapper(raw, encoding="utf-8")
+            return
+
+        with resp:
+            resp.raw.decode_content = True
+            yield io.TextIOWrapper(resp.raw, encoding="utf-8")
+
+
+def iter_records(url: Optional[str] = None) -> Iterator[dict]:
+    url = url or DEFAULT_URL
+    with open_source(url) as fh:
+        for value in iter_json_values(fh):
+            if not isinstance(value, dict):
+                raise ValueError("Unsupported payload type")
+            yield value
+
 
+def ingest_from_url(url: Optional[str] = None, db_session=None) -> List[ProductInspection]:
     saved: List[ProductInspection] = []
 
-    if isinstance(payload, list):
-        for item in payload:
-            try:
-                saved.append(ingest_one(item, db_session=db_session))
-            except Exception as exc:
-                raise RuntimeError(f"Failed to ingest item: {item}") from exc
-    elif isinstance(payload, dict):
-        saved.append(ingest_one(payload, db_session=db_session))
-    else:
-        raise ValueError("Unsupported payload type")
+    for item in iter_records(url):
+        try:
+            inspection = ingest_one(item, db_session=db_session)
+        except Exception as exc:
+            raise RuntimeError(f"Failed to ingest item: {item}") from exc
+        if inspection is not None:
+            saved.append(inspection)
 
     return saved
 
 
+def bulk_ingest_from_url(
+    url: Optional[str] = None,
+    db_session=None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_chunk: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Stream records from ``url`` and commit them in chunks of ``chunk_size``.
+
+    Records are parsed, prepared and validated lazily, so peak memory is bounded
+    by one chunk regardless of the input size.
+    """
+    total = 0
+    for chunk in _chunked(iter_records(url), chunk_size):
+        try:
+            total += len(ingest_batch(chunk, db_session=db_session))
+        except Exception as exc:
+            raise RuntimeError(f"Failed to ingest chunk starting at record {total}") from exc
+        if on_chunk:
+            on_chunk(total)
+
+    return total
+
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
-    parser.add_argument("--url", help="Dataset URL (overrides DATASET_URL)")
+    parser.add_argument("--url", help="Dataset URL, file path, or '-' for stdin (JSON array or NDJSON; overrides DATASET_URL)")
+    parser.add_argument("--mode", choices=["bulk", "row"], default="bulk", help="bulk: multi-row inserts per chunk, row: legacy per-record path")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Records per transaction in bulk mode")
     args = parser.parse_args()
 
     url = args.url or DEFAULT_URL
-    print(f"Downloading data from {url}...")
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
-        "Accept": "application/json, text/plain, */*",
-    }
-    resp = requests.get(url, headers=headers, timeout=30)
-    resp.raise_for_status()
-    payload = resp.json()
-    
-    total = len(payload) if isinstance(payload, list) else 1
-    print(f"Downloaded {total} records. Ingesting...")
+    print(f"Streaming data from {url} ({args.mode} mode)...")
 
     db_gen = get_db()
     db_session = next(db_gen)
 
+    started = time.perf_counter()
+
+    def report(count: int) -> None:
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else 0.0
+        print(f"  {count} new records committed ({rate:.0f} records/sec)")
+
     try:
-        results = ingest_from_url(args.url, db_session=db_session)
-        print(f"Successfully ingested {len(results)} records.")
+        if args.mode == "bulk":
+            count = bulk_ingest_from_url(url, db_session=db_session, chunk_size=args.chunk_size, on_chunk=report)
+        else:
+            count = len(ingest_from_url(url, db_session=db_session))
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else 0.0
+        print(f"Successfully ingested {count} new records in {elapsed:.2f}s ({rate:.0f} records/sec).")
     finally:
-        db_session.close()
\ No newline at end of file
+        db_session.close()
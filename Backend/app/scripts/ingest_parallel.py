@@ -0,0 +1,184 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from app.core.database import SessionLocal, get_engine
+from app.repositories.ingest_repository import IngestRepository, write_isolating
+from app.repositories.watermark_repository import WatermarkRepository
+from app.schemas.project_inspection import ProjectInspectionBase
+from app.scripts.ingest_data import DEFAULT_URL, DEFAULT_CHUNK_SIZE, iter_records, validate_record, _chunked
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+def _init_worker() -> None:
+    # Connections must never be shared across a fork: drop the inherited pool
+    # (without closing the parent's sockets) so each worker opens its own.
+    get_engine().dispose(close=False)
+
+
+def _write(items: Sequence[Tuple[int, dict, ProjectInspectionBase]]) -> List[int]:
+    session = SessionLocal()
+    try:
+        ids = IngestRepository(session).bulk_insert([record for _, _, record in items])
+        session.commit()
+        if ids:
+            WatermarkRepository(session).bump()
+            session.commit()
+        return ids
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def _ingest_chunk(chunk_id: int, raws: List[dict]) -> Tuple[int, int, List[Dict[str, Any]]]:
+    """Validate and insert one chunk, normally in one transaction.
+
+    Invalid records are returned as dead letters instead of failing the chunk,
+    and so are records the database rejects for their values: the chunk is
+    bisected around them and the rest committed. Other database errors
+    propagate so the chunk is left uncheckpointed and retried on the next run.
+    """
+    validated = []
+    dead = []
+    for index, raw in enumerate(raws):
+        try:
+            validated.append((index, raw, validate_record(raw)))
+        except Exception as exc:
+            dead.append({"chunk_id": chunk_id, "index": index, "error": str(exc), "record": raw})
+
+    ids, rejected = write_isolating(validated, _write)
+    for (index, raw, _), exc in rejected:
+        dead.append({"chunk_id": chunk_id, "index": index, "error": str(exc), "record": raw})
+    dead.sort(key=lambda letter: letter["index"])
+
+    return chunk_id, len(ids), dead
+
+
+def load_checkpoint(path: Optional[str], chunk_size: int) -> Set[int]:
+    done: Set[int] = set()
+    if not path or not os.path.exists(path):
+        return done
+
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry["chunk_size"] != chunk_size:
+                raise ValueError(
+                    f"Checkpoint {path} was written with chunk size {entry['chunk_size']}, "
+                    f"resume with --chunk-size {entry['chunk_size']} or start a new checkpoint"
+                )
+            done.add(entry["chunk_id"])
+    return done
+
+
+def run(
+    url: Optional[str] = None,
+    workers: int = DEFAULT_WORKERS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    checkpoint_path: Optional[str] = None,
+    dead_letter_path: Optional[str] = None,
+) -> Dict[str, int]:
+    """Ingest ``url`` across a process pool, one transaction per chunk.
+
+    Chunk ids are positions in the input stream, so a rerun with the same input,
+    chunk size and checkpoint file skips every chunk already committed.
+    """
+    done = load_checkpoint(checkpoint_path, chunk_size)
+    stats = {"inserted": 0, "dead": 0, "skipped_chunks": 0, "failed_chunks": 0}
+
+    checkpoint_fh = open(checkpoint_path, "a", encoding="utf-8") if checkpoint_path else None
+    dead_fh = open(dead_letter_path, "a", encoding="utf-8") if dead_letter_path else None
+    started = time.perf_counter()
+
+    def collect(futures) -> None:
+        for future in futures:
+            chunk_id = pending.pop(future)
+            try:
+                _, inserted, dead = future.result()
+            except Exception as exc:
+                stats["failed_chunks"] += 1
+                print(f"  chunk {chunk_id} failed and will be retried on resume: {exc}", file=sys.stderr)
+                continue
+
+            for letter in dead:
+                if dead_fh:
+                    dead_fh.write(json.dumps(letter, default=str) + "\n")
+                else:
+                    print(f"  dropped record {chunk_id}:{letter['index']}: {letter['error']}", file=sys.stderr)
+            if dead_fh:
+                dead_fh.flush()
+            if checkpoint_fh:
+                checkpoint_fh.write(json.dumps({"chunk_id": chunk_id, "chunk_size": chunk_size, "records": inserted}) + "\n")
+                checkpoint_fh.flush()
+
+            stats["inserted"] += inserted
+            stats["dead"] += len(dead)
+            elapsed = time.perf_counter() - started
+            rate = stats["inserted"] / elapsed if elapsed > 0 else 0.0
+            print(f"  chunk {chunk_id}: {inserted} inserted, {len(dead)} dead-lettered ({rate:.0f} records/sec overall)")
+
+    pending: Dict[Any, int] = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for chunk_id, chunk in enumerate(_chunked(iter_records(url), chunk_size)):
+                if chunk_id in done:
+                    stats["skipped_chunks"] += 1
+                    continue
+
+                # Keep a bounded number of chunks in flight so the reader cannot
+                # run ahead of the database and buffer the whole input.
+                if len(pending) >= workers * 2:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+
+                pending[pool.submit(_ingest_chunk, chunk_id, chunk)] = chunk_id
+
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+    finally:
+        if checkpoint_fh:
+            checkpoint_fh.close()
+        if dead_fh:
+            dead_fh.close()
+
+    return stats
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Parallel, resumable ingest")
+    parser.add_argument("--url", help="Dataset URL, file path, or '-' for stdin (overrides DATASET_URL)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes, each with its own DB connection")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Records per chunk/transaction")
+    parser.add_argument("--checkpoint", help="Checkpoint file; committed chunks listed here are skipped on rerun")
+    parser.add_argument("--dead-letter", help="NDJSON file receiving records that fail validation or that the database rejects")
+    args = parser.parse_args()
+
+    url = args.url or DEFAULT_URL
+    print(f"Ingesting {url} with {args.workers} workers, {args.chunk_size} records per chunk...")
+
+    started = time.perf_counter()
+    stats = run(url, args.workers, args.chunk_size, args.checkpoint, args.dead_letter)
+    elapsed = time.perf_counter() - started
+    rate = stats["inserted"] / elapsed if elapsed > 0 else 0.0
+
+    print(
+        f"Inserted {stats['inserted']} records in {elapsed:.2f}s ({rate:.0f} records/sec); "
+        f"{stats['dead']} dead-lettered, {stats['skipped_chunks']} chunks skipped from checkpoint, "
+        f"{stats['failed_chunks']} chunks failed."
+    )
+    sys.exit(1 if stats["failed_chunks"] else 0)
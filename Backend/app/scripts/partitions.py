@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import argparse
+from datetime import date, datetime
+from sqlalchemy import delete
+from app.core import partitions
+from app.core.database import SessionLocal, get_engine
+from app.models.machine_hourly_rollup import MachineHourlyRollup
+from app.models.defect_type_hourly_rollup import DefectTypeHourlyRollup
+from app.models.severity_hourly_sketch import SeverityHourlySketch
+from app.repositories.watermark_repository import WatermarkRepository
+
+
+def ensure(months_ahead: int) -> None:
+    with get_engine().begin() as conn:
+        created = partitions.ensure_ahead(conn, months_ahead)
+    print(f"Created partitions for {len(created)} months{': ' + ', '.join(f'{m:%Y-%m}' for m in created) if created else ''}.")
+
+
+def retain(keep_months: int, detach_only: bool, today: date) -> None:
+    """Remove whole months older than the last ``keep_months`` (the current month counts)."""
+    cutoff = partitions.add_months(partitions.month_start(today), 1 - keep_months)
+    session = SessionLocal()
+    try:
+        removed = partitions.detach_before(session.connection(), cutoff, drop=not detach_only)
+        # Rollup buckets for the removed months would otherwise outlive their rows.
+        cutoff_ts = datetime(cutoff.year, cutoff.month, 1)
+        for model in (MachineHourlyRollup, DefectTypeHourlyRollup, SeverityHourlySketch):
+            session.execute(delete(model).where(model.bucket < cutoff_ts).execution_options(synchronize_session=False))
+        session.commit()
+        if removed:
+            WatermarkRepository(session).bump()
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    action = "Detached" if detach_only else "Dropped"
+    print(f"{action} {len(removed)} months before {cutoff:%Y-%m}{': ' + ', '.join(f'{m:%Y-%m}' for m in removed) if removed else ''}.")
+
+
+def show() -> None:
+    with get_engine().connect() as conn:
+        months = sorted(partitions.existing_months(conn))
+    for month in months:
+        print(f"{month:%Y-%m}")
+    print(f"{len(months)} monthly partitions.")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Maintain the monthly inspection partitions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ensure_cmd = sub.add_parser("ensure", help="Create this month's partitions and the next few")
+    ensure_cmd.add_argument("--months-ahead", type=int, default=2, help="Future months to create")
+    retain_cmd = sub.add_parser("retain", help="Detach or drop the months older than the retention window")
+    retain_cmd.add_argument("--keep-months", type=int, required=True, help="Months of history to keep, including the current one")
+    retain_cmd.add_argument("--detach-only", action="store_true", help="Detach the old partitions but keep them as standalone tables")
+    retain_cmd.add_argument("--today", type=date.fromisoformat, default=date.today(), help="Reference date (YYYY-MM-DD)")
+    sub.add_parser("list", help="List the months that have partitions")
+    args = parser.parse_args()
+
+    if args.command == "ensure":
+        ensure(args.months_ahead)
+    elif args.command == "retain":
+        retain(args.keep_months, args.detach_only, args.today)
+    else:
+        show()
@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import time
+import argparse
+from app.core.database import SessionLocal
+from app.repositories.rollup_repository import RollupRepository
+from app.repositories.watermark_repository import WatermarkRepository
+
+
+def rebuild(if_empty: bool = False) -> None:
+    session = SessionLocal()
+    try:
+        repo = RollupRepository(session)
+        if if_empty and not repo.is_empty():
+            print("Rollups already populated, skipping rebuild.")
+            return
+        started = time.perf_counter()
+        repo.rebuild()
+        session.commit()
+        WatermarkRepository(session).bump()
+        session.commit()
+        print(f"Rebuilt rollups in {time.perf_counter() - started:.2f}s.")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def check(limit: int) -> int:
+    session = SessionLocal()
+    try:
+        mismatches = RollupRepository(session).check(limit)
+    finally:
+        session.close()
+
+    for mismatch in mismatches:
+        print(mismatch)
+    print(f"{len(mismatches)} mismatching rollup buckets{' (truncated)' if len(mismatches) >= limit else ''}.")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Maintain the hourly analytics rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = sub.add_parser("rebuild", help="Recompute the rollups from the raw tables")
+    rebuild_cmd.add_argument("--if-empty", action="store_true", help="Only rebuild when the rollups hold no rows")
+    check_cmd = sub.add_parser("check", help="Compare the rollups against the raw tables")
+    check_cmd.add_argument("--limit", type=int, default=100, help="Maximum mismatches to report per table")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        rebuild(args.if_empty)
+    else:
+        sys.exit(check(args.limit))
@@ -1,5 +1,7 @@
 echo "Running database migrations..."
 python app/scripts/create_tables.py
+python app/scripts/partitions.py ensure
+python app/scripts/rollups.py rebuild --if-empty
 
 echo "Checking if data exists..."
 python -c "
@@ -15,6 +17,9 @@ with engine.connect() as conn:
 if [ $? -eq 1 ]; then
     echo "No data found, ingesting..."
     python app/scripts/ingest_data.py
+elif [ -n "$DELTA_INGEST" ]; then
+    echo "Data exists, ingesting new records only..."
+    python app/scripts/ingest_data.py
 else
     echo "Data already exists, skipping ingest."
 fi
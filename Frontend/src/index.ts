@@ -1,4 +1,6 @@
-export type TimeGrouping = 'hour' | 'day' | 'week'
+// Named widths, any `<n><unit>` width (m, h, d, w) such as '15m' or '6h', or
+// 'auto' to let the server pick one for max_points.
+export type TimeGrouping = 'hour' | 'day' | 'week' | 'auto' | `${number}${'m' | 'h' | 'd' | 'w'}`
 
 export interface AnalyticsFilters {
   grouping: TimeGrouping
@@ -7,19 +9,40 @@ export interface AnalyticsFilters {
   machineId: string | null
 }
 
+export interface PixelSeverity {
+  reject: boolean
+  value: number
+  min_value: number | null
+  max_value: number | null
+  threshold: number | null
+}
+
+export interface InspectionDefect {
+  reject: boolean
+  pixel_severity: PixelSeverity | null
+}
+
+// `reject` plus one entry per defect type found, keyed like `flash_defect`.
+export type InspectionObjectDetection = { reject: boolean } & Record<string, InspectionDefect | boolean>
+
 export interface ProductInspection {
   id: number
+  version: string
   timestamp: string
   machine_id: string
+  shot_count: number
   reject: boolean
-  cycle_time: number
+  cycle_time: number | null
+  molding_machine_state: Record<string, number | boolean | null> | null
+  object_detections: Record<string, InspectionObjectDetection>
 }
 
 export interface ProductInspectionListResponse {
   inspections: ProductInspection[]
-  total_count: number
-  page: number
   page_size: number
+  has_more: boolean
+  // Pass back as `cursor` to fetch the next (older) page.
+  next_cursor: string | null
 }
 
 export interface DefectTrendPoint {
@@ -63,4 +86,125 @@ export interface DefectDistributionResponse {
   }[]
   defect_stats: DefectTypeStats[]
   total_defects: number
-}
\ No newline at end of file
+}
+
+export interface SummaryMetrics {
+  total_inspections: number
+  total_defects: number
+  defect_rate: number
+  total_machines: number
+  date_start: string | null
+  date_end: string | null
+}
+
+export interface DashboardResponse {
+  trends: DefectTrendsResponse
+  machine_performance: MachinePerformanceResponse
+  distribution: DefectDistributionResponse
+  summary: SummaryMetrics
+}
+
+// matrix[i][j]: inspections with both defect_types[i] and defect_types[j];
+// the diagonal counts each type.
+export interface MachineDefectCooccurrence {
+  machine_id: string
+  inspections: number
+  defective: number
+  matrix: number[][]
+}
+
+export interface DefectCooccurrenceResponse {
+  defect_types: string[]
+  machines: MachineDefectCooccurrence[]
+}
+
+export interface ParameterBin {
+  lower: number | null
+  upper: number | null
+  inspections: number
+  defect_rate: number | null
+}
+
+export interface ParameterCorrelation {
+  machine_id: string
+  defect_type: string
+  parameter: string
+  correlation: number
+  t_statistic: number | null
+  mean_with_defect: number | null
+  mean_without_defect: number | null
+  inspections: number
+  defects: number
+  bins: ParameterBin[]
+}
+
+export interface ParameterCorrelationsResponse {
+  correlations: ParameterCorrelation[]
+}
+
+export type SeverityGroupBy = 'defect_type' | 'machine' | 'time'
+
+export interface SeverityPercentiles {
+  defect_type?: string
+  machine_id?: string
+  timestamp?: string
+  count: number
+  above_threshold_rate: number
+  // p50, p90, ... and threshold_ratio_p50, ... for each requested quantile.
+  [quantile: string]: string | number | null | undefined
+}
+
+export interface SeverityPercentilesResponse {
+  severities: SeverityPercentiles[]
+  // Bound on each quantile's error relative to its value; 0 when exact.
+  relative_error: number
+  by: SeverityGroupBy
+  grouping: TimeGrouping
+  quantiles: number[]
+}
+
+export interface SetpointChange {
+  from: number | null
+  to: number | null
+}
+
+// The first shot a machine ran on a new recipe, with the setpoints that
+// changed; a machine's first shot in the range lists all of them.
+export interface RecipeChange {
+  machine_id: string
+  timestamp: string
+  inspection_id: number
+  recipe_id: number | null
+  previous_recipe_id: number | null
+  setpoints: Record<string, SetpointChange>
+}
+
+export interface RecipeChangesResponse {
+  changes: RecipeChange[]
+}
+
+export interface LiveMachineTotals {
+  machine_id: string
+  total_inspections: number
+  defect_count: number
+  defect_rate: number
+}
+
+export interface LiveSnapshot {
+  summary: SummaryMetrics
+  machines: LiveMachineTotals[]
+}
+
+// Inspections added to one machine hour by an ingest.
+export interface LiveBucketDelta {
+  timestamp: string
+  machine_id: string
+  total_count: number
+  defect_count: number
+}
+
+export interface LiveDelta {
+  buckets: LiveBucketDelta[]
+  summary: SummaryMetrics
+  machines: LiveMachineTotals[]
+}
@@ -1,5 +1,5 @@
 import axios from 'axios'
-import type { ProductInspectionListResponse, ProductInspection, DefectTrendsResponse, MachinePerformanceResponse, DefectDistributionResponse,TimeGrouping } from '@/index'
+import type { ProductInspectionListResponse, ProductInspection, DefectTrendsResponse, MachinePerformanceResponse, DefectDistributionResponse, DefectCooccurrenceResponse, DashboardResponse, ParameterCorrelationsResponse, SeverityGroupBy, SeverityPercentilesResponse, RecipeChangesResponse, TimeGrouping, LiveSnapshot, LiveDelta } from '@/index'
 
 const API_URL = import.meta.env.VITE_API_URL
 
@@ -13,10 +13,11 @@ const api = axios.create({
 
 export const apiService = {
   async getInspections(params?: {
-    page?: number
+    cursor?: string
     page_size?: number
     machine_id?: string
     has_defects?: boolean
+    defect_type?: string
   }): Promise<ProductInspectionListResponse> {
     const { data } = await api.get<ProductInspectionListResponse>('/api/inspections', { params })
     return data
@@ -37,6 +38,7 @@ export const apiService = {
     start_date?: string
     end_date?: string
     machine_id?: string
+    max_points?: number
   }): Promise<DefectTrendsResponse> {
     const { data } = await api.get<DefectTrendsResponse>('/api/analytics/defect-trends', { params })
     return data
@@ -57,6 +59,78 @@ export const apiService = {
   }): Promise<DefectDistributionResponse> {
     const { data} = await api.get<DefectDistributionResponse>('/api/analytics/defect-distribution', { params })
     return data
+  },
+
+  async getDashboard(params?: {
+    grouping?: TimeGrouping
+    start_date?: string
+    end_date?: string
+    machine_id?: string
+    max_points?: number
+  }): Promise<DashboardResponse> {
+    const { data } = await api.get<DashboardResponse>('/api/analytics/dashboard', { params })
+    return data
+  },
+
+  async getParameterCorrelations(params?: {
+    start_date?: string
+    end_date?: string
+    machine_id?: string
+    defect_type?: string
+    top?: number
+    bins?: number
+  }): Promise<ParameterCorrelationsResponse> {
+    const { data } = await api.get<ParameterCorrelationsResponse>('/api/analytics/parameter-correlations', { params })
+    return data
+  },
+
+  async getDefectCooccurrence(params?: {
+    start_date?: string
+    end_date?: string
+    machine_id?: string
+  }): Promise<DefectCooccurrenceResponse> {
+    const { data } = await api.get<DefectCooccurrenceResponse>('/api/analytics/defect-cooccurrence', { params })
+    return data
+  },
+
+  async getSeverityPercentiles(params?: {
+    by?: SeverityGroupBy
+    grouping?: TimeGrouping
+    quantiles?: number[]
+    start_date?: string
+    end_date?: string
+    machine_id?: string
+    defect_type?: string
+    max_points?: number
+  }): Promise<SeverityPercentilesResponse> {
+    // Repeated keys (quantiles=0.5&quantiles=0.9), as FastAPI reads lists.
+    const { data } = await api.get<SeverityPercentilesResponse>('/api/analytics/severity-percentiles', {
+      params,
+      paramsSerializer: { indexes: null },
+    })
+    return data
+  },
+
+  async getRecipeChanges(params?: {
+    start_date?: string
+    end_date?: string
+    machine_id?: string
+  }): Promise<RecipeChangesResponse> {
+    const { data } = await api.get<RecipeChangesResponse>('/api/analytics/recipe-changes', { params })
+    return data
+  },
+
+  // Live totals pushed as inspections are ingested. The browser reconnects on
+  // its own and each connection starts with a fresh snapshot. Returns a
+  // function that closes the stream.
+  subscribeLive(handlers: {
+    onSnapshot: (snapshot: LiveSnapshot) => void
+    onDelta: (delta: LiveDelta) => void
+  }): () => void {
+    const source = new EventSource(`${API_URL ?? ''}/api/analytics/live`)
+    source.addEventListener('snapshot', (event) => handlers.onSnapshot(JSON.parse((event as MessageEvent).data)))
+    source.addEventListener('delta', (event) => handlers.onDelta(JSON.parse((event as MessageEvent).data)))
+    return () => source.close()
   }
 }
 
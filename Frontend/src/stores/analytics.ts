@@ -1,12 +1,13 @@
 import { defineStore } from 'pinia'
 import { ref, computed } from 'vue'
 import { apiService } from '@/services/api'
-import type { DefectTrendsResponse, MachinePerformanceResponse, DefectDistributionResponse, AnalyticsFilters } from '@/index'
+import type { DefectTrendsResponse, MachinePerformanceResponse, DefectDistributionResponse, SummaryMetrics, AnalyticsFilters } from '@/index'
 
 export const useAnalyticsStore = defineStore('analytics', () => {
   const defectTrends = ref<DefectTrendsResponse | null>(null)
   const machinePerformance = ref<MachinePerformanceResponse | null>(null)
   const defectDistribution = ref<DefectDistributionResponse | null>(null)
+  const summary = ref<SummaryMetrics | null>(null)
   
   const loading = ref(false)
   const error = ref<string | null>(null)
@@ -86,13 +87,21 @@ export const useAnalyticsStore = defineStore('analytics', () => {
       loading.value = true
       error.value = null
       
-      await Promise.all([
-        fetchDefectTrends(),
-        fetchMachinePerformance(),
-        fetchDefectDistribution(),
-      ])
+      const params: any = {
+        grouping: filters.value.grouping,
+      }
+      if (filters.value.startDate) params.start_date = filters.value.startDate
+      if (filters.value.endDate) params.end_date = filters.value.endDate
+      if (filters.value.machineId) params.machine_id = filters.value.machineId
+
+      const dashboard = await apiService.getDashboard(params)
+      defectTrends.value = dashboard.trends
+      machinePerformance.value = dashboard.machine_performance
+      defectDistribution.value = dashboard.distribution
+      summary.value = dashboard.summary
     } catch (e) {
       error.value = 'Failed to sync dashboard'
+      console.error(e)
     } finally {
       loading.value = false
     }
@@ -115,6 +124,7 @@ export const useAnalyticsStore = defineStore('analytics', () => {
     defectTrends,
     machinePerformance,
     defectDistribution,
+    summary,
     loading,
     error,
     filters,